@@ -21,9 +21,12 @@ function human_fixes_check() {
 
 flock -xn /tmp/dg_processor.lck python3 "${ETL_DIR}/data_processor.py" \
   --input_dir="${RAW_DIR}" \
+  --db_cache_dir="${DB_CACHE_DIR}" \
+  --entity_snapshot_dir="${ENTITY_SNAPSHOT_DIR}" \
   --es_dir="${ES_DIR}" \
   --media_dir="${DADGUIDE_MEDIA_DIR}" \
   --output_dir="${DADGUIDE_DATA_DIR}/processed" \
+  --stat_table_file="${DADGUIDE_GAME_DB_DIR}/monster_stats.csv" \
   --db_config="${DB_CONFIG}" \
   --server=$1 \
   --doupdates
@@ -41,7 +41,8 @@ flock -xn /tmp/dg_scraper_jp.lck python3 ${REPO_ROOT}/etl/auto_dungeon_scrape.py
   --doupdates \
   --server=jp \
   --user_uuid=${JP_PAD_USER_UUID} \
-  --user_intid=${JP_PAD_USER_INTID}
+  --user_intid=${JP_PAD_USER_INTID} \
+  --waves_updated_marker="${WAVES_UPDATED_MARKER}"
 human_fixes_check
 
 
@@ -51,7 +52,8 @@ flock -xn /tmp/dg_scraper_na.lck python3 ${REPO_ROOT}/etl/auto_dungeon_scrape.py
   --doupdates \
   --server=na \
   --user_uuid=${NA_PAD_USER_UUID} \
-  --user_intid=${NA_PAD_USER_INTID}
+  --user_intid=${NA_PAD_USER_INTID} \
+  --waves_updated_marker="${WAVES_UPDATED_MARKER}"
 human_fixes_check
 
 hook_info "Autodungeon finished"
@@ -18,6 +18,25 @@ ${SCHEMA_TOOLS_DIR}/mysql2sqlite.sh \
   --skip-triggers \
   --ignore-table=dadguide.wave_data |
   sqlite3 "${DADGUIDE_DB_FILE_TMP}"
+
+# Per-level monster stats, written by data_processor.py earlier in this pipeline. Refuse to export
+# stats from before the current pull rather than ship them next to the new monster data.
+MONSTER_STATS_FILE=${DADGUIDE_GAME_DB_DIR}/monster_stats.csv
+for card_file in "${RAW_DIR}"/*/download_card_data.json; do
+  if [ ! "${MONSTER_STATS_FILE}" -nt "${card_file}" ]; then
+    echo "${MONSTER_STATS_FILE} is missing or older than ${card_file}"
+    exit 1
+  fi
+done
+echo "Adding monster stats to sqlite"
+sqlite3 "${DADGUIDE_DB_FILE_TMP}" <<EOF
+.mode csv
+.import ${MONSTER_STATS_FILE} monster_stats_import
+CREATE TABLE monster_stats (monster_id INTEGER, level INTEGER, hp INTEGER, atk INTEGER, rcv INTEGER,
+                            PRIMARY KEY (monster_id, level)) WITHOUT ROWID;
+INSERT INTO monster_stats SELECT monster_id, level, hp, atk, rcv FROM monster_stats_import;
+DROP TABLE monster_stats_import;
+EOF
 mv "${DADGUIDE_DB_FILE_TMP}" "${DADGUIDE_DB_FILE}"
 
 echo "Zipping/copying DB dump"
@@ -9,6 +9,7 @@ git pull --rebase --autostash
 
 python3 "${ETL_DIR}/rebuild_enemy_skills.py" \
   --input_dir="${RAW_DIR}" \
+  --db_cache_dir="${DB_CACHE_DIR}" \
   --output_dir="${GAME_DATA_DIR}"
 
 git add behavior_*
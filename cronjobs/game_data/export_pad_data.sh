@@ -12,6 +12,7 @@ git pull --rebase --autostash
 
 python3 "${UTILS_ETL_DIR}/data_exporter.py" \
   --input_dir="${RAW_DIR}" \
+  --db_cache_dir="${DB_CACHE_DIR}" \
   --output_dir="${GAME_DATA_DIR}"
 
 git add ./*/assets/
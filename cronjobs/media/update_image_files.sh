@@ -56,6 +56,7 @@ python3 "${RUN_DIR}/PADAnimatedGenerator.py" \
 python3 ${RUN_DIR}/PADPortraitsGenerator.py \
   --input_dir="${IMG_DIR}/na/full/extract_data" \
   --data_dir="${RAW_DIR}" \
+  --db_cache_dir="${DB_CACHE_DIR}" \
   --card_templates_file="${RUN_DIR}/wide_cards.png" \
   --server=na \
   --output_dir="${IMG_DIR}/na/portrait/local"
@@ -63,6 +64,7 @@ python3 ${RUN_DIR}/PADPortraitsGenerator.py \
 python3 ${RUN_DIR}/PADPortraitsGenerator.py \
   --input_dir="${IMG_DIR}/jp/full/extract_data" \
   --data_dir="${RAW_DIR}" \
+  --db_cache_dir="${DB_CACHE_DIR}" \
   --card_templates_file="${RUN_DIR}/wide_cards.png" \
   --server=jp \
   --output_dir="${IMG_DIR}/jp/portrait/local"
@@ -10,7 +10,7 @@ source ./discord.sh
 source "${VENV_ROOT}/bin/activate"
 
 # This may not work on Mac
-options=$(getopt -o '' --long skipdownload,skipupload,server:,processors: -- "$@")
+options=$(getopt -o '' --long skipdownload,skipupload,force,server:,processors: -- "$@")
 eval set -- "$options"
 
 # Defaults
@@ -18,6 +18,7 @@ SERVER="COMBINED"
 PROCESSORS=""
 DOWNLOAD=1
 UPLOAD=1
+FORCE=0
 
 while true; do
     case "$1" in
@@ -39,6 +40,9 @@ while true; do
     --skipupload)
         UPLOAD=0
         ;;
+    --force)
+        FORCE=1
+        ;;
     --)
         shift
         break
@@ -47,7 +51,14 @@ while true; do
     shift
 done
 
+# The dungeon scraper can touch the marker while this runs, so processing works on a per-run copy.
+RUN_WAVES_MARKER="${WAVES_UPDATED_MARKER}.$$"
+
 function error_exit() {
+  # Leave the waves for the next run to process.
+  if [ -e "${RUN_WAVES_MARKER}" ]; then
+    mv "${RUN_WAVES_MARKER}" "${WAVES_UPDATED_MARKER}"
+  fi
   hook_error "DadGuide $SERVER Pipeline failed <@&${NOTIFICATION_DISCORD_ROLE_ID}>"
   hook_file "/tmp/dg_update_log.txt"
 }
@@ -63,14 +74,27 @@ trap success_exit EXIT
 if [ $DOWNLOAD -eq 1 ]; then
   echo "Pulling Data"
   ./pull_data.sh
+
+  # Each server's pull lists the files it rewrote, and the dungeon scraper leaves a marker when it
+  # adds waves; if neither has anything there's nothing new to process.
+  changed_lists=("${RAW_DIR}"/*/changed_files.txt)
+  if [ $FORCE -eq 0 ] && [ -e "${changed_lists[0]}" ] && [ ! -e "${WAVES_UPDATED_MARKER}" ] \
+     && ! grep -q . "${changed_lists[@]}"; then
+    echo "No pulled files or waves changed, skipping update"
+    exit 0
+  fi
 fi
 
 echo "Updating DadGuide"
+if [ -e "${WAVES_UPDATED_MARKER}" ]; then
+  mv "${WAVES_UPDATED_MARKER}" "${RUN_WAVES_MARKER}"
+fi
 if [ -z "$PROCESSORS" ]; then
   ./data_processor.sh $SERVER
 else
   ./do_single_process.sh "$SERVER" "$PROCESSORS"
 fi
+rm -f "${RUN_WAVES_MARKER}"
 
 echo "Exporting Data"
 ./export_data.sh
@@ -8,8 +8,11 @@ declare -x PAD_RESOURCES_ROOT="${PROJECT_ROOT}/pad-resources"
 declare -x GAME_DATA_DIR="${PROJECT_ROOT}/pad-data-pipeline-export"
 
 declare -x PAD_DATA_DIR="${REPO_ROOT}/pad_data"
+declare -x WAVES_UPDATED_MARKER="${PAD_DATA_DIR}/waves_updated"
 declare -x CRONJOBS_DIR="${REPO_ROOT}/cronjobs"
 declare -x RAW_DIR="${PAD_DATA_DIR}/raw"
+declare -x DB_CACHE_DIR="${PAD_DATA_DIR}/db_cache"
+declare -x ENTITY_SNAPSHOT_DIR="${PAD_DATA_DIR}/entity_snapshots"
 declare -x IMG_DIR="${PAD_DATA_DIR}/image_data"
 declare -x VENV_ROOT="${REPO_ROOT}"
 
@@ -2,15 +2,19 @@ import argparse
 import json
 import logging
 import os
+import pathlib
 import time
 
 from pad.api import pad_api
 from pad.api.pad_api import BadResponseCode
+from pad.api.rate_limiter import ServerRateLimiter
 from pad.common.dungeon_types import RawDungeonType
 from pad.common.shared_types import Server
 from pad.db import db_util
+from pad.dungeon.scrape_scheduler import ScrapeScheduler, ScrapeTask, load_accounts
 from pad.raw.bonus import BonusType
 from pad.raw_processor import merged_database
+from pad.storage_processor.wave_summary_processor import WaveSummaryProcessor
 from pad_dungeon_pull import pull_data
 
 logger = logging.getLogger('autodungeon')
@@ -22,6 +26,15 @@ human_fix_logger.disabled = True
 fail_logger = logging.getLogger('processor_failures')
 logger.setLevel(logging.INFO)
 
+# Entries per floor in each run.
+FLOOR_LOOP_COUNT = 100
+
+# Default requests per second per server; JP used to get a half second sleep between entries.
+SERVER_RATE_LIMITS = {
+    'JP': 2.0,
+    'NA': None,
+}
+
 # Dungeons in this list should have twice the minimum wave count.
 # They just have too much variability to get by on a normal scrape size.
 EXTRA_RUN_DUNGEONS = [
@@ -44,8 +57,14 @@ def parse_args():
                              help="Path to a folder where the input data is")
 
     input_group.add_argument("--server", required=True, help="na or jp")
-    input_group.add_argument("--user_uuid", required=True, help="Account UUID")
-    input_group.add_argument("--user_intid", required=True, help="Account code")
+    input_group.add_argument("--user_uuid", help="Account UUID")
+    input_group.add_argument("--user_intid", help="Account code")
+    input_group.add_argument("--account_config",
+                             help="CSV of accounts in the account_config.csv format; scrapes with every"
+                                  " account for the server at once instead of --user_uuid/--user_intid")
+    input_group.add_argument("--api_url", help="Overrides the API URL, e.g. for the local stand-in server")
+    input_group.add_argument("--requests_per_second", type=float,
+                             help="Shared request rate limit for all accounts (defaults per server)")
 
     input_group.add_argument("--minimum_wave_count", default=1000, type=int,
                              help="Minimum stored wave count to skip loading wave data")
@@ -56,12 +75,17 @@ def parse_args():
     output_group.add_argument("--doupdates", default=False,
                               action="store_true", help="Apply updates")
     output_group.add_argument("--stream_safe", action="store_true", help="Don't use fancy progress bars")
+    output_group.add_argument("--waves_updated_marker",
+                              help="File to touch if any waves were added or purged, to trigger processing")
 
     help_group = parser.add_argument_group("Help")
     help_group.add_argument("-h", "--help", action="help",
                             help="Displays this help message and exits.")
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    if not args.account_config and not (args.user_uuid and args.user_intid):
+        parser.error('either --account_config or --user_uuid and --user_intid are required')
+    return args
 
 
 class Arg:
@@ -80,22 +104,27 @@ def do_dungeon_load(args, dungeon_id, floor_id, api_client, db_wrapper):
     dg_pull_arg.user_intid = args.user_intid
     dg_pull_arg.floor_id = floor_id
     dg_pull_arg.dungeon_id = dungeon_id
-    dg_pull_arg.loop_count = 100
+    dg_pull_arg.loop_count = FLOOR_LOOP_COUNT
     dg_pull_arg.logsql = False
     dg_pull_arg.stream_safe = args.stream_safe
+    dg_pull_arg.entries_per_flush = 10
+    dg_pull_arg.load_data_infile = False
     pull_data(dg_pull_arg, api_client, db_wrapper)
 
 
 CHECK_AGE_SQL = '''
 SELECT
+  dungeon_id,
+  floor_id,
   SUM(CASE WHEN DATEDIFF(NOW(), pull_time) >= {age} THEN 1 ELSE 0 END) AS older,
   SUM(CASE WHEN DATEDIFF(NOW(), pull_time) < {age} THEN 1 ELSE 0 END) AS newer
 FROM (
-    SELECT entry_id, pull_time
+    SELECT dungeon_id, floor_id, entry_id, pull_time
     FROM wave_data
-    WHERE dungeon_id={dungeon_id} AND floor_id={floor_id}
-    GROUP BY 1, 2
+    WHERE dungeon_id IN ({dungeon_ids})
+    GROUP BY 1, 2, 3, 4
 ) AS entry_id_pull_time
+GROUP BY 1, 2
 '''
 
 MIGRATE_OLD_DATA_SQL = '''
@@ -110,101 +139,212 @@ WHERE dungeon_id={dungeon_id} AND floor_id={floor_id} AND DATEDIFF(NOW(), pull_t
 '''
 
 
-def load_dungeons(args, db_wrapper, current_dungeons, api_client):
-    """Scrapes data for all current dungeons.
+class FloorScrape(object):
+    """The stored entry counts for a floor, and whether it needs to be scraped or purged."""
 
-    If there is not enough 'new' data, we try to scrape data.
-    If we have an acceptable amount of data and we have 'old' data, migrate it
-    to a backup database and then purge it.
+    def __init__(self, dungeon, sub_dungeon, minimum_wave_count: int):
+        self.dungeon = dungeon
+        self.sub_dungeon = sub_dungeon
+        self.floor_id = sub_dungeon.simple_sub_dungeon_id
+        self.minimum_wave_count = minimum_wave_count
+        self.older_count = 0
+        self.newer_count = 0
 
-    We only purge if we have an acceptable amount of new data to prevent us from
-    erasing useful data for dungeons we can't actually enter.
-    """
+    @property
+    def deficit(self):
+        return self.minimum_wave_count - self.newer_count
+
+    @property
+    def should_enter(self):
+        return self.newer_count < self.minimum_wave_count
+
+    @property
+    def should_purge(self):
+        return self.older_count > 0 and self.newer_count >= self.minimum_wave_count
+
+
+def load_wave_counts(args, db_wrapper, floors):
+    """Fills in the old/new entry counts for every floor with a single query."""
+    if not floors:
+        return
+    dungeon_ids = sorted({f.dungeon.dungeon_id for f in floors})
+    sql = CHECK_AGE_SQL.format(age=args.maximum_wave_age, dungeon_ids=','.join(map(str, dungeon_ids)))
+    wave_info = {(row['dungeon_id'], row['floor_id']): row for row in db_wrapper.fetch_data(sql)}
+
+    for floor in floors:
+        row = wave_info.get((floor.dungeon.dungeon_id, floor.floor_id), {})
+        floor.older_count = int(row.get('older') or 0)
+        floor.newer_count = int(row.get('newer') or 0)
 
+
+def plan_floors(args, current_dungeons):
+    """Lists the floors of every current dungeon that can be scraped."""
+    floors = []
+    seen_dungeon_ids = set()
     for dungeon in current_dungeons:
         dungeon_id = dungeon.dungeon_id
-        print(f'Processing {dungeon.clean_name} ({dungeon_id})')
+        if dungeon_id in seen_dungeon_ids:
+            continue
+        seen_dungeon_ids.add(dungeon_id)
+
         if dungeon.full_dungeon_type == RawDungeonType.EIGHT_PLAYER:
-            print('Skipping 8 player dungeon.')
+            print(f'Skipping 8 player dungeon {dungeon.clean_name} ({dungeon_id}).')
             continue
 
         minimum_wave_count = args.minimum_wave_count
         if dungeon_id in EXTRA_RUN_DUNGEONS:
-            print('Variable dungeon. Increasing the wave count')
+            print(f'Variable dungeon {dungeon.clean_name} ({dungeon_id}). Increasing the wave count')
             minimum_wave_count *= 10
 
-        for sub_dungeon in dungeon.sub_dungeons:
-            floor_id = sub_dungeon.simple_sub_dungeon_id
+        floors.extend(FloorScrape(dungeon, sub_dungeon, minimum_wave_count) for sub_dungeon in dungeon.sub_dungeons)
+    return floors
+
 
-            wave_info = db_wrapper.get_single_or_no_row(
-                CHECK_AGE_SQL.format(age=args.maximum_wave_age, dungeon_id=dungeon_id, floor_id=floor_id))
-            older_count = int(wave_info["older"] or 0)
-            newer_count = int(wave_info["newer"] or 0)
+def scrape_serially(args, db_wrapper, scrape_plan, api_client):
+    failed_dungeon_ids = set()
+    for floor in scrape_plan:
+        dungeon = floor.dungeon
+        dungeon_id = dungeon.dungeon_id
+        floor_id = floor.floor_id
+        if dungeon_id in failed_dungeon_ids:
+            continue
 
-            should_enter = newer_count < minimum_wave_count
-            print(f'Entries for floor {floor_id} ({sub_dungeon.clean_name}):'
-                  f' old={older_count} new={newer_count} entering={should_enter}')
-            if should_enter:
+        print(f'Processing {dungeon.clean_name} ({dungeon_id})')
+        print(f'Entries for floor {floor_id} ({floor.sub_dungeon.clean_name}):'
+              f' old={floor.older_count} new={floor.newer_count} entering=True')
+        try:
+            do_dungeon_load(args, dungeon_id, floor_id, api_client, db_wrapper)
+        except BadResponseCode as brc:
+            if brc.code == 2:
                 try:
+                    print("Attempting Relog...")
+                    api_client.login()
+                    api_client.load_player_data()
                     do_dungeon_load(args, dungeon_id, floor_id, api_client, db_wrapper)
-                except BadResponseCode as brc:
-                    if brc.code == 2:
-                        try:
-                            print("Attempting Relog...")
-                            api_client.login()
-                            api_client.load_player_data()
-                            do_dungeon_load(args, dungeon_id, floor_id, api_client, db_wrapper)
-                            brc.code = 0
-                        except BadResponseCode as brc2:
-                            brc = brc2
-
-                    if brc.code == 8:
-                        print(f"Failed to enter. Skipping dungeon. ({brc})")
-                        fail_logger.debug(f"Failed to enter dungeon {dungeon.clean_name} ({dungeon_id})"
-                                          f" on floor {floor_id}.\n{brc}")
-                        break
-                    elif brc.code != 0:
-                        raise
-
-            wave_info = db_wrapper.get_single_or_no_row(
-                CHECK_AGE_SQL.format(age=args.maximum_wave_age, dungeon_id=dungeon_id, floor_id=floor_id))
-            older_count = int(wave_info["older"] or 0)
-            newer_count = int(wave_info["newer"] or 0)
-
-            should_purge = older_count > 0 and newer_count >= minimum_wave_count
-            print(f'Entries for floor {floor_id}: old={older_count} new={newer_count} purging={should_purge}')
-
-            # This section cleans up 'old' data. We consider data to be out of date if approximately 3 months have
-            # passed. If we have the opportunity to scrape a dungeon (e.g. a collab) that comes back, we will. It will
-            # also ensure that the normal/technical data is up to date.
-            if should_purge:
-                try:
-                    db_wrapper.connection.autocommit(False)
-                    with db_wrapper.connection.cursor() as cursor:
-                        sql = MIGRATE_OLD_DATA_SQL.format(age=args.maximum_wave_age,
-                                                          dungeon_id=dungeon_id,
-                                                          floor_id=floor_id)
-                        db_wrapper.execute(cursor, sql)
-                        migrate_count = cursor.rowcount
-                        if migrate_count < older_count:  # The older_count is the number of entries, this is raw rows
-                            db_wrapper.connection.rollback()
-                            raise ValueError('wrong migrate count:', migrate_count, 'vs', older_count)
-
-                        sql = DELETE_OLD_DATA_SQL.format(age=args.maximum_wave_age,
-                                                         dungeon_id=dungeon_id,
-                                                         floor_id=floor_id)
-                        db_wrapper.execute(cursor, sql)
-                        delete_count = cursor.rowcount
-                        if delete_count != migrate_count:  # Compare what we migrated against what we deleted
-                            db_wrapper.connection.rollback()
-                            raise ValueError('wrong delete count:', delete_count, 'vs', migrate_count)
-
-                        db_wrapper.connection.commit()
-                        print('migration complete')
-                except Exception as ex:
-                    print('failed to migrate data:', ex)
-                finally:
-                    db_wrapper.connection.autocommit(True)
+                    brc.code = 0
+                except BadResponseCode as brc2:
+                    brc = brc2
+
+            if brc.code == 8:
+                print(f"Failed to enter. Skipping dungeon. ({brc})")
+                fail_logger.debug(f"Failed to enter dungeon {dungeon.clean_name} ({dungeon_id})"
+                                  f" on floor {floor_id}.\n{brc}")
+                failed_dungeon_ids.add(dungeon_id)
+            elif brc.code != 0:
+                raise
+
+
+def make_api_client(server: str, user_uuid: str, user_intid: str, api_url: str = None):
+    if server.upper() == 'NA':
+        endpoint = pad_api.ServerEndpoint.NA
+    elif server.upper() == 'JP':
+        endpoint = pad_api.ServerEndpoint.JA
+    else:
+        raise Exception('unexpected server:' + server)
+    return pad_api.PadApiClient(endpoint, user_uuid, user_intid, api_url=api_url)
+
+
+def scrape_concurrently(args, db_wrapper, scrape_plan):
+    """Scrapes the plan with every account for the server in the account config at once."""
+    accounts = load_accounts(args.account_config, args.server)
+    print(f'Scraping with {len(accounts)} accounts')
+
+    if not scrape_plan:
+        return
+    sub_dungeon_ids = [f.dungeon.dungeon_id * 1000 + f.floor_id for f in scrape_plan]
+    stamina = db_wrapper.load_to_key_value('sub_dungeon_id', 'stamina', 'sub_dungeons',
+                                           'sub_dungeon_id IN ({})'.format(','.join(map(str, sub_dungeon_ids))))
+    tasks = [ScrapeTask(f.dungeon.dungeon_id, f.floor_id, FLOOR_LOOP_COUNT, stamina[sub_dungeon_id])
+             for f, sub_dungeon_id in zip(scrape_plan, sub_dungeon_ids)]
+
+    server = args.server.upper()
+    rate = args.requests_per_second or SERVER_RATE_LIMITS.get(server)
+    scheduler = ScrapeScheduler(db_wrapper,
+                                lambda account: make_api_client(account.server, account.user_uuid,
+                                                                account.user_intid, args.api_url),
+                                ServerRateLimiter({server: rate}),
+                                entries_per_flush=10)
+    for task, brc in scheduler.run(accounts, tasks):
+        fail_logger.debug(f"Failed to enter dungeon {task.dungeon_id} on floor {task.floor_id}.\n{brc}")
+
+
+def load_dungeons(args, db_wrapper, current_dungeons, api_client):
+    """Scrapes data for all current dungeons.
+
+    The stored entry counts for every floor are loaded up front. Floors without enough 'new'
+    data are scraped, largest deficit first. Afterwards, for floors with an acceptable amount
+    of data and some 'old' data, the old data is migrated to a backup database and then purged.
+
+    We only purge if we have an acceptable amount of new data to prevent us from
+    erasing useful data for dungeons we can't actually enter.
+    """
+    floors = plan_floors(args, current_dungeons)
+    load_wave_counts(args, db_wrapper, floors)
+    entry_count = sum(f.older_count + f.newer_count for f in floors)
+
+    # Sorted is stable, so ties stay in dungeon/floor order.
+    scrape_plan = sorted([f for f in floors if f.should_enter], key=lambda f: f.deficit, reverse=True)
+    print(f'Scraping {len(scrape_plan)} of {len(floors)} floors')
+
+    try:
+        if not args.doupdates:
+            print('skipping scrape due to dry run')
+        elif args.account_config:
+            scrape_concurrently(args, db_wrapper, scrape_plan)
+        else:
+            scrape_serially(args, db_wrapper, scrape_plan, api_client)
+    finally:
+        # Waves stored before a failure still need processing.
+        if scrape_plan and args.doupdates:
+            load_wave_counts(args, db_wrapper, floors)
+            if sum(f.older_count + f.newer_count for f in floors) != entry_count:
+                mark_waves_updated(args)
+
+    for floor in floors:
+        dungeon_id = floor.dungeon.dungeon_id
+        floor_id = floor.floor_id
+        if not floor.should_purge:
+            continue
+        print(f'Entries for floor {floor_id} of {dungeon_id}:'
+              f' old={floor.older_count} new={floor.newer_count} purging=True')
+
+        # This section cleans up 'old' data. We consider data to be out of date if approximately 3 months have
+        # passed. If we have the opportunity to scrape a dungeon (e.g. a collab) that comes back, we will. It will
+        # also ensure that the normal/technical data is up to date.
+        try:
+            with db_wrapper.transaction(), db_wrapper.connection.cursor() as cursor:
+                sql = MIGRATE_OLD_DATA_SQL.format(age=args.maximum_wave_age,
+                                                  dungeon_id=dungeon_id,
+                                                  floor_id=floor_id)
+                db_wrapper.execute(cursor, sql)
+                migrate_count = cursor.rowcount
+                if migrate_count < floor.older_count:  # The older_count is the number of entries, this is raw rows
+                    raise ValueError('wrong migrate count:', migrate_count, 'vs', floor.older_count)
+
+                sql = DELETE_OLD_DATA_SQL.format(age=args.maximum_wave_age,
+                                                 dungeon_id=dungeon_id,
+                                                 floor_id=floor_id)
+                db_wrapper.execute(cursor, sql)
+                delete_count = cursor.rowcount
+                if delete_count != migrate_count:  # Compare what we migrated against what we deleted
+                    raise ValueError('wrong delete count:', delete_count, 'vs', migrate_count)
+            print('migration complete')
+            mark_waves_updated(args)
+        except Exception as ex:
+            print('failed to migrate data:', ex)
+            continue
+
+        # Drop the purged waves from the summary as well. This runs in its own transaction once the purge has
+        # committed, so resummarizing the floor doesn't hold the purge's locks on wave_data.
+        try:
+            WaveSummaryProcessor().rebuild_floor(db_wrapper, dungeon_id, floor_id)
+        except Exception as ex:
+            print('failed to rebuild the wave summary:', ex)
+
+
+def mark_waves_updated(args):
+    if args.waves_updated_marker:
+        pathlib.Path(args.waves_updated_marker).touch()
 
 
 def identify_dungeons(database):
@@ -250,7 +390,7 @@ def load_data(args):
         fail_logger.addHandler(logging.FileHandler('/tmp/autodungeon_processor_issues.txt', mode='w'))
 
     pad_db = merged_database.Database(server, args.input_dir)
-    pad_db.load_database(skip_skills=True, skip_extra=True)
+    pad_db.load_database(skip_skills=True, skip_extra=True, skip_cards=True, skip_enemy_skills=True)
 
     with open(args.db_config) as f:
         db_config = json.load(f)
@@ -261,17 +401,12 @@ def load_data(args):
 
     dungeons = identify_dungeons(pad_db)
 
-    if server == Server.na:
-        endpoint = pad_api.ServerEndpoint.NA
-    elif server == Server.jp:
-        endpoint = pad_api.ServerEndpoint.JA
-    else:
-        raise Exception('unexpected server:' + args.server)
-
-    api_client = pad_api.PadApiClient(endpoint, args.user_uuid, args.user_intid)
-    api_client.login()
-    print('load_player_data')
-    api_client.load_player_data()
+    api_client = None
+    if not args.account_config:
+        api_client = make_api_client(args.server, args.user_uuid, args.user_intid, args.api_url)
+        api_client.login()
+        print('load_player_data')
+        api_client.load_player_data()
 
     load_dungeons(args, db_wrapper, dungeons, api_client)
 
@@ -4,14 +4,16 @@ Loads the raw data files for NA/JP into intermediate structures, saves them,
 then updates the database with the new data.
 """
 import argparse
+import contextlib
 import json
 import logging
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from pad.common.shared_types import Server
 from pad.db.db_util import DbWrapper
-from pad.raw_processor import crossed_data, merged_database
+from pad.raw import card_table
+from pad.raw_processor import crossed_data, entity_changes, merged_database
 from pad.storage_processor.awoken_skill_processor import AwokenSkillProcessor
 from pad.storage_processor.dimension_processor import DimensionProcessor
 from pad.storage_processor.dungeon_content_processor import DungeonContentProcessor
@@ -94,6 +96,17 @@ def parse_args():
                              action="store_true", help="Enables actions")
     input_group.add_argument("--logsql", default=False,
                              action="store_true", help="Logs sql commands")
+    input_group.add_argument("--use_snapshots", default=False, action="store_true",
+                             help="Diff against in-memory table snapshots and only write changed rows")
+    input_group.add_argument("--processor_transactions", default=False, action="store_true",
+                             help="Run each processor in one transaction, committed only when it finishes,"
+                                  " instead of autocommitting every write")
+    input_group.add_argument("--wave_summary", default=False, action="store_true",
+                             help="Compute dungeon contents from the incrementally updated wave_summary table")
+    input_group.add_argument("--force_dungeons", default=False, action="store_true",
+                             help="Recompute all dungeon contents, even where waves and cards are unchanged")
+    input_group.add_argument("--workers", type=int, default=1,
+                             help="Number of processes used to compute dungeon contents")
     input_group.add_argument("--skipintermediate", default=False,
                              action="store_true", help="Skips the slow intermediate storage")
     input_group.add_argument("--db_config", required=True, help="JSON database info")
@@ -101,6 +114,12 @@ def parse_args():
                              help="Should we run dev processes")
     input_group.add_argument("--input_dir", required=True,
                              help="Path to a folder where the input data is")
+    input_group.add_argument("--load_workers", type=int, default=3,
+                             help="Number of processes used to load the JP/NA/KR data")
+    input_group.add_argument("--db_cache_dir", help="Folder to cache the parsed raw data in between runs")
+    input_group.add_argument("--entity_snapshot_dir",
+                             help="Folder to keep per-entity hashes in, so the monster, enemy skill and dungeon"
+                                  " processors only store what changed since their last successful run")
     input_group.add_argument("--es_dir",
                              help="Path to a folder where the enemy skills data protos are")
     input_group.add_argument("--es_only", default=False, action="store_true",
@@ -118,6 +137,8 @@ def parse_args():
                               help="Path to a folder where output should be saved")
     output_group.add_argument("--pretty", default=False, action="store_true",
                               help="Controls pretty printing of results")
+    output_group.add_argument("--stat_table_file",
+                              help="CSV file to write the HP/ATK/RCV of each monster at levels 1-120 to")
 
     help_group = parser.add_argument_group("Help")
     help_group.add_argument("-h", "--help", action="help",
@@ -130,7 +151,7 @@ def load_es_quick_and_die(args):
         db_config = json.load(f)
 
     jp_database = merged_database.Database(Server.jp, args.input_dir)
-    jp_database.load_database()
+    jp_database.load_database(cache_dir=args.db_cache_dir)
     cs_database = crossed_data.CrossServerDatabase(jp_database, jp_database, jp_database)
 
     db_wrapper = DbWrapper(False)
@@ -143,6 +164,15 @@ def load_es_quick_and_die(args):
     exit(0)
 
 
+def save_stat_table(file_path: str, db: crossed_data.CrossServerDatabase):
+    """Writes the per-level player stats, replacing file_path only once the whole table is written."""
+    cards = db.ownable_cards
+    table = card_table.CardTable([c.cur_card.card for c in cards], [c.monster_id for c in cards])
+    tmp_file = file_path + '_tmp'
+    card_table.save_stat_table(tmp_file, table)
+    os.replace(tmp_file, file_path)
+
+
 def load_data(args):
     if args.processors == "None":
         return
@@ -151,15 +181,29 @@ def load_data(args):
         logging.getLogger('database').setLevel(logging.DEBUG)
     dry_run = not args.doupdates
 
-    logger.info('Loading data')
-    jp_database = merged_database.Database(Server.jp, args.input_dir)
-    jp_database.load_database()
+    processors = []
+    for proc in args.processors.split(","):
+        proc = proc.strip()
+        if proc in type_name_to_processor:
+            processors.extend(type_name_to_processor[proc])
+        else:
+            logger.warning("Unknown processor: {}\nSkipping...".format(proc))
 
-    na_database = merged_database.Database(Server.na, args.input_dir)
-    na_database.load_database()
+    if args.skipintermediate:
+        # Processors without DATA_SECTIONS don't read the cross-server data.
+        sections = set()
+        for proc in processors:
+            sections.update(getattr(proc, 'DATA_SECTIONS', []))
+        if args.stat_table_file:
+            sections.add(crossed_data.CARDS)
+    else:
+        # The intermediate files cover everything.
+        sections = crossed_data.ALL_SECTIONS
+    logger.info('Loading data for sections: %s', sorted(crossed_data.required_sections(sections)))
 
-    kr_database = merged_database.Database(Server.kr, args.input_dir)
-    kr_database.load_database()
+    jp_database, na_database, kr_database = merged_database.load_all(
+        [Server.jp, Server.na, Server.kr], args.input_dir, workers=args.load_workers, cache_dir=args.db_cache_dir,
+        **crossed_data.database_load_args(sections))
 
     if input_args.server.lower() == "combined":
         cs_database = crossed_data.CrossServerDatabase(jp_database, na_database, kr_database, Server.jp)
@@ -175,6 +219,10 @@ def load_data(args):
     if args.media_dir:
         cs_database.load_extra_image_info(args.media_dir)
 
+    if args.stat_table_file:
+        logger.info('Writing the monster stat table')
+        save_stat_table(args.stat_table_file, cs_database)
+
     if not args.skipintermediate:
         logger.info('Storing intermediate data')
         # This is supported for https://pad.chesterip.cc/ and PadSpike, until we can support it better in the dg db
@@ -186,89 +234,134 @@ def load_data(args):
     with open(args.db_config) as f:
         db_config = json.load(f)
 
-    db_wrapper = DbWrapper(dry_run)
+    db_wrapper = DbWrapper(dry_run, use_snapshots=args.use_snapshots)
     db_wrapper.connect(db_config)
 
-    processors = []
-    for proc in args.processors.split(","):
-        proc = proc.strip()
-        if proc in type_name_to_processor:
-            processors.extend(type_name_to_processor[proc])
-        else:
-            logger.warning("Unknown processor: {}\nSkipping...".format(proc))
+    change_tracker = None
+    if args.entity_snapshot_dir:
+        change_tracker = entity_changes.ChangeTracker(args.entity_snapshot_dir, args.server, cs_database)
+
+    def changes_for(proc) -> Optional[entity_changes.ChangeSet]:
+        if change_tracker is None:
+            return None
+        return change_tracker.changes(proc.__name__, proc.DATA_SECTIONS)
+
+    def save_changes(proc):
+        """Called once a processor has stored everything; a failed run leaves the old snapshot in place."""
+        if change_tracker is not None and not dry_run:
+            change_tracker.save(proc.__name__, proc.DATA_SECTIONS)
+
+    def processor_transaction():
+        """Runs a processor in its own transaction if requested, otherwise autocommits."""
+        if not args.processor_transactions:
+            return contextlib.nullcontext()
+        return db_wrapper.transaction()
 
     # Load dimension tables
     if DimensionProcessor in processors:
-        DimensionProcessor().process(db_wrapper)
+        with processor_transaction():
+            DimensionProcessor().process(db_wrapper)
 
     # # Load rank data
     if RankRewardProcessor in processors:
-        RankRewardProcessor().process(db_wrapper)
+        with processor_transaction():
+            RankRewardProcessor().process(db_wrapper)
 
     # # Ensure awakenings
     if AwokenSkillProcessor in processors:
-        AwokenSkillProcessor().process(db_wrapper)
+        with processor_transaction():
+            AwokenSkillProcessor().process(db_wrapper)
 
     # # Ensure tags
     if SkillTagProcessor in processors:
-        SkillTagProcessor().process(db_wrapper)
+        with processor_transaction():
+            SkillTagProcessor().process(db_wrapper)
 
     # # Load enemy skills
     if EnemySkillProcessor in processors:
-        es_processor = EnemySkillProcessor(db_wrapper, cs_database)
-        es_processor.load_static()
-        es_processor.load_enemy_skills()
-        if args.es_dir:
-            es_processor.load_enemy_data(args.es_dir)
+        es_changes = changes_for(EnemySkillProcessor)
+        with processor_transaction():
+            es_processor = EnemySkillProcessor(db_wrapper, cs_database,
+                                               monster_ids=es_changes and es_changes.monster_ids,
+                                               enemy_skill_ids=es_changes and es_changes.enemy_skill_ids)
+            es_processor.load_static()
+            es_processor.load_enemy_skills()
+            if args.es_dir:
+                es_processor.load_enemy_data(args.es_dir)
+        save_changes(EnemySkillProcessor)
 
     # Load basic series data
     if SeriesProcessor in processors:
-        SeriesProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            SeriesProcessor(cs_database).process(db_wrapper)
 
     # # Load monster data
     if MonsterProcessor in processors:
-        MonsterProcessor(cs_database).process(db_wrapper)
+        monster_changes = changes_for(MonsterProcessor)
+        with processor_transaction():
+            MonsterProcessor(cs_database,
+                             monster_ids=monster_changes and monster_changes.monster_ids).process(db_wrapper)
+        save_changes(MonsterProcessor)
 
     # # Ensure Latents
     if LatentSkillProcessor in processors:
-        LatentSkillProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            LatentSkillProcessor(cs_database).process(db_wrapper)
 
     # Egg machines
     if EggMachineProcessor in processors:
-        EggMachineProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            EggMachineProcessor(cs_database).process(db_wrapper)
 
     # Load dungeon data
     dungeon_processor = None
     if DungeonProcessor in processors:
-        dungeon_processor = DungeonProcessor(cs_database)
-        dungeon_processor.process(db_wrapper)
+        dungeon_changes = changes_for(DungeonProcessor)
+        with processor_transaction():
+            dungeon_processor = DungeonProcessor(cs_database,
+                                                 dungeon_ids=dungeon_changes and dungeon_changes.dungeon_ids)
+            dungeon_processor.process(db_wrapper)
+        save_changes(DungeonProcessor)
 
     if DungeonContentProcessor in processors and input_args.server.lower() == "combined":
         # Load dungeon data derived from wave info
-        DungeonContentProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            DungeonContentProcessor(cs_database,
+                                    use_wave_summary=args.wave_summary,
+                                    force=args.force_dungeons,
+                                    workers=args.workers).process(db_wrapper)
 
     # Toggle any newly-available dungeons visible
     if dungeon_processor is not None:
-        dungeon_processor.post_encounter_process(db_wrapper)
+        with processor_transaction():
+            dungeon_processor.post_encounter_process(db_wrapper)
 
     # Load event data
     if ScheduleProcessor in processors:
-        ScheduleProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            ScheduleProcessor(cs_database).process(db_wrapper)
 
     # Load exchange data
     if ExchangeProcessor in processors:
-        ExchangeProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            ExchangeProcessor(cs_database).process(db_wrapper)
 
     # Load purchase data
     if PurchaseProcessor in processors:
-        PurchaseProcessor(cs_database).process(db_wrapper)
+        with processor_transaction():
+            PurchaseProcessor(cs_database).process(db_wrapper)
 
     # Update timestamps
     if ExchangeProcessor in processors:
-        TimestampProcessor().process(db_wrapper)
+        with processor_transaction():
+            TimestampProcessor().process(db_wrapper)
 
     if PurgeDataProcessor in processors:
-        PurgeDataProcessor().process(db_wrapper)
+        with processor_transaction():
+            PurgeDataProcessor().process(db_wrapper)
+
+    for summary in db_wrapper.snapshot_summary():
+        logger.info('Snapshot %s', summary)
 
     logger.info('Done')
 
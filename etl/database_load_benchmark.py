@@ -0,0 +1,64 @@
+"""
+Times loading the JP/NA/KR raw data, comparing merged_database.load_all in this process against its forked
+worker pool, and how much of the pooled time goes to pickling each Database back to the parent.
+"""
+import argparse
+import pickle
+import time
+
+from pad.common.shared_types import Server
+from pad.raw_processor import crossed_data, merged_database
+
+SERVERS = [Server.jp, Server.na, Server.kr]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks loading the raw data.", add_help=False)
+
+    input_group = parser.add_argument_group("Input")
+    input_group.add_argument("--input_dir", required=True,
+                             help="Path to a folder where the raw input data is")
+    input_group.add_argument("--db_cache_dir", help="Folder the parsed raw data is cached in, to time cached loads")
+    input_group.add_argument("--workers", type=int, default=3, help="Number of processes for the pooled load")
+    input_group.add_argument("--rounds", type=int, default=3, help="Number of loads of each kind")
+
+    help_group = parser.add_argument_group("Help")
+    help_group.add_argument("-h", "--help", action="help",
+                            help="Displays this help message and exits.")
+    return parser.parse_args()
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(args):
+    load_args = crossed_data.database_load_args(crossed_data.ALL_SECTIONS)
+    if args.db_cache_dir:
+        load_args['cache_dir'] = args.db_cache_dir
+    print('{} servers, {} workers, {} rounds'.format(len(SERVERS), args.workers, args.rounds))
+
+    def load(workers):
+        return lambda: merged_database.load_all(SERVERS, args.input_dir, workers=workers, **load_args)
+
+    results = {
+        'serial': [timed(load(1)) for _ in range(args.rounds)],
+        'pooled': [timed(load(args.workers)) for _ in range(args.rounds)],
+    }
+    for name, times in results.items():
+        print('{}: {:.2f}s (min of {})'.format(name, min(times), len(times)))
+
+    # What the pool adds on top of parsing: each worker pickles its Database and the parent unpickles it.
+    databases = merged_database.load_all(SERVERS, args.input_dir, workers=1, **load_args)
+    for database in databases:
+        data = []
+        dump_time = timed(lambda: data.append(pickle.dumps(database, pickle.HIGHEST_PROTOCOL)))
+        load_time = timed(lambda: pickle.loads(data[0]))
+        print('{}: {:.1f} MB pickled, dump {:.2f}s, load {:.2f}s'.format(
+            database.server.name, len(data[0]) / 1e6, dump_time, load_time))
+
+
+if __name__ == '__main__':
+    main(parse_args())
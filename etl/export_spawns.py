@@ -55,9 +55,8 @@ def load_data(args):
         db_config = json.load(f)
     db_wrapper = DbWrapper()
     db_wrapper.connect(db_config)
-    data = db_wrapper.fetch_data(ENCOUNTER_QUERY)
     output = {}
-    for encounter in data:
+    for encounter in db_wrapper.stream(ENCOUNTER_QUERY):
         sdgid = encounter['sdgid']
         floor = encounter['floor']
         spawn = {'id': encounter['enemy_id'], 'lv': encounter['level']}
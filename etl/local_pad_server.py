@@ -0,0 +1,54 @@
+import argparse
+import logging
+
+from pad.api.local_server import LocalPadServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serves a local stand-in for the PAD API.", add_help=False)
+
+    input_group = parser.add_argument_group("Input")
+    input_group.add_argument("--fixture_dir", help="Folder with <action>.json download responses, e.g. a pull output")
+    input_group.add_argument("--waves_file",
+                             help="JSON of recorded waves keyed by 'dungeon_id/floor_id'; random waves otherwise")
+    input_group.add_argument("--seed", type=int, help="Random seed for latency, errors and waves")
+
+    server_group = parser.add_argument_group("Server")
+    server_group.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    server_group.add_argument("--latency_ms", type=float, default=0, help="Added latency per request")
+    server_group.add_argument("--latency_jitter_ms", type=float, default=0, help="Random +/- latency per request")
+    server_group.add_argument("--error", action="append", default=[], metavar="CODE:RATE",
+                              help="Fail this fraction of requests with a response code, e.g. 2:0.01; repeatable")
+
+    help_group = parser.add_argument_group("Help")
+    help_group.add_argument("-h", "--help", action="help",
+                            help="Displays this help message and exits.")
+
+    return parser.parse_args()
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO)
+    error_rates = {}
+    for error in args.error:
+        code, rate = error.split(':')
+        error_rates[int(code)] = float(rate)
+
+    server = LocalPadServer(fixture_dir=args.fixture_dir,
+                            waves_file=args.waves_file,
+                            port=args.port,
+                            latency=args.latency_ms / 1000,
+                            latency_jitter=args.latency_jitter_ms / 1000,
+                            error_rates=error_rates,
+                            seed=args.seed)
+    print('Use --api_url={} with the pull scripts'.format(server.api_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print('Requests served:', server.request_counts)
+
+
+if __name__ == '__main__':
+    main(parse_args())
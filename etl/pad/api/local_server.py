@@ -0,0 +1,213 @@
+"""
+A local stand-in for the PAD API, for exercising and load testing the pull and scrape scripts offline.
+
+Download actions are served from fixture files named <action>.json, which is the layout
+pad_data_pull.py writes, so a previous pull's output directory can be used directly. Login,
+player data and sneak_dungeon responses are synthetic. Waves come from a recorded waves file
+if one is given, otherwise they're randomly generated; either way they're encoded with
+dungeon_encoding, like the real responses.
+
+Doesn't validate keys or sessions.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('local_server')
+
+# The download actions served from fixture files.
+FIXTURE_ACTIONS = [
+    'download_card_data',
+    'download_dungeon_data',
+    'download_skill_data',
+    'download_enemy_skill_data',
+    'download_limited_bonus_data',
+    'mdatadl',
+    'shop_item',
+    'dl_al',
+]
+
+
+def synthetic_player_data(base_url: str, card_count: int = 10) -> dict:
+    """Enough player data for PlayerDataResponse and dungeon entry: a deck of cards and spares to use as helpers."""
+    cards = []
+    for card_uuid in range(1, card_count + 1):
+        # uuid, exp, level, skill level, feed count, card id, +hp, +atk, +rcv, awakenings, latents, assist uuid,
+        # unknown, super awakening, unknown
+        cards.append([card_uuid, 0, 99, 1, 0, card_uuid, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+    return {
+        'res': 0,
+        'curDeck': 0,
+        'decksb': {'fmt': 1, 'decks': [[1, 2, 3, 4, 5, 9, 0, 0, 0]]},
+        'card': cards,
+        'friends': [],
+        'egatya3': [],
+        'gmsg': base_url + '/gmsg',
+    }
+
+
+def synthetic_floors(rng: random.Random) -> List[List[List[int]]]:
+    """Random waves in the raw response layout; the last stage is the boss."""
+    floors = []
+    stage_count = rng.randint(1, 5)
+    for stage in range(stage_count):
+        monsters = []
+        for _ in range(rng.randint(1, 4)):
+            # spawn type, monster id, level, drop monster id, drop monster level, plus amount
+            drop_monster_id = rng.choice([0, 0, 0, rng.randint(1, 5000)])
+            monsters.append([1 if stage == stage_count - 1 else 0, rng.randint(1, 5000), rng.randint(1, 99),
+                             drop_monster_id, 1 if drop_monster_id else 0, 0])
+        floors.append(monsters)
+    return floors
+
+
+def encode_floors(floors: List[List[List[int]]]) -> str:
+    """Encodes waves so that pad_api.parse_wave_response can decode them."""
+    from pad.api import dungeon_encoding
+    wave_str = 'e="w":{}&'.format(json.dumps(floors, separators=(',', ':')))
+    return dungeon_encoding.encodePadDungeon(wave_str, 0x23)
+
+
+class LocalPadServer(object):
+    """Serves the PAD API on localhost; point PadApiClient's api_url at api_url.
+
+    latency and latency_jitter are in seconds. error_rates maps response codes (see
+    pad_api.RESPONSE_CODES) to the fraction of requests that fail with them.
+    """
+
+    def __init__(self,
+                 fixture_dir: Optional[str] = None,
+                 waves_file: Optional[str] = None,
+                 port: int = 0,
+                 latency: float = 0,
+                 latency_jitter: float = 0,
+                 error_rates: Optional[Dict[int, float]] = None,
+                 seed: Optional[int] = None):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rates = error_rates or {}
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+
+        # Recorded waves, keyed by 'dungeon_id/floor_id'; each is a list of entries in the raw response layout.
+        self.recorded_waves = {}  # type: Dict[str, List[List[List[List[int]]]]]
+        if waves_file:
+            with open(waves_file) as f:
+                self.recorded_waves = json.load(f)
+
+        self.request_counts = {}  # type: Dict[str, int]
+        self.httpd = ThreadingHTTPServer(('localhost', port), self._handler_class())
+        self.thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def base_url(self) -> str:
+        return 'http://localhost:{}'.format(self.httpd.server_address[1])
+
+    @property
+    def api_url(self) -> str:
+        return self.base_url + '/api.php'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info('serving PAD API at %s', self.api_url)
+
+    def serve_forever(self):
+        logger.info('serving PAD API at %s', self.api_url)
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def respond(self, params: Dict[str, str]) -> dict:
+        """Returns the JSON response for a request's query parameters."""
+        action = params.get('action')
+        with self.rng_lock:
+            self.request_counts[action] = self.request_counts.get(action, 0) + 1
+            delay = max(0, self.latency + self.rng.uniform(-self.latency_jitter, self.latency_jitter))
+            error_roll = self.rng.random()
+        if delay:
+            time.sleep(delay)
+
+        for code, rate in self.error_rates.items():
+            if error_roll < rate:
+                return {'res': code}
+            error_roll -= rate
+
+        if action == 'login':
+            return {'res': 0, 'sid': uuid.uuid4().hex}
+        elif action == 'get_player_data':
+            return synthetic_player_data(self.base_url)
+        elif action == 'get_recommended_helpers':
+            return {'res': 0, 'helpers': []}
+        elif action == 'save_decks':
+            return {'res': 0}
+        elif action == 'sneak_dungeon':
+            return {'res': 0, 'e': encode_floors(self._floors(params.get('dung'), params.get('floor')))}
+        elif action in FIXTURE_ACTIONS:
+            return self._fixture(action)
+        else:
+            logger.warning('unexpected action: %s', action)
+            return {'res': 1}
+
+    def _floors(self, dungeon_id: str, floor_id: str) -> List[List[List[int]]]:
+        with self.rng_lock:
+            recorded = self.recorded_waves.get('{}/{}'.format(dungeon_id, floor_id))
+            if recorded:
+                return self.rng.choice(recorded)
+            return synthetic_floors(self.rng)
+
+    def _fixture(self, action: str) -> dict:
+        file_path = os.path.join(self.fixture_dir or '', action + '.json')
+        if not self.fixture_dir or not os.path.exists(file_path):
+            logger.warning('no fixture for %s, returning an empty response', action)
+            return {'res': 0}
+        with open(file_path) as f:
+            return json.load(f)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Allows keep-alive connections, like the real server.
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self._reply(urllib.parse.urlparse(self.path).query)
+
+            def do_POST(self):
+                # Post data (e.g. decks) is ignored, only the query matters.
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._reply(urllib.parse.urlparse(self.path).query)
+
+            def _reply(self, query: str):
+                params = dict(urllib.parse.parse_qsl(query, keep_blank_values=True))
+                body = json.dumps(server.respond(params)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                logger.debug(fmt, *args)
+
+        return Handler
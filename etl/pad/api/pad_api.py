@@ -7,12 +7,15 @@ Requires dungeon_encoding which is not checked in.
 import json
 import math
 import random
+import time
 import urllib
 from enum import Enum
 from typing import Callable
 
 import requests
 from fake_useragent import UserAgent
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from padtools.servers.server import Server
 
 from pad.api import dungeon_encoding, keygen
@@ -169,11 +172,33 @@ def parse_wave_response(encrypted_wave_data: str) -> WaveResponse:
     return WaveResponse(json.loads(wave_data))
 
 
+def make_session(pool_size: int = 10, retries: int = 3, backoff: float = 0.5) -> requests.Session:
+    """A keep-alive session that retries failed connections and 5xx responses with exponential backoff.
+
+    Only GETs are retried at the HTTP level; the pool is sized for pool_size concurrent requests per host.
+    """
+    retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff,
+                  status_forcelist=[500, 502, 503, 504], allowed_methods=frozenset(['GET']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
 class PadApiClient(object):
     OSV = '6.0'
     DEV = 'bullhead'
 
-    def __init__(self, endpoint: ServerEndpoint, user_uuid: str, user_intid: str):
+    # Initial delay before retrying invalid JSON or a 'try again' (res:1) response; doubles each attempt.
+    RETRY_BACKOFF = 0.5
+
+    def __init__(self, endpoint: ServerEndpoint, user_uuid: str, user_intid: str,
+                 api_url: str = None, server_version: str = None):
+        """api_url overrides the API base URL, e.g. to point at the local stand-in server.
+
+        When it's set the live server isn't contacted for the version; server_version is used, or 0.0.
+        """
         # Server-specific key generation function
         self.keygen_fn = endpoint.value.keygen_fn
 
@@ -184,13 +209,16 @@ class PadApiClient(object):
         self.server = endpoint.value.server
 
         # Current version string
-        self.server_v = endpoint.value.force_v or self.server.version
+        if api_url:
+            self.server_v = server_version or endpoint.value.force_v or '0.0'
+        else:
+            self.server_v = server_version or endpoint.value.force_v or self.server.version
 
         # Stripped version string
         self.server_r = self.server_v.replace('.', '')
 
         # Base URL to use for API calls
-        self.server_api_endpoint = self.server.base['base']
+        self.server_api_endpoint = api_url or self.server.base['base']
 
         # Hostname for the base URL to use in the headers
         self.server_host = urllib.parse.urlparse(self.server_api_endpoint).hostname
@@ -198,6 +226,9 @@ class PadApiClient(object):
         # Headers to use in every API call
         self.default_headers = get_headers(self.server_host)
 
+        # Keep-alive session shared by every call; safe to use from several threads
+        self.session = make_session()
+
         # The UUID of the user (with dashes) unique to each device transfer
         # 1ab232ac-1235-4789-6dfg-123456789abc
         self.user_uuid = user_uuid
@@ -398,7 +429,7 @@ class PadApiClient(object):
         if attempts_remaining <= 0:
             raise ValueError("Invalid JSON.  Out of tries.")
 
-        s = session or requests.Session()
+        s = session or self.session
         if post_data:
             req = requests.Request('POST', url, headers=self.default_headers, data=post_data)
         else:
@@ -407,11 +438,13 @@ class PadApiClient(object):
         r = s.send(p)
         try:
             result_json = r.json()
+            response_code = result_json.get('res', 0)
         except json.JSONDecodeError:
-            return self.get_json_results(url, post_data, attempts_remaining=attempts_remaining-1)
-        response_code = result_json.get('res', 0)
+            response_code = 1
         if response_code == 1:
-            return self.get_json_results(url, post_data, attempts_remaining=attempts_remaining-1)
+            if attempts_remaining > 1:
+                time.sleep(self.RETRY_BACKOFF * 2 ** (5 - attempts_remaining))
+            return self.get_json_results(url, post_data, session=session, attempts_remaining=attempts_remaining-1)
         elif response_code != 0:
             raise BadResponseCode(response_code)
         return result_json
@@ -430,8 +463,7 @@ class PadApiClient(object):
         ua = UserAgent()
         headers = {'User-Agent': ua.chrome}
 
-        s = requests.Session()
         req = requests.Request('GET', final_url, headers=headers)
         p = req.prepare()
-        r = s.send(p)
+        r = self.session.send(p)
         return r.text
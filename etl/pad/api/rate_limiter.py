@@ -0,0 +1,51 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket; acquire() blocks until a request is allowed.
+
+    Tokens refill at rate per second up to capacity, so short bursts of up to capacity requests
+    are allowed while the average stays at rate. A rate of None disables limiting.
+    """
+
+    def __init__(self, rate: Optional[float], capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class ServerRateLimiter(object):
+    """One shared TokenBucket per server, so every client for a server draws from the same budget."""
+
+    def __init__(self, rates: Dict[str, Optional[float]], capacity: float = 1):
+        self.buckets = {server.upper(): TokenBucket(rate, capacity) for server, rate in rates.items()}
+        self.lock = threading.Lock()
+        self.capacity = capacity
+
+    def acquire(self, server: str):
+        self.bucket(server).acquire()
+
+    def bucket(self, server: str) -> TokenBucket:
+        server = server.upper()
+        with self.lock:
+            if server not in self.buckets:
+                self.buckets[server] = TokenBucket(None, self.capacity)
+            return self.buckets[server]
@@ -0,0 +1,129 @@
+"""
+Incremental decoding of the large raw JSON files.
+
+The raw files are objects with one big member, e.g. the 'card' array or the 'enemy_skills' CSV
+string. These read that member a piece at a time, so only the piece being parsed and a read buffer
+are in memory rather than the whole document.
+"""
+import json
+import re
+from typing import Any, Iterator
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Inside a string: a newline escape, any other escape, or the closing quote.
+_STRING_TOKEN = re.compile(r'\\n|\\.|"', re.DOTALL)
+
+
+class _JsonReader(object):
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        """Reads more of the file into the buffer, dropping what's been consumed. False at the end of the file."""
+        if self.eof:
+            return False
+        # Read at least as much as is buffered, so an item much larger than a chunk isn't rescanned over and over.
+        data = self.f.read(max(CHUNK_SIZE, len(self.buffer) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace and returns the next character, or '' at the end of the file."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError('expected one of {!r} at offset {}, got {!r}'.format(chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut off by the end of the buffer might continue in the next chunk.
+                if (end < len(self.buffer) and self.buffer[end] not in '.eE+-') or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def find_member(self, key: str):
+        """Skips the members of the top-level object up to key, leaving the reader at its value."""
+        self.expect('{')
+        while self.peek() != '}':
+            name = self.value()
+            self.expect(':')
+            if name == key:
+                return
+            self.value()
+            if self.expect(',}') == '}':
+                break
+        raise KeyError(key)
+
+    def string_lines(self) -> Iterator[str]:
+        """Yields the string at the reader a line at a time, keeping the newlines."""
+        self.expect('"')
+        start = search_pos = self.pos
+        while True:
+            match = _STRING_TOKEN.search(self.buffer, search_pos)
+            if match is None:
+                # Only a backslash at the very end can be the start of an unfinished escape. Refilling
+                # drops the consumed part of the buffer, so positions shift back by start.
+                unfinished = search_pos < len(self.buffer) and self.buffer.endswith('\\')
+                search_pos = len(self.buffer) - start - unfinished
+                self.pos = start
+                if not self._fill():
+                    raise ValueError('unterminated string')
+                start = 0
+                continue
+            token = match.group()
+            if token == '\\n':
+                yield json.loads('"' + self.buffer[start:match.end()] + '"')
+                start = match.end()
+            elif token == '"':
+                if start < match.start():
+                    yield json.loads('"' + self.buffer[start:match.start()] + '"')
+                self.pos = match.end()
+                return
+            search_pos = match.end()
+
+
+def iter_json_array(json_file: str, key: str) -> Iterator[Any]:
+    """Yields the items of the array in the key member of the JSON object in json_file, decoding one at a time."""
+    with open(json_file, encoding='utf-8') as f:
+        reader = _JsonReader(f)
+        reader.find_member(key)
+        reader.expect('[')
+        if reader.peek() == ']':
+            return
+        while True:
+            yield reader.value()
+            if reader.expect(',]') == ']':
+                return
+
+
+def iter_json_string_lines(json_file: str, key: str) -> Iterator[str]:
+    """Yields the string in the key member of the JSON object in json_file a line at a time."""
+    with open(json_file, encoding='utf-8') as f:
+        reader = _JsonReader(f)
+        reader.find_member(key)
+        yield from reader.string_lines()
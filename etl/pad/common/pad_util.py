@@ -128,10 +128,16 @@ def identify_server(json_file: str, server: str) -> str:
     raise Exception('Server not supplied and not automatically detected from path')
 
 
-def load_raw_json(data_dir: str = None, json_file: str = None, file_name: str = None) -> Union[JsonType, ListJsonType]:
-    """Load JSON file."""
+def raw_json_path(data_dir: str = None, json_file: str = None, file_name: str = None) -> str:
+    """The path to json_file, or to file_name in data_dir if json_file isn't set."""
     if json_file is None:
         json_file = os.path.join(data_dir, file_name)
+    return json_file
+
+
+def load_raw_json(data_dir: str = None, json_file: str = None, file_name: str = None) -> Union[JsonType, ListJsonType]:
+    """Load JSON file."""
+    json_file = raw_json_path(data_dir, json_file, file_name)
 
     with open(json_file, encoding='utf-8') as f:
         return json.load(f)
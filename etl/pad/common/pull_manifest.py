@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List
+
+from pad.common.shared_types import dump_helper
+
+MANIFEST_FILE_NAME = 'pull_manifest.json'
+CHANGED_FILES_FILE_NAME = 'changed_files.txt'
+
+
+class PullManifest(object):
+    """Tracks content hashes of the files written by a pull, so unchanged files aren't rewritten.
+
+    The manifest is stored in the pull's output dir, along with version markers from the server.
+    save() also writes changed_files.txt, listing the files whose content changed in this pull
+    (one per line, empty if nothing changed), for the scripts that run after the pull.
+
+    Thread-safe, so endpoints can be written as they're downloaded in parallel.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.file_hashes = {}  # type: Dict[str, str]
+        self.versions = {}  # type: Dict[str, str]
+        self.changed_files = []  # type: List[str]
+        self.lock = threading.Lock()
+
+        manifest_path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.file_hashes = manifest.get('files', {})
+            self.versions = manifest.get('versions', {})
+
+    def write_json(self, file_name: str, obj, pretty=False) -> bool:
+        """Writes obj the same way as pad_util.json_file_dump, if it changed. Returns True if it was written."""
+        indent = 4 if pretty else None
+        contents = json.dumps(obj, indent=indent, sort_keys=True, default=dump_helper, ensure_ascii=False)
+        content_hash = hashlib.sha256(contents.encode('utf-8')).hexdigest()
+
+        output_file = os.path.join(self.output_dir, file_name)
+        with self.lock:
+            if self.file_hashes.get(file_name) == content_hash and os.path.exists(output_file):
+                return False
+            with open(output_file, 'w') as f:
+                f.write(contents)
+            self.file_hashes[file_name] = content_hash
+            self.changed_files.append(file_name)
+            return True
+
+    def set_version(self, name: str, value):
+        """Records a version marker; a changed marker also counts as a change."""
+        value = str(value)
+        with self.lock:
+            if self.versions.get(name) != value:
+                self.versions[name] = value
+                self.changed_files.append(MANIFEST_FILE_NAME)
+
+    def save(self):
+        with self.lock:
+            manifest = {'files': self.file_hashes, 'versions': self.versions}
+            with open(os.path.join(self.output_dir, MANIFEST_FILE_NAME), 'w') as f:
+                json.dump(manifest, f, indent=4, sort_keys=True)
+            with open(os.path.join(self.output_dir, CHANGED_FILES_FILE_NAME), 'w') as f:
+                f.writelines(x + '\n' for x in sorted(set(self.changed_files)))
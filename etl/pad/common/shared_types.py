@@ -1,6 +1,7 @@
+import functools
 import math
 from enum import Enum
-from typing import NewType, Dict, Any, List, Union
+from typing import NewType, Dict, Any, List, Tuple, Union
 
 # Raw data types
 AttrId = NewType('AttrId', int)
@@ -20,6 +21,8 @@ ListJsonType = List[Dict[str, Any]]
 
 class Printable(object):
     """Simple way to make an object printable."""
+    # Empty so that subclasses can use __slots__.
+    __slots__ = ()
 
     def __repr__(self):
         return '{}({})'.format(self.__class__.__name__, dump_helper(self))
@@ -69,12 +72,32 @@ class EvolutionType(Enum):
     non_reversible = 3
 
 
+@functools.lru_cache(maxsize=None)
+def slot_fields(cls: type) -> Tuple[str, ...]:
+    """The fields declared in __slots__ by cls and its bases."""
+    fields = []
+    for c in reversed(cls.__mro__):
+        slots = c.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        fields.extend(x for x in slots if x not in ('__dict__', '__weakref__'))
+    return tuple(fields)
+
+
+def object_fields(x) -> Dict[str, Any]:
+    """The attributes of x, like vars(x), but also covering the fields of classes that use __slots__."""
+    fields = {f: getattr(x, f) for f in slot_fields(type(x)) if hasattr(x, f)}
+    if hasattr(x, '__dict__'):
+        fields.update(vars(x))
+    return fields
+
+
 def dump_helper(x):
     if callable(x):
         return 'fn_obj'
     elif isinstance(x, Enum):
         return str(x)
-    elif hasattr(x, '__dict__'):
-        return vars(x)
+    elif hasattr(x, '__dict__') or slot_fields(type(x)):
+        return object_fields(x)
     else:
         return repr(x)
@@ -1,22 +1,37 @@
 import logging
 import random
-from typing import Callable, List
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 
 import pymysql
 from pymysql import InterfaceError
 
 from pad.common import pad_util
-from .sql_item import SqlItem, _col_compare, _tbl_name_ref, _process_col_mappings, ExistsStrategy
+from .sql_item import SqlItem, _col_compare, _tbl_name_ref, _process_col_mappings, ExistsStrategy, \
+    generate_multi_insert_template
+from .table_snapshot import TableSnapshot
 
 logger = logging.getLogger('database')
 logger.setLevel(logging.ERROR)
 
 
 class DbWrapper(object):
-    def __init__(self, dry_run: bool = True):
+    def __init__(self, dry_run: bool = True, use_snapshots: bool = False):
         self.dry_run = dry_run
         self.connection = None
 
+        # If enabled, insert_or_update_many diffs against a per-run copy of each table.
+        self.use_snapshots = use_snapshots
+        self.snapshots = {}  # type: Dict[str, TableSnapshot]
+
+        # Set while inside transaction(); everything is committed when it exits.
+        self.in_transaction = False
+        self.uncommitted_writes = 0
+
+        self._auto_increment_increment = None  # type: Optional[int]
+        self._consecutive_auto_increment = None  # type: Optional[bool]
+
     def connect(self, db_config):
         logger.debug('DB Connecting')
         self.connection = pymysql.connect(host=db_config['host'],
@@ -25,6 +40,7 @@ class DbWrapper(object):
                                           db=db_config['db'],
                                           charset=db_config['charset'],
                                           cursorclass=pymysql.cursors.DictCursor,
+                                          local_infile=db_config.get('local_infile', False),
                                           autocommit=True)
         logger.info('DB Connected')
 
@@ -37,22 +53,81 @@ class DbWrapper(object):
         try:
             return cursor.execute(sql, args=bindings)
         except InterfaceError:
+            if self.in_transaction:
+                raise  # Reconnecting would silently drop the uncommitted writes
             self.connection.ping()
             return cursor.execute(sql)
 
+    def execute_many(self, cursor, sql, bindings: List[tuple]):
+        logger.debug('Executing: %s with %s binding rows', sql, len(bindings))
+        try:
+            return cursor.executemany(sql, bindings)
+        except InterfaceError:
+            if self.in_transaction:
+                raise  # Reconnecting would silently drop the uncommitted writes
+            self.connection.ping()
+            return cursor.executemany(sql, bindings)
+
+    @contextmanager
+    def transaction(self):
+        """Runs writes in an explicit transaction instead of autocommitting every statement.
+
+        Everything is committed when the block exits, and rolled back if it fails, so a failed
+        block leaves nothing half-written. Nested calls join the outer transaction.
+        """
+        if self.in_transaction:
+            yield
+            return
+
+        self.connection.autocommit(False)
+        self.in_transaction = True
+        self.uncommitted_writes = 0
+        try:
+            yield
+            self.connection.commit()
+        except BaseException:
+            logger.error('rolling back %s uncommitted writes', self.uncommitted_writes)
+            self.connection.rollback()
+            # Snapshots may have recorded rows that never made it to the table.
+            for snapshot in self.snapshots.values():
+                snapshot.stale = True
+            raise
+        finally:
+            self.in_transaction = False
+            self.uncommitted_writes = 0
+            self.connection.autocommit(True)
+
+    def _write_executed(self):
+        if self.in_transaction:
+            self.uncommitted_writes += 1
+
     def fetch_data(self, sql):
         with self.connection.cursor() as cursor:
             self.execute(cursor, sql)
         return list(cursor.fetchall())
 
-    def load_to_key_value(self, key_name, value_name, table_name, where_clause=None):
-        with self.connection.cursor() as cursor:
-            sql = 'SELECT {} AS k, {} AS v FROM {}'.format(key_name, value_name, table_name)
-            if where_clause:
-                sql += ' WHERE ' + where_clause
+    def stream(self, sql, chunk_size: int = 1000) -> Iterator[Dict]:
+        """Yields result rows using an unbuffered server-side cursor.
+
+        The connection can't run other statements until the generator is exhausted or closed.
+        """
+        with self.connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
             self.execute(cursor, sql)
-            data = list(cursor.fetchall())
-            return {row['k']: row['v'] for row in data}
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+
+    def stream_objects(self, obj_type, sql: str, chunk_size: int = 1000) -> Iterator:
+        for row in self.stream(sql, chunk_size):
+            yield obj_type(**_process_col_mappings(obj_type, row))
+
+    def load_to_key_value(self, key_name, value_name, table_name, where_clause=None):
+        sql = 'SELECT {} AS k, {} AS v FROM {}'.format(key_name, value_name, table_name)
+        if where_clause:
+            sql += ' WHERE ' + where_clause
+        return {row['k']: row['v'] for row in self.stream(sql)}
 
     def get_single_or_no_row(self, sql):
         with self.connection.cursor() as cursor:
@@ -105,8 +180,7 @@ class DbWrapper(object):
         return [obj_type(**_process_col_mappings(obj_type, d)) for d in data]
 
     def custom_load_multiple_objects(self, obj_type, lookup_sql: str):
-        data = self.fetch_data(lookup_sql)
-        return [obj_type(**_process_col_mappings(obj_type, d)) for d in data]
+        return list(self.stream_objects(obj_type, lookup_sql))
 
     def check_existing(self, sql: str):
         with self.connection.cursor() as cursor:
@@ -135,6 +209,7 @@ class DbWrapper(object):
                 logger.warning('not inserting item due to dry run')
                 return random.randrange(-99999, -1)
             self.execute(cursor, sql, bindings)
+            self._write_executed()
             data = list(cursor.fetchall())
             num_rows = len(data)
             if num_rows > 0:
@@ -147,6 +222,7 @@ class DbWrapper(object):
                 logger.warning('not running update due to dry run')
                 return 0
             self.execute(cursor, sql)
+            self._write_executed()
             data = list(cursor.fetchall())
             num_rows = len(data)
             if num_rows > 0:
@@ -155,10 +231,15 @@ class DbWrapper(object):
 
     def insert_or_update(self, item: SqlItem, force_insert: bool = False):
         try:
-            return self._insert_or_update(item, force_insert=force_insert)
+            result = self._insert_or_update(item, force_insert=force_insert)
         except Exception as ex:
             logger.fatal('Failed to insert item: %s', pad_util.json_string_dump(item, pretty=True))
             raise ex
+        # The item has its key now, so a loaded snapshot can take it without a reload.
+        snapshot = self.snapshots.get(item._table())
+        if snapshot is not None and not self.dry_run:
+            snapshot.record([item])
+        return result
 
     def _insert_or_update(self, item: SqlItem, force_insert: bool):
         key = item.key_value()
@@ -204,3 +285,181 @@ class DbWrapper(object):
             raise ValueError('Item cannot be upserted: {}'.format(item))
 
         return key
+
+    def insert_or_update_many(self, items: Iterable[SqlItem], chunk_size: int = 500):
+        """Upserts items using chunked multi-row INSERT ... ON DUPLICATE KEY UPDATE statements.
+
+        Items are grouped by table and exists strategy, and groups are written in the order they
+        first appear, so callers can rely on earlier items existing for foreign keys. As with
+        insert_or_update, tstamp is only changed for rows whose update columns changed.
+
+        Items without a key are new rows; they're written with plain multi-row INSERTs and get
+        their generated keys written back.
+        """
+        groups = OrderedDict()
+        for item in items:
+            strategy = item.exists_strategy()
+            if strategy == ExistsStrategy.CUSTOM:
+                raise ValueError('Item cannot be upserted: {}'.format(item))
+            groups.setdefault((item._table(), strategy), []).append(item)
+
+        for (table, strategy), group_items in groups.items():
+            if self.use_snapshots:
+                snapshot = self._load_snapshot(table, group_items[0]._key())
+                group_items = snapshot.diff(group_items)
+            elif strategy == ExistsStrategy.BY_VALUE:
+                group_items = self._resolve_value_keys(group_items, chunk_size)
+            keyed_items = [item for item in group_items if item.key_value()]
+            self._upsert_group(table, keyed_items, chunk_size)
+            self.insert_new_many([item for item in group_items if not item.key_value()], chunk_size)
+            if self.use_snapshots and not self.dry_run:
+                snapshot.record(keyed_items)
+
+    def update_many(self, items: Iterable[SqlItem]):
+        """Updates the update columns of existing rows by key; rows that don't exist are skipped.
+
+        Use this instead of insert_or_update_many for items that don't carry all of the table's
+        required columns, like the MonsterWith* helpers.
+        """
+        groups = OrderedDict()
+        for item in items:
+            groups.setdefault(item._table(), []).append(item)
+
+        for table, group_items in groups.items():
+            if self.use_snapshots:
+                snapshot = self._load_snapshot(table, group_items[0]._key())
+                group_items = [item for item in snapshot.diff(group_items) if snapshot.find(item) is not None]
+
+            by_template = OrderedDict()
+            for item in group_items:
+                template, bindings = item.update_statement()
+                by_template.setdefault(template, []).append(bindings)
+
+            for template, all_bindings in by_template.items():
+                if self.dry_run:
+                    logger.warning('not updating %s items in %s due to dry run', len(all_bindings), table)
+                    continue
+                with self.connection.cursor() as cursor:
+                    updated = self.execute_many(cursor, template, all_bindings)
+                self._write_executed()
+                logger.info('updated %s of %s items in %s', updated, len(all_bindings), table)
+
+            if self.use_snapshots and not self.dry_run:
+                snapshot.record(group_items)
+
+    def _load_snapshot(self, table: str, key_col: str) -> TableSnapshot:
+        snapshot = self.snapshots.get(table)
+        if snapshot is None or snapshot.stale:
+            logger.info('loading snapshot of %s', table)
+            rows = self.fetch_data('SELECT * FROM {}'.format(_tbl_name_ref(table)))
+            new_snapshot = TableSnapshot(table, key_col, rows)
+            if snapshot is not None:
+                new_snapshot.counts = snapshot.counts
+            snapshot = self.snapshots[table] = new_snapshot
+        return snapshot
+
+    def snapshot_summary(self) -> List[str]:
+        """Per-table counts of unchanged, updated and inserted rows seen by insert_or_update_many."""
+        return [s.count_summary() for s in self.snapshots.values()]
+
+    def _resolve_value_keys(self, items: List[SqlItem], chunk_size: int) -> List[SqlItem]:
+        """Looks up keys for BY_VALUE items, a chunk of value_exists_sql queries per round trip.
+
+        Unkeyed items with the same lookup are collapsed to the last one, which is what the
+        insert-then-update sequence of insert_or_update would have left in the table.
+        """
+        by_lookup = OrderedDict()
+        for item in items:
+            by_lookup[item.value_exists_sql().strip().rstrip(';')] = item
+
+        lookups = list(by_lookup.items())
+        for i in range(0, len(lookups), chunk_size):
+            chunk = lookups[i:i + chunk_size]
+            sql = ' UNION ALL '.join('SELECT {} AS lookup_idx, v.* FROM ({}) AS v'.format(idx, lookup_sql)
+                                     for idx, (lookup_sql, _) in enumerate(chunk))
+            found = {}
+            for row in self.fetch_data(sql):
+                idx = row['lookup_idx']
+                if idx in found:
+                    raise ValueError('got too many results:', chunk[idx][0])
+                found[idx] = row
+
+            for idx, (_, item) in enumerate(chunk):
+                row = found.get(idx)
+                key = row[item._key()] if row else None
+                item.set_key_value(int(key) if key is not None else None)
+
+        return list(by_lookup.values())
+
+    def insert_new_many(self, items: List[SqlItem], chunk_size: int = 500):
+        """Inserts unkeyed items as new rows and sets their generated keys.
+
+        With innodb_autoinc_lock_mode 0 or 1, a multi-row INSERT of a known number of rows gets
+        consecutive auto-increment values, so each chunk is one statement and the keys are its lastrowid
+        plus the row offset. In interleaved mode (2, the MySQL 8 default) a concurrent insert can take
+        values in between, so the rows are inserted one at a time and each key is its own lastrowid.
+        """
+        by_table = OrderedDict()
+        for item in items:
+            cols, bindings = item.insert_row()
+            by_table.setdefault((item._table(), cols), []).append((item, bindings))
+
+        for (table, cols), rows in by_table.items():
+            for i in range(0, len(rows), chunk_size):
+                chunk = rows[i:i + chunk_size]
+                if self.dry_run:
+                    logger.warning('not inserting %s items into %s due to dry run', len(chunk), table)
+                    continue
+                if self._has_consecutive_auto_increment():
+                    self._insert_chunk(table, cols, chunk)
+                else:
+                    for row in chunk:
+                        self._insert_chunk(table, cols, [row])
+                if table in self.snapshots:
+                    self.snapshots[table].record([item for item, _ in chunk])
+                logger.info('inserted %s items into %s', len(chunk), table)
+
+    def _insert_chunk(self, table: str, cols, chunk):
+        sql = generate_multi_insert_template(table, cols, len(chunk))
+        bindings = [b for _, row_bindings in chunk for b in row_bindings]
+        with self.connection.cursor() as cursor:
+            self.execute(cursor, sql, bindings)
+            first_key = cursor.lastrowid
+        self._write_executed()
+        increment = self._auto_increment_step()
+        for idx, (item, _) in enumerate(chunk):
+            item.set_key_value(first_key + idx * increment)
+
+    def _auto_increment_step(self) -> int:
+        if self._auto_increment_increment is None:
+            self._auto_increment_increment = self.get_single_value('SELECT @@auto_increment_increment', op=int)
+        return self._auto_increment_increment
+
+    def _has_consecutive_auto_increment(self) -> bool:
+        if self._consecutive_auto_increment is None:
+            lock_mode = self.get_single_value('SELECT @@innodb_autoinc_lock_mode', op=int, fail_on_empty=False)
+            self._consecutive_auto_increment = lock_mode in (0, 1)
+            if not self._consecutive_auto_increment:
+                logger.info('innodb_autoinc_lock_mode is %s, inserting new rows one at a time', lock_mode)
+        return self._consecutive_auto_increment
+
+    def _upsert_group(self, table: str, items: List[SqlItem], chunk_size: int):
+        by_template = OrderedDict()
+        for item in items:
+            template, bindings = item.upsert_statement()
+            by_template.setdefault(template, []).append(bindings)
+
+        for template, all_bindings in by_template.items():
+            for i in range(0, len(all_bindings), chunk_size):
+                chunk = all_bindings[i:i + chunk_size]
+                if self.dry_run:
+                    logger.warning('not upserting %s items into %s due to dry run', len(chunk), table)
+                    continue
+                try:
+                    with self.connection.cursor() as cursor:
+                        self.execute_many(cursor, template, chunk)
+                    self._write_executed()
+                except Exception as ex:
+                    logger.fatal('Failed to upsert %s items into %s, first item: %s', len(chunk), table, chunk[0])
+                    raise ex
+                logger.info('upserted %s items into %s', len(chunk), table)
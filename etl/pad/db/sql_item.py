@@ -3,9 +3,10 @@ import time
 import binascii
 from datetime import datetime, date
 from enum import Enum
-from typing import Any, Dict, Union
+from typing import Any, Dict, Tuple, Union
 
 from pad.common.pad_util import Printable
+from pad.common.shared_types import object_fields
 
 
 def object_to_sql_params(obj: Union[Dict, "SqlItem"]) -> Dict[str, str]:
@@ -13,7 +14,7 @@ def object_to_sql_params(obj: Union[Dict, "SqlItem"]) -> Dict[str, str]:
         d = obj.copy()
         json_keys = []
     else:
-        d = obj.__dict__.copy()
+        d = object_fields(obj)
         json_keys = obj._json_cols()
     d = _process_col_mappings(type(obj), d, reverse=True)
     new_d = {}
@@ -69,6 +70,64 @@ def generate_insert_sql(table_name, cols, item):
     return sql.format(**object_to_sql_params(item))
 
 
+def generate_insert_template(table_name, cols):
+    """Builds a parameterized INSERT with a %s binding per column, suitable for executemany."""
+    sql = 'INSERT INTO {}'.format(_tbl_name_ref(table_name))
+    sql += ' (' + ', '.join(map(_col_name_ref, cols)) + ')'
+    sql += ' VALUES (' + ', '.join(['%s'] * len(cols)) + ')'
+    return sql
+
+
+def generate_multi_insert_template(table_name, cols, row_count: int):
+    """Builds a parameterized multi-row INSERT; one statement, so its generated keys are consecutive."""
+    row = '(' + ', '.join(['%s'] * len(cols)) + ')'
+    sql = 'INSERT INTO {}'.format(_tbl_name_ref(table_name))
+    sql += ' (' + ', '.join(map(_col_name_ref, cols)) + ')'
+    sql += ' VALUES ' + ', '.join([row] * row_count)
+    return sql
+
+
+def generate_upsert_template(table_name, key_col, cols, update_cols):
+    """Builds a parameterized INSERT ... ON DUPLICATE KEY UPDATE with a %s binding per column.
+
+    If the rows are timestamped, tstamp is only replaced when one of the update columns changed.
+    The VALUES clause is kept to plain %s bindings so pymysql's executemany can batch the rows.
+    """
+    sql = generate_insert_template(table_name, cols)
+
+    assignments = []
+    if 'tstamp' in cols and update_cols:
+        # MySQL applies assignments left to right, so this must come before the columns are replaced.
+        unchanged = ' AND '.join('{0} <=> VALUES({0})'.format(_col_name_ref(c)) for c in update_cols)
+        assignments.append('`tstamp` = IF({}, `tstamp`, VALUES(`tstamp`))'.format(unchanged))
+    assignments.extend('{0} = VALUES({0})'.format(_col_name_ref(c)) for c in update_cols)
+    if not assignments:
+        assignments.append('{0} = {0}'.format(_col_name_ref(key_col)))
+
+    sql += ' ON DUPLICATE KEY UPDATE ' + ', '.join(assignments)
+    return sql
+
+
+def generate_update_template(table_name, key_col, update_cols, timestamped: bool):
+    """Builds a parameterized UPDATE of update_cols by key, with a %s binding per column.
+
+    Rows whose update columns already match are left alone, so tstamp only moves when something changed.
+    Bindings are the update values (plus tstamp), the key, then the update values again.
+    """
+    set_cols = list(update_cols) + (['tstamp'] if timestamped else [])
+    sql = 'UPDATE {}'.format(_tbl_name_ref(table_name))
+    sql += ' SET ' + ', '.join('{} = %s'.format(_col_name_ref(c)) for c in set_cols)
+    sql += ' WHERE {} = %s'.format(_col_name_ref(key_col))
+    sql += ' AND NOT (' + ' AND '.join('{} <=> %s'.format(_col_name_ref(c)) for c in update_cols) + ')'
+    return sql
+
+
+def _value_to_binding(v):
+    if type(v) in [datetime]:
+        return v.replace(tzinfo=None)
+    return v
+
+
 # This could maybe move to a class method on SqlItem?
 # Fix usage in load_x_object in db_util.
 def _process_col_mappings(obj_type, d, reverse=False):
@@ -87,7 +146,7 @@ def _full_columns(o: 'SqlItem', remove_cols=None, add_cols=None):
     remove_cols = remove_cols or []
     add_cols = add_cols or []
 
-    cols = set(vars(o).keys())
+    cols = set(object_fields(o).keys())
     # if o.uses_local_primary_key():
     #     cols.discard(o._key())
     cols.discard('tstamp')
@@ -167,6 +226,83 @@ class SqlItem(Printable):
             self.tstamp = int(time.time())
         return generate_insert_sql(self._table(), cols, self)
 
+    def upsert_statement(self) -> Tuple[str, Tuple]:
+        """Returns the parameterized upsert for this item as a (template, bindings) pair.
+
+        Templates are cached on the class per table and per whether the key is set, so column
+        introspection only happens once per type.
+        """
+        template, cols = self._upsert_template()
+        return template, self._column_bindings(cols)
+
+    def insert_row(self) -> Tuple[Tuple[str, ...], Tuple]:
+        """Returns the columns and bindings to insert this item as a new row, for a multi-row INSERT."""
+        _, cols = self._upsert_template()
+        return cols, self._column_bindings(cols)
+
+    def _upsert_template(self) -> Tuple[str, Tuple[str, ...]]:
+        cls = type(self)
+        if '_upsert_templates' not in cls.__dict__:
+            cls._upsert_templates = {}
+        cache_key = (self._table(), bool(self.key_value()))
+        if cache_key not in cls._upsert_templates:
+            cols, update_cols = self._upsert_columns()
+            template = generate_upsert_template(self._table(), self._key(), cols, update_cols)
+            cls._upsert_templates[cache_key] = (template, tuple(cols))
+        return cls._upsert_templates[cache_key]
+
+    def _column_bindings(self, cols) -> Tuple:
+        # If an item is timestamped, the timestamp is written on insert and on changed updates
+        if 'tstamp' in cols:
+            self.tstamp = int(time.time())
+
+        values = object_fields(self)
+        if hasattr(type(self), 'COL_MAPPINGS'):
+            values = _process_col_mappings(type(self), values, reverse=True)
+        return tuple(_value_to_binding(values[c]) for c in cols)
+
+    def update_statement(self) -> Tuple[str, Tuple]:
+        """Returns the parameterized update of this item's update columns as a (template, bindings) pair.
+
+        For helper items that only carry some of a table's columns, where an upsert would fail on the
+        missing NOT NULL columns. Templates are cached on the class per table.
+        """
+        cls = type(self)
+        if '_update_templates' not in cls.__dict__:
+            cls._update_templates = {}
+        if self._table() not in cls._update_templates:
+            update_cols = sorted(c for c in (self._update_columns() or []) if c not in (self._key(), 'tstamp'))
+            if not update_cols:
+                raise ValueError('Item cannot be updated: {}'.format(self))
+            timestamped = hasattr(self, 'tstamp')
+            template = generate_update_template(self._table(), self._key(), update_cols, timestamped)
+            cls._update_templates[self._table()] = (template, update_cols, timestamped)
+        template, update_cols, timestamped = cls._update_templates[self._table()]
+
+        values = object_fields(self)
+        if hasattr(cls, 'COL_MAPPINGS'):
+            values = _process_col_mappings(cls, values, reverse=True)
+        update_values = tuple(_value_to_binding(values[c]) for c in update_cols)
+        if timestamped:
+            self.tstamp = int(time.time())
+            set_values = update_values + (self.tstamp,)
+        else:
+            set_values = update_values
+        return template, set_values + (self.key_value(),) + update_values
+
+    def _upsert_columns(self):
+        key = self._key()
+        update_cols = [c for c in (self._update_columns() or []) if c not in (key, 'tstamp')]
+
+        cols = set(self._insert_columns())
+        cols.update(update_cols)
+        if self.key_value():
+            cols.add(key)
+        if hasattr(self, 'tstamp'):
+            cols.add('tstamp')
+
+        return sorted(cols), sorted(update_cols)
+
     def set_key_value(self, key_value):
         setattr(self, self._key(), key_value)
 
@@ -0,0 +1,155 @@
+import decimal
+import json
+import math
+from collections import Counter, OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from pad.common.shared_types import object_fields
+from .sql_item import SqlItem, ExistsStrategy, _process_col_mappings
+
+
+def _normalize(value):
+    """Converts DB and item values to a common form; e.g. bools vs tinyints, Decimals vs floats."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (float, decimal.Decimal)):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _same_value(item_value, db_value, is_json=False) -> bool:
+    if item_value is None or db_value is None:
+        return item_value is None and db_value is None
+    if is_json:
+        return json.loads(item_value) == json.loads(db_value)
+
+    item_value = _normalize(item_value)
+    db_value = _normalize(db_value)
+    if isinstance(item_value, float) or isinstance(db_value, float):
+        try:
+            # FLOAT columns round-trip with less precision than a python float.
+            return math.isclose(float(item_value), float(db_value), rel_tol=1e-6)
+        except (TypeError, ValueError):
+            return False
+    if type(item_value) != type(db_value):
+        return str(item_value) == str(db_value)
+    return item_value == db_value
+
+
+def _lookup_key(values) -> Tuple:
+    return tuple(None if v is None else str(_normalize(v)) for v in values)
+
+
+def _item_values(item: SqlItem) -> Dict[str, Any]:
+    return _process_col_mappings(type(item), object_fields(item), reverse=True)
+
+
+class TableSnapshot(object):
+    """In-memory copy of a table, loaded once per run.
+
+    Used by DbWrapper to diff items against what is already stored, so that only new or
+    changed rows get written.
+    """
+
+    def __init__(self, table: str, key_col: str, rows: List[Dict[str, Any]]):
+        self.table = table
+        self.key_col = key_col
+        self.rows_by_key = {_lookup_key([r[key_col]]): r for r in rows}
+        self.rows_by_lookup = {}  # type: Dict[Tuple[str, ...], Dict[Tuple, List[Dict[str, Any]]]]
+        self.counts = Counter()
+
+        # Set when the table may no longer match the snapshot, e.g. after a rollback; it must be reloaded.
+        self.stale = False
+
+    def _lookup_index(self, cols: Tuple[str, ...]):
+        if cols not in self.rows_by_lookup:
+            index = {}
+            for row in self.rows_by_key.values():
+                index.setdefault(_lookup_key([row.get(c) for c in cols]), []).append(row)
+            self.rows_by_lookup[cols] = index
+        return self.rows_by_lookup[cols]
+
+    def find(self, item: SqlItem) -> Optional[Dict[str, Any]]:
+        """Returns the stored row matching the item, or None if the item would be an insert."""
+        if item.exists_strategy() == ExistsStrategy.BY_VALUE:
+            cols = tuple(item._lookup_columns())
+            values = _item_values(item)
+            rows = self._lookup_index(cols).get(_lookup_key([values[c] for c in cols]), [])
+            if len(rows) > 1:
+                raise ValueError('got too many results:', len(rows), self.table, cols)
+            return rows[0] if rows else None
+
+        key = item.key_value()
+        return self.rows_by_key.get(_lookup_key([key])) if key else None
+
+    def is_unchanged(self, item: SqlItem, row: Dict[str, Any]) -> bool:
+        values = _item_values(item)
+        json_cols = item._json_cols()
+        update_cols = [c for c in (item._update_columns() or []) if c not in (item._key(), 'tstamp')]
+        return all(_same_value(values[c], row.get(c), c in json_cols) for c in update_cols)
+
+    def diff(self, items: List[SqlItem]) -> List[SqlItem]:
+        """Returns the items that are new or changed, updating the per-table counts.
+
+        BY_VALUE items that match a stored row get its key, like a value_exists_sql lookup would.
+        """
+        changed = OrderedDict()
+        for idx, item in enumerate(items):
+            row = self.find(item)
+            if item.exists_strategy() == ExistsStrategy.BY_VALUE:
+                item.set_key_value(row[self.key_col] if row else None)
+                # Collapse repeated inserts of the same value, keeping the last one.
+                dedupe_key = ('value',) + _lookup_key(_item_values(item)[c] for c in item._lookup_columns())
+            else:
+                dedupe_key = ('idx', idx)
+
+            if row is None:
+                self.counts['inserted'] += 1
+            elif self.is_unchanged(item, row):
+                self.counts['unchanged'] += 1
+                continue
+            else:
+                self.counts['updated'] += 1
+            changed[dedupe_key] = item
+
+        return list(changed.values())
+
+    def record(self, items: List[SqlItem]):
+        """Applies written items to the snapshot so later diffs in the same run see them.
+
+        Items must have their keys, including generated ones; the lookup indexes are updated in place.
+        """
+        for item in items:
+            key = item.key_value()
+            if not key:
+                # Written without learning its key, so the snapshot can't find the row.
+                self.stale = True
+                continue
+            row = self.rows_by_key.get(_lookup_key([key]))
+            if row is None:
+                row = self.rows_by_key[_lookup_key([key])] = {self.key_col: key}
+            else:
+                self._unindex(row)
+            row.update(_item_values(item))
+            self._index(row)
+
+    def _index(self, row: Dict[str, Any]):
+        for cols, index in self.rows_by_lookup.items():
+            index.setdefault(_lookup_key([row.get(c) for c in cols]), []).append(row)
+
+    def _unindex(self, row: Dict[str, Any]):
+        for cols, index in self.rows_by_lookup.items():
+            lookup = _lookup_key([row.get(c) for c in cols])
+            rows = [r for r in index.get(lookup, []) if r is not row]
+            if rows:
+                index[lookup] = rows
+            else:
+                index.pop(lookup, None)
+
+    def count_summary(self) -> str:
+        return '{}: unchanged={} updated={} inserted={}'.format(
+            self.table, self.counts['unchanged'], self.counts['updated'], self.counts['inserted'])
@@ -0,0 +1,183 @@
+"""
+Scrapes dungeon floors concurrently, with one worker thread per account.
+
+Requests for each server share a token bucket, and every worker feeds the same WaveWriter,
+which runs on the calling thread and owns the database connection.
+"""
+import csv
+import logging
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Set, Tuple
+
+from pad.api import pad_api
+from pad.api.pad_api import BadResponseCode, PadApiClient
+from pad.api.rate_limiter import ServerRateLimiter
+from pad.db.db_util import DbWrapper
+from pad.storage.wave import WaveItem, WaveWriter, entry_wave_items
+
+logger = logging.getLogger('autodungeon')
+
+
+class ScrapeAccount(object):
+    def __init__(self, server: str, group: str, user_uuid: str, user_intid: str, starter_color: str):
+        self.server = server.upper()
+        self.group = group
+        self.user_uuid = user_uuid
+        self.user_intid = user_intid
+        self.starter_color = starter_color
+
+    def __str__(self):
+        return '{}/{}'.format(self.server, self.user_intid)
+
+
+def load_accounts(file_path: str, server: Optional[str] = None) -> List[ScrapeAccount]:
+    """Loads accounts in the account_config.csv format, optionally only the ones for server.
+
+    Each line is <[JP,NA]>,<[A,B,C,D,E]>,<uuid>,<int_id>,<RED,GREEN,BLUE>.
+    """
+    with open(file_path) as f:
+        rows = [row for row in csv.reader(f) if row and not row[0].startswith('#')]
+    accounts = [ScrapeAccount(*[x.strip() for x in row[:5]]) for row in rows]
+    if server:
+        accounts = [a for a in accounts if a.server == server.upper()]
+    return accounts
+
+
+class ScrapeTask(object):
+    def __init__(self, dungeon_id: int, floor_id: int, loop_count: int, stamina: int):
+        self.dungeon_id = dungeon_id
+        self.floor_id = floor_id
+        self.loop_count = loop_count
+        self.stamina = stamina
+
+    def __str__(self):
+        return 'dungeon {} floor {}'.format(self.dungeon_id, self.floor_id)
+
+
+class ScrapeScheduler(object):
+    """Runs ScrapeTasks across several accounts at once.
+
+    Tasks are handed out in order to whichever worker is free. A worker logs in again and retries
+    once when its session expires (code 2). When a dungeon can't be entered (code 8), the remaining
+    tasks for it are skipped. Any other error stops every worker and is raised from run().
+    """
+
+    def __init__(self,
+                 db: DbWrapper,
+                 client_factory: Callable[[ScrapeAccount], PadApiClient],
+                 rate_limiter: ServerRateLimiter,
+                 entries_per_flush: int = 10,
+                 use_load_data: bool = False):
+        self.db = db
+        self.client_factory = client_factory
+        self.rate_limiter = rate_limiter
+        self.entries_per_flush = entries_per_flush
+        self.use_load_data = use_load_data
+
+        self.tasks = queue.Queue()  # type: queue.Queue
+        self.entries = None  # type: Optional[queue.Queue]
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.errors = []  # type: List[Exception]
+        self.failures = []  # type: List[Tuple[ScrapeTask, BadResponseCode]]
+        self.failed_dungeon_ids = set()  # type: Set[int]
+        self.pull_id = None
+
+    def run(self, accounts: List[ScrapeAccount],
+            tasks: List[ScrapeTask]) -> List[Tuple[ScrapeTask, BadResponseCode]]:
+        """Scrapes every task and returns the ones that failed because the dungeon couldn't be entered."""
+        if not accounts:
+            raise ValueError('no accounts to scrape with')
+
+        for task in tasks:
+            self.tasks.put(task)
+        self.entries = queue.Queue(maxsize=self.entries_per_flush * len(accounts) * 2)
+        self.pull_id = int(time.time())
+
+        workers = [threading.Thread(target=self._work, args=(account,), name=str(account), daemon=True)
+                   for account in accounts]
+        for worker in workers:
+            worker.start()
+
+        try:
+            with WaveWriter(self.db, self.entries_per_flush, self.use_load_data) as wave_writer:
+                while any(w.is_alive() for w in workers) or not self.entries.empty():
+                    try:
+                        wave_writer.add_entry(self.entries.get(timeout=.5))
+                    except queue.Empty:
+                        pass
+        finally:
+            self.stop.set()
+            for worker in workers:
+                worker.join()
+
+        logger.info('wrote %s entries (%s waves)', wave_writer.written_entries, wave_writer.written_rows)
+        if self.errors:
+            raise self.errors[0]
+        return self.failures
+
+    def _work(self, account: ScrapeAccount):
+        try:
+            client = self.client_factory(account)
+            friend_card = self._login(account, client)
+            while not self.stop.is_set():
+                try:
+                    task = self.tasks.get_nowait()
+                except queue.Empty:
+                    return
+                friend_card = self._scrape(account, client, friend_card, task)
+        except Exception as ex:
+            logger.exception('%s: scrape failed', account)
+            with self.lock:
+                self.errors.append(ex)
+            self.stop.set()
+
+    def _login(self, account: ScrapeAccount, client: PadApiClient):
+        self.rate_limiter.acquire(account.server)
+        client.login()
+        self.rate_limiter.acquire(account.server)
+        client.load_player_data()
+        return client.get_any_card_except_in_cur_deck()
+
+    def _scrape(self, account: ScrapeAccount, client: PadApiClient, friend_card, task: ScrapeTask):
+        logger.info('%s: entering %s %s times', account, task, task.loop_count)
+        for _ in range(task.loop_count):
+            if self.stop.is_set() or task.dungeon_id in self.failed_dungeon_ids:
+                return friend_card
+            try:
+                try:
+                    entry_json = self._enter(account, client, friend_card, task)
+                except BadResponseCode as brc:
+                    if brc.code != 2:
+                        raise
+                    logger.info('%s: attempting relog', account)
+                    friend_card = self._login(account, client)
+                    entry_json = self._enter(account, client, friend_card, task)
+            except BadResponseCode as brc:
+                if brc.code != 8:
+                    raise
+                logger.info('%s: failed to enter %s, skipping dungeon (%s)', account, task, brc)
+                with self.lock:
+                    self.failures.append((task, brc))
+                    self.failed_dungeon_ids.add(task.dungeon_id)
+                return friend_card
+
+            wave_response = pad_api.extract_wave_response_from_entry(entry_json)
+            self._put_entry(entry_wave_items(wave_response, entry_json['entry_leads'], account.server,
+                                             self.pull_id, task.dungeon_id, task.floor_id))
+        return friend_card
+
+    def _enter(self, account: ScrapeAccount, client: PadApiClient, friend_card, task: ScrapeTask):
+        self.rate_limiter.acquire(account.server)
+        return client.enter_dungeon(task.dungeon_id, task.floor_id, self_card=friend_card, stamina=task.stamina)
+
+    def _put_entry(self, wave_items: List[WaveItem]):
+        # Don't block forever if the writer stopped taking entries.
+        while not self.stop.is_set():
+            try:
+                self.entries.put(wave_items, timeout=.5)
+                return
+            except queue.Full:
+                pass
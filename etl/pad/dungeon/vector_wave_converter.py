@@ -0,0 +1,158 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from pad.dungeon.wave_converter import WaveConverter, ProcessedFloor, ProcessedStage, ResultFloor
+from pad.storage.wave import WaveItem
+
+
+def _first_seen_unique(keys: np.ndarray) -> np.ndarray:
+    """Returns the unique keys in order of first appearance."""
+    uniques, first_idx = np.unique(keys, return_index=True)
+    return uniques[np.argsort(first_idx, kind='stable')]
+
+
+class VectorWaveConverter(WaveConverter):
+    """A WaveConverter that computes the floor statistics with NumPy array operations.
+
+    The floor's waves are loaded into column arrays, enemy curves are evaluated once per distinct
+    (monster, level), and the per-entry and per-stage stats are computed with grouped array ops.
+    The ProcessedFloor/ProcessedStage it builds, and so the ResultFloor, are identical to the
+    ones built by WaveConverter, including the order spawns are first seen in.
+    """
+
+    def convert_entries(self,
+                        entries: Iterable[Tuple[List[WaveItem], int]],
+                        try_common_monsters: bool) -> Optional[ResultFloor]:
+        rows = []
+        entry_times = []
+        for entry_idx, (entry_items, times) in enumerate(entries):
+            entry_times.append(times)
+            rows.extend((entry_idx, w.stage, w.slot, w.spawn_type, w.monster_id, w.monster_level,
+                         w.drop_monster_id, w.drop_monster_level) for w in entry_items)
+        if not rows:
+            return None
+
+        cols = np.array(rows, dtype=np.int64)
+        entry_idx, stage, slot, spawn_type, monster_id, level, drop_monster_id, drop_monster_level = cols.T
+        entry_times = np.array(entry_times, dtype=np.int64)
+
+        # Same rules as WaveItem.get_coins and WaveItem.get_drop.
+        drop_coins = np.where(drop_monster_id == WaveItem.DROP_MONSTER_ID_GOLD, drop_monster_level, 0)
+        drop_id = np.where((drop_monster_id > 0) & (drop_coins == 0), drop_monster_id, 0)
+        if np.any((drop_id > 9000) & (drop_id < 10000)):
+            raise ValueError('Special drop detected (not handled yet)')
+
+        result = ProcessedFloor()
+        self._add_entries(result, entry_idx, monster_id, level, drop_id, drop_coins, entry_times)
+
+        # Group rows by stage, then entry, keeping the row order within each entry.
+        order = np.lexsort((np.arange(len(rows)), entry_idx, stage))
+        group_keys = np.stack([stage[order], entry_idx[order]], axis=1)
+        group_starts = np.flatnonzero(np.any(np.diff(group_keys, axis=0) != 0, axis=1)) + 1
+        group_starts = np.concatenate([[0], group_starts])
+        group_stages = stage[order][group_starts]
+        group_is_invade = spawn_type[order][group_starts] == 2
+
+        # Invades happen only on non-boss floors; some bosses represent as invades though.
+        last_stage = group_stages.max()
+        invade_groups = group_is_invade & (group_stages != last_stage)
+
+        group_ends = np.concatenate([group_starts[1:], [len(rows)]])
+        group_times = entry_times[entry_idx[order][group_starts]]
+
+        def build_stage(processed_stage: ProcessedStage, group_mask: np.ndarray):
+            groups = np.flatnonzero(group_mask)
+            if not len(groups):
+                return processed_stage
+            sizes = group_ends[groups] - group_starts[groups]
+            group_ids = np.repeat(np.arange(len(groups)), sizes)
+            row_idx = order[np.concatenate([np.arange(group_starts[g], group_ends[g]) for g in groups])]
+            self._fill_stage(processed_stage, row_idx, group_ids, sizes, group_times[groups],
+                             monster_id, level, slot, drop_id)
+            return processed_stage
+
+        invades = build_stage(ProcessedStage(ProcessedStage.INVADE_IDX), invade_groups)
+        if invades.count:
+            result.invades = invades
+
+        for stage_idx in np.unique(group_stages).tolist():
+            result.stages.append(build_stage(ProcessedStage(stage_idx + 1),
+                                             (group_stages == stage_idx) & ~invade_groups))
+
+        return ResultFloor(result, try_common_monsters)
+
+    def _add_entries(self, result: ProcessedFloor, entry_idx, monster_id, level, drop_id, drop_coins, entry_times):
+        """Vectorized ProcessedFloor.add_entry over every entry."""
+        # Evaluate the enemy curves once per distinct (monster, level).
+        pairs, pair_idx = np.unique(np.stack([monster_id, level], axis=1), axis=0, return_inverse=True)
+        pair_coins = np.zeros(len(pairs), dtype=np.int64)
+        pair_xp = np.zeros(len(pairs), dtype=np.int64)
+        enemies = {}
+        for i, (pair_monster_id, pair_level) in enumerate(pairs.tolist()):
+            if pair_monster_id not in enemies:
+                enemies[pair_monster_id] = self.data.card_by_monster_id(pair_monster_id).cur_card.card.enemy()
+            enemy_data = enemies[pair_monster_id]
+            pair_coins[i] = enemy_data.coin.value_at(pair_level)
+            pair_xp[i] = enemy_data.xp.value_at(pair_level)
+        pair_idx = pair_idx.reshape(-1)
+
+        drop_ids, drop_idx = np.unique(drop_id, return_inverse=True)
+        drop_mp = np.zeros(len(drop_ids), dtype=np.int64)
+        for i, d in enumerate(drop_ids.tolist()):
+            drop_card = self.data.card_by_monster_id(d) if d else None
+            if drop_card:
+                drop_mp[i] = drop_card.cur_card.card.sell_mp
+
+        entry_count = len(entry_times)
+
+        def per_entry(values):
+            sums = np.bincount(entry_idx, weights=values, minlength=entry_count).astype(np.int64)
+            return np.repeat(sums, entry_times).tolist()
+
+        result.entry_count += int(entry_times.sum())
+        result.coins.extend(per_entry(drop_coins + pair_coins[pair_idx]))
+        result.exp.extend(per_entry(pair_xp[pair_idx]))
+        result.mp.extend(per_entry(drop_mp[drop_idx.reshape(-1)]))
+
+    def _fill_stage(self, processed_stage: ProcessedStage, row_idx, group_ids, sizes, times,
+                    monster_id, level, slot, drop_id):
+        """Vectorized ProcessedStage.add_wave_group over a stage's entry groups, in order."""
+        processed_stage.count += int(times.sum())
+        processed_stage.spawns_per_wave.extend(np.repeat(sizes, times).tolist())
+
+        stage_monsters = monster_id[row_idx]
+        monsters, monster_codes = np.unique(stage_monsters, return_inverse=True)
+        monster_codes = monster_codes.reshape(-1)
+        monster_order = _first_seen_unique(monster_codes)
+
+        # Spawn counts per (group, monster), listed per monster in group order.
+        group_monster = group_ids * len(monsters) + monster_codes
+        pair_keys, pair_counts = np.unique(group_monster, return_counts=True)
+        pair_groups = pair_keys // len(monsters)
+        pair_monsters = pair_keys % len(monsters)
+
+        def first_seen_values(values):
+            """Values per monster, in order of first appearance."""
+            base = int(values.max()) + 1
+            by_monster = defaultdict(list)
+            for pair in _first_seen_unique(monster_codes * base + values).tolist():
+                by_monster[pair // base].append(pair % base)
+            return by_monster
+
+        levels = first_seen_values(level[row_idx])
+        slots = first_seen_values(slot[row_idx])
+        drops = first_seen_values(drop_id[row_idx])
+
+        for code in monster_order.tolist():
+            spawn = int(monsters[code])
+            mask = pair_monsters == code
+            processed_stage.spawn_to_count_list[spawn].extend(
+                np.repeat(pair_counts[mask], times[pair_groups[mask]]).tolist())
+            processed_stage.spawn_to_level[spawn].update(levels[code])
+            processed_stage.spawn_to_slot[spawn].update(slots[code])
+            for d in drops[code]:
+                drop_card = self.data.card_by_monster_id(d) if d else None
+                if drop_card:
+                    processed_stage.spawn_to_drop[spawn].add(drop_card)
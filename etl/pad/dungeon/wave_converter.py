@@ -1,6 +1,6 @@
 from collections import defaultdict
 from statistics import mean
-from typing import List, Set, Optional, Dict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 from pad.common.shared_types import MonsterId
 from pad.raw_processor.crossed_data import CrossServerDatabase, CrossServerCard
@@ -30,8 +30,8 @@ class ProcessedFloor(object):
         self.exp = []
         self.mp = []
 
-    def add_entry(self, entry_waves: List[WaveCard]):
-        """Computes stats across an individual dungeon entry."""
+    def add_entry(self, entry_waves: List[WaveCard], times: int = 1):
+        """Computes stats across an individual dungeon entry, seen `times` times."""
         entry_coins = 0
         xp = 0
         entry_mp = 0
@@ -47,10 +47,10 @@ class ProcessedFloor(object):
             if wave_card.drop_card:
                 entry_mp += wave_card.drop_card.cur_card.card.sell_mp
 
-        self.entry_count += 1
-        self.coins.append(entry_coins)
-        self.exp.append(xp)
-        self.mp.append(entry_mp)
+        self.entry_count += times
+        self.coins.extend([entry_coins] * times)
+        self.exp.extend([xp] * times)
+        self.mp.extend([entry_mp] * times)
 
 
 class ProcessedStage(object):
@@ -71,10 +71,10 @@ class ProcessedStage(object):
         self.spawn_to_count_list = defaultdict(list)  # type: Dict[MonsterId, List[WaveItem]]
         self.spawns_per_wave = []
 
-    def add_wave_group(self, entry_waves: List[WaveCard]):
-        """Update stage info with a single entry-wave set of data."""
-        self.count += 1
-        self.spawns_per_wave.append(len(entry_waves))
+    def add_wave_group(self, entry_waves: List[WaveCard], times: int = 1):
+        """Update stage info with a single entry-wave set of data, seen `times` times."""
+        self.count += times
+        self.spawns_per_wave.extend([len(entry_waves)] * times)
 
         count_map = defaultdict(int)
         for wave_card in entry_waves:
@@ -89,7 +89,7 @@ class ProcessedStage(object):
             count_map[monster_id] += 1
 
         for monster_id, count in count_map.items():
-            self.spawn_to_count_list[monster_id].append(count)
+            self.spawn_to_count_list[monster_id].extend([count] * times)
 
 
 class ResultFloor(object):
@@ -219,56 +219,51 @@ class WaveConverter(object):
     def __init__(self, data: CrossServerDatabase):
         self.data = data
 
-    def convert(self, wave_items: List[WaveItem], try_common_monsters: bool) -> ResultFloor:
+    def convert(self, wave_items: Iterable[WaveItem], try_common_monsters: bool) -> Optional[ResultFloor]:
+        """Computes the floor results from its waves; the waves are only iterated once.
+
+        Returns None if there were no waves.
+        """
+        return self.convert_entries(group_entries(wave_items), try_common_monsters)
+
+    def convert_entries(self,
+                        entries: Iterable[Tuple[List[WaveItem], int]],
+                        try_common_monsters: bool) -> Optional[ResultFloor]:
+        """Computes the floor results from (entry waves, number of identical entries) pairs.
+
+        Returns None if there were no entries.
+        """
         result = ProcessedFloor()
 
-        waves_by_entry = defaultdict(list)
-        waves_by_stage_and_entry = defaultdict(lambda: defaultdict(list))
-        for wave_item in wave_items:
-            monster_id = wave_item.monster_id
-            drop_id = wave_item.get_drop()
-
-            # Stuff in this range is supposedly:
-            # 9900: coins
-            # 9901: stones
-            # 9902: pal points
-            # 9911: gift dungeon
-            # 9912: monster points
-            # 9916: permanent dungeon
-            # 9917: badge
-            # 9999: announcement
-            if drop_id and (9000 < drop_id < 10000):
-                raise ValueError('Special drop detected (not handled yet)')
-
-            # Build a structure that merges DB info with wave data.
-            card = self.data.card_by_monster_id(monster_id)
-            drop = self.data.card_by_monster_id(drop_id) if drop_id else None
-            wave_card = WaveCard(monster_id, card, wave_item, drop)
-
-            # Store data for an individual dungeon entry.
-            waves_by_entry[wave_item.entry_id].append(wave_card)
+        waves_by_stage = defaultdict(list)  # type: Dict[int, List[Tuple[List[WaveCard], int]]]
+        for entry_items, times in entries:
+            entry_waves = [self._wave_card(wave_item) for wave_item in entry_items]
+
+            # Calculate stuff that should be done per-entry instead of per-floor. This more
+            # correctly handles invades and alternate spawns.
+            result.add_entry(entry_waves, times)
 
             # Store data for each stage, separated by dungeon entry.
-            waves_by_stage_and_entry[wave_item.stage][wave_item.entry_id].append(wave_card)
+            entry_waves_by_stage = defaultdict(list)
+            for wave_card in entry_waves:
+                entry_waves_by_stage[wave_card.wave_item.stage].append(wave_card)
+            for stage_idx, stage_waves in entry_waves_by_stage.items():
+                waves_by_stage[stage_idx].append((stage_waves, times))
 
-        # Calculate stuff that should be done per-entry instead of per-floor. This more
-        # correctly handles invades and alternate spawns.
-        for entry_waves in waves_by_entry.values():
-            result.add_entry(entry_waves)
+        if not result.entry_count:
+            return None
 
         # Calculate stuff at a per-stage level, like spawns and drops.
         invades = ProcessedStage(ProcessedStage.INVADE_IDX)
-        stages = [ProcessedStage(i + 1) for i in sorted(waves_by_stage_and_entry.keys())]
+        stages = [ProcessedStage(i + 1) for i in sorted(waves_by_stage.keys())]
         last_stage_idx = stages[-1].stage_idx
         for stage in stages:
-            waves_for_stage = waves_by_stage_and_entry[stage.stage_idx - 1]
-
-            for entry_waves in waves_for_stage.values():
+            for entry_waves, times in waves_by_stage[stage.stage_idx - 1]:
                 if stage.stage_idx != last_stage_idx and entry_waves[0].wave_item.is_invade():
                     # Invades happen only on non-boss floors; some bosses represent as invades though.
-                    invades.add_wave_group(entry_waves)
+                    invades.add_wave_group(entry_waves, times)
                 else:
-                    stage.add_wave_group(entry_waves)
+                    stage.add_wave_group(entry_waves, times)
 
         if invades.count:
             result.invades = invades
@@ -276,3 +271,32 @@ class WaveConverter(object):
         result.stages.extend(stages)
 
         return ResultFloor(result, try_common_monsters)
+
+    def _wave_card(self, wave_item: WaveItem) -> WaveCard:
+        """Builds a structure that merges DB info with wave data."""
+        monster_id = wave_item.monster_id
+        drop_id = wave_item.get_drop()
+
+        # Stuff in this range is supposedly:
+        # 9900: coins
+        # 9901: stones
+        # 9902: pal points
+        # 9911: gift dungeon
+        # 9912: monster points
+        # 9916: permanent dungeon
+        # 9917: badge
+        # 9999: announcement
+        if drop_id and (9000 < drop_id < 10000):
+            raise ValueError('Special drop detected (not handled yet)')
+
+        card = self.data.card_by_monster_id(monster_id)
+        drop = self.data.card_by_monster_id(drop_id) if drop_id else None
+        return WaveCard(monster_id, card, wave_item, drop)
+
+
+def group_entries(wave_items: Iterable[WaveItem]) -> List[Tuple[List[WaveItem], int]]:
+    """Groups waves by dungeon entry, in order of appearance, as input for convert_entries."""
+    waves_by_entry = defaultdict(list)
+    for wave_item in wave_items:
+        waves_by_entry[wave_item.entry_id].append(wave_item)
+    return [(entry_waves, 1) for entry_waves in waves_by_entry.values()]
@@ -2,9 +2,9 @@
 Parses card data.
 """
 import logging
-from typing import List, Any, Optional
+from typing import Any, Iterator, List, Optional
 
-from pad.common import pad_util
+from pad.common import json_stream, pad_util
 from pad.common.shared_types import AttrId, MonsterNo, SkillId, TypeId, Curve
 
 human_fix_logger = logging.getLogger('human_fix')
@@ -15,6 +15,7 @@ FILE_NAME = 'download_card_data.json'
 
 class ESRef(pad_util.Printable):
     """Describes how this monster uses an enemy skill"""
+    __slots__ = ('enemy_skill_id', 'enemy_ai', 'enemy_rnd')
 
     def __init__(self, enemy_skill_id: int, enemy_ai: int, enemy_rnd: int):
         self.enemy_skill_id = enemy_skill_id
@@ -48,6 +49,25 @@ class Enemy(pad_util.Printable):
 
 class Card(pad_util.Printable):
     """Data about a player-ownable monster."""
+    # There are tens of thousands of these per load, so they're slotted; every field is listed here.
+    __slots__ = (
+        'monster_no', 'name', 'attr_id', 'sub_attr_id', 'is_ult', 'type_1_id', 'type_2_id', 'rarity', 'cost',
+        'unknown_009', 'max_level', 'feed_xp_per_level', 'released_status', 'sell_gold_per_level',
+        'min_hp', 'max_hp', 'hp_scale', 'min_atk', 'max_atk', 'atk_scale', 'min_rcv', 'max_rcv', 'rcv_scale',
+        'xp_max', 'xp_scale', 'active_skill_id', 'leader_skill_id', 'enemy_turns',
+        'enemy_hp_min', 'enemy_hp_max', 'enemy_hp_scale', 'enemy_atk_min', 'enemy_atk_max', 'enemy_atk_scale',
+        'enemy_def_min', 'enemy_def_max', 'enemy_def_scale', 'enemy_max_level', 'enemy_coins_per_level',
+        'enemy_xp_per_level', 'ancestor_id',
+        'evo_mat_id_1', 'evo_mat_id_2', 'evo_mat_id_3', 'evo_mat_id_4', 'evo_mat_id_5',
+        'un_evo_mat_1', 'un_evo_mat_2', 'un_evo_mat_3', 'un_evo_mat_4', 'un_evo_mat_5',
+        'enemy_turns_alt', 'use_new_ai', 'enemy_skill_max_counter', 'enemy_skill_counter_increment',
+        'unknown_055', 'unknown_056', 'enemy_skill_refs', 'awakenings', 'super_awakenings',
+        'base_id', 'group_id', 'type_3_id', 'sell_mp', 'latent_on_feed', 'collab_id',
+        'flags', 'inheritable_flag', 'take_assists_flag', 'is_collab_flag', 'unstackable_flag', 'assist_only_flag',
+        'latent_slot_unlock_flag', 'inheritable', 'take_assists', 'is_stackable', 'ownable', 'usable',
+        'search_strings', 'limit_mult', 'voice_id', 'orb_skin_id', 'bgm_id', 'tags', 'ls_bitflag',
+        'unknown_74', 'unknown_75', 'other_fields',
+    )
 
     def __init__(self, raw: List):
         _unflatten(raw, 57, 3)
@@ -284,7 +304,12 @@ def _unflatten(raw: List[Any], idx: int, width: int):
     raw[idx] = data
 
 
+def iter_card_data(data_dir: str = None, json_file: str = None) -> Iterator[Card]:
+    """Yield Card objects from PAD JSON file, decoding one raw card at a time."""
+    for r in json_stream.iter_json_array(pad_util.raw_json_path(data_dir, json_file, FILE_NAME), 'card'):
+        yield Card(r)
+
+
 def load_card_data(data_dir: str = None, json_file: str = None) -> List[Card]:
     """Load Card objects from PAD JSON file."""
-    data_json = pad_util.load_raw_json(data_dir, json_file, FILE_NAME)
-    return [Card(r) for r in data_json['card']]
+    return list(iter_card_data(data_dir, json_file))
@@ -0,0 +1,172 @@
+"""
+Card data in NumPy column arrays, for evaluating stats and curves for every monster at once.
+
+The curve math matches Curve.value_at, so values agree with the ones computed one card at a time.
+"""
+import csv
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from pad.raw.card import Card
+
+# Highest level reachable with a super limit break.
+MAX_LIMIT_BREAK_LEVEL = 120
+# Level curves for player stats and xp are defined over 99 levels.
+CURVE_MAX_LEVEL = 99
+
+LevelType = Union[int, np.ndarray]
+
+
+def curve_values(min_value: np.ndarray,
+                 max_value: np.ndarray,
+                 scale: np.ndarray,
+                 max_level: Union[int, np.ndarray],
+                 level: LevelType) -> np.ndarray:
+    """Vectorized Curve(min_value, max_value, scale, max_level).value_at(level).
+
+    Arguments broadcast against each other; a max_value of 0 means min_value * max_level, like Curve.
+    """
+    max_level = np.maximum(max_level, 1)
+    max_value = np.where(max_value != 0, max_value, min_value * max_level)
+    f = np.where(max_level == 1, 1.0, (np.asarray(level) - 1) / np.maximum(max_level - 1, 1))
+    return np.round(min_value + (max_value - min_value) * np.power(f, scale)).astype(np.int64)
+
+
+class CardTable(object):
+    """Column arrays for a list of cards, one row per card in the same order.
+
+    monster_ids defaults to the monster_no of each card; pass the cross-server ids to key the
+    table by them instead.
+    """
+
+    def __init__(self, cards: List[Card], monster_ids: Optional[List[int]] = None):
+        def column(fn, dtype=np.int64) -> np.ndarray:
+            return np.fromiter((fn(c) for c in cards), dtype=dtype, count=len(cards))
+
+        self.monster_no = column(lambda c: c.monster_no)
+        self.monster_id = self.monster_no if monster_ids is None else np.array(monster_ids, dtype=np.int64)
+        self.attr_id = column(lambda c: c.attr_id)
+        self.sub_attr_id = column(lambda c: c.sub_attr_id)
+        self.type_1_id = column(lambda c: c.type_1_id)
+        self.type_2_id = column(lambda c: c.type_2_id)
+        self.type_3_id = column(lambda c: c.type_3_id)
+        self.rarity = column(lambda c: c.rarity)
+        self.cost = column(lambda c: c.cost)
+        self.max_level = column(lambda c: c.max_level)
+        self.limit_mult = column(lambda c: c.limit_mult)
+
+        self.min_hp = column(lambda c: c.min_hp)
+        self.max_hp = column(lambda c: c.max_hp)
+        self.hp_scale = column(lambda c: c.hp_scale, np.float64)
+        self.min_atk = column(lambda c: c.min_atk)
+        self.max_atk = column(lambda c: c.max_atk)
+        self.atk_scale = column(lambda c: c.atk_scale, np.float64)
+        self.min_rcv = column(lambda c: c.min_rcv)
+        self.max_rcv = column(lambda c: c.max_rcv)
+        self.rcv_scale = column(lambda c: c.rcv_scale, np.float64)
+
+        self.xp_max = column(lambda c: c.xp_max)
+        self.xp_scale = column(lambda c: c.xp_scale, np.float64)
+        self.feed_xp_per_level = column(lambda c: c.feed_xp_per_level, np.float64)
+        self.sell_gold_per_level = column(lambda c: c.sell_gold_per_level, np.float64)
+
+        self.enemy_max_level = column(lambda c: c.enemy_max_level)
+        self.enemy_hp_min = column(lambda c: c.enemy_hp_min)
+        self.enemy_hp_max = column(lambda c: c.enemy_hp_max)
+        self.enemy_hp_scale = column(lambda c: c.enemy_hp_scale, np.float64)
+        self.enemy_atk_min = column(lambda c: c.enemy_atk_min)
+        self.enemy_atk_max = column(lambda c: c.enemy_atk_max)
+        self.enemy_atk_scale = column(lambda c: c.enemy_atk_scale, np.float64)
+        self.enemy_def_min = column(lambda c: c.enemy_def_min)
+        self.enemy_def_max = column(lambda c: c.enemy_def_max)
+        self.enemy_def_scale = column(lambda c: c.enemy_def_scale, np.float64)
+        self.enemy_coins_per_level = column(lambda c: c.enemy_coins_per_level, np.float64)
+        self.enemy_xp_per_level = column(lambda c: c.enemy_xp_per_level, np.float64)
+
+        self.row_by_monster_id = {m: i for i, m in enumerate(self.monster_id.tolist())}  # type: Dict[int, int]
+
+    def __len__(self):
+        return len(self.monster_id)
+
+    def rows(self, monster_ids: List[int]) -> np.ndarray:
+        """The row index of each monster id."""
+        return np.array([self.row_by_monster_id[m] for m in monster_ids], dtype=np.int64)
+
+    def max_reachable_level(self) -> np.ndarray:
+        """The card's max level, or MAX_LIMIT_BREAK_LEVEL if it can be limit broken."""
+        return np.where(self.limit_mult > 0, MAX_LIMIT_BREAK_LEVEL, self.max_level)
+
+    def player_stats(self, level: LevelType) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """HP, ATK and RCV of every card at level (a scalar, or an array broadcasting against the rows).
+
+        Up to level 99 this is Card.hp_curve() and friends. Past that the level 99 stats get the limit
+        break bonus: limit_mult% more at 110, gained evenly from level 100, and another limit_mult/11%
+        per level from 111 to 120, i.e. 1 + limit_mult / 100 * (level - 99) / 11 throughout.
+        """
+        level = np.asarray(level)
+        curve_level = np.minimum(level, CURVE_MAX_LEVEL)
+        limit_break = 1 + self.limit_mult / 100 * np.maximum(level - CURVE_MAX_LEVEL, 0) / 11
+
+        def stat(min_value, max_value, scale):
+            value = curve_values(min_value, max_value, scale, CURVE_MAX_LEVEL, curve_level)
+            return np.round(value * limit_break).astype(np.int64)
+
+        return (stat(self.min_hp, self.max_hp, self.hp_scale),
+                stat(self.min_atk, self.max_atk, self.atk_scale),
+                stat(self.min_rcv, self.max_rcv, self.rcv_scale))
+
+    def xp(self, level: LevelType) -> np.ndarray:
+        """Total xp to reach level; Card.xp_curve()."""
+        return curve_values(0, self.xp_max, self.xp_scale, CURVE_MAX_LEVEL, level)
+
+    def enemy_stats(self,
+                    level: LevelType,
+                    hp_mult: Union[float, np.ndarray] = 1,
+                    atk_mult: Union[float, np.ndarray] = 1,
+                    def_mult: Union[float, np.ndarray] = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """HP, ATK and DEF of every card as an enemy at level, scaled by the sub-dungeon multipliers.
+
+        Rounded the same way as the encounters stored by DungeonContentProcessor.
+        """
+        def stat(min_value, max_value, scale, mult):
+            value = curve_values(min_value, max_value, scale, self.enemy_max_level, level)
+            return np.round(mult * value).astype(np.int64)
+
+        return (stat(self.enemy_hp_min, self.enemy_hp_max, self.enemy_hp_scale, hp_mult),
+                stat(self.enemy_atk_min, self.enemy_atk_max, self.enemy_atk_scale, atk_mult),
+                stat(self.enemy_def_min, self.enemy_def_max, self.enemy_def_scale, def_mult))
+
+    def enemy_coins(self, level: LevelType) -> np.ndarray:
+        return curve_values(self.enemy_coins_per_level, 0, 1.0, self.enemy_max_level, level)
+
+    def enemy_xp(self, level: LevelType) -> np.ndarray:
+        return curve_values(self.enemy_xp_per_level, 0, 1.0, self.enemy_max_level, level)
+
+    def stat_table(self, max_level: int = MAX_LIMIT_BREAK_LEVEL) -> Dict[str, np.ndarray]:
+        """Player stats for every card at every level it can reach, up to max_level, as flat columns.
+
+        Rows are ordered by card, then level.
+        """
+        levels = np.arange(1, max_level + 1)[:, np.newaxis]
+        hp, atk, rcv = self.player_stats(levels)
+        # Transposed to (card, level), so the flattened rows are ordered by card.
+        mask = (levels <= self.max_reachable_level()).T
+        monster_ids = np.broadcast_to(self.monster_id[:, np.newaxis], mask.shape)
+        level_grid = np.broadcast_to(levels.T, mask.shape)
+        return {
+            'monster_id': monster_ids[mask],
+            'level': level_grid[mask],
+            'hp': hp.T[mask],
+            'atk': atk.T[mask],
+            'rcv': rcv.T[mask],
+        }
+
+
+def save_stat_table(file_path: str, table: CardTable, max_level: int = MAX_LIMIT_BREAK_LEVEL):
+    """Writes CardTable.stat_table as CSV with a header row, e.g. for importing into SQLite."""
+    columns = table.stat_table(max_level)
+    with open(file_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns.keys())
+        writer.writerows(zip(*(c.tolist() for c in columns.values())))
@@ -1,13 +1,13 @@
 import csv
-from io import StringIO
-from typing import List
+from typing import Iterator, List
 
-from pad.common import pad_util
+from pad.common import json_stream, pad_util
 
 FILE_NAME = 'download_enemy_skill_data.json'
 
 
 class EnemySkill(pad_util.Printable):
+    __slots__ = ('enemy_skill_id', 'name', 'type', 'flags', 'params')
 
     def __init__(self, raw: List[str]):
         self.enemy_skill_id = int(raw[0])
@@ -25,10 +25,15 @@ class EnemySkill(pad_util.Printable):
             offset += 1
 
 
-def load_enemy_skill_data(data_dir: str = None, json_file: str = None) -> List[EnemySkill]:
-    data_json = pad_util.load_raw_json(data_dir, json_file, FILE_NAME)
-    es = data_json['enemy_skills']
+def iter_enemy_skill_data(data_dir: str = None, json_file: str = None) -> Iterator[EnemySkill]:
+    """Yield EnemySkill objects from the PAD json file, decoding the CSV data a line at a time."""
+    lines = json_stream.iter_json_string_lines(pad_util.raw_json_path(data_dir, json_file, FILE_NAME),
+                                               'enemy_skills')
     # Cleanup for the truly atrocious way that GungHo handles CSV/JSON data.
-    es = es.replace("',", "#,").replace(",'", ",#").replace("'\n", "#\n")
-    csv_lines = csv.reader(StringIO(es), quotechar="#", delimiter=',')
-    return [EnemySkill(x) for x in csv_lines if x[0] != 'c']
+    lines = (es.replace("',", "#,").replace(",'", ",#").replace("'\n", "#\n") for es in lines)
+    csv_lines = csv.reader(lines, quotechar="#", delimiter=',')
+    return (EnemySkill(x) for x in csv_lines if x[0] != 'c')
+
+
+def load_enemy_skill_data(data_dir: str = None, json_file: str = None) -> List[EnemySkill]:
+    return list(iter_enemy_skill_data(data_dir, json_file))
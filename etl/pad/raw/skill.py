@@ -2,10 +2,10 @@
 Parses monster skill (leader/active) data.
 """
 
-from typing import List
+from typing import Iterator, List
 
-from pad.common import pad_util
-from pad.common.shared_types import SkillId
+from pad.common import json_stream, pad_util
+from pad.common.shared_types import SkillId, object_fields
 
 # The typical JSON file name for this data.
 FILE_NAME = 'download_skill_data.json'
@@ -13,6 +13,8 @@ FILE_NAME = 'download_skill_data.json'
 
 class MonsterSkill(pad_util.Printable):
     """Leader/active skill info for a player-ownable monster."""
+    __slots__ = ('skill_id', 'name', 'description', 'clean_description', 'skill_type', 'levels',
+                 'cooldown_turns_max', 'cooldown_turns_min', 'unknown_005', 'data')
 
     def __init__(self, skill_id: int, raw: List[str]):
         self.skill_id = SkillId(skill_id)
@@ -46,13 +48,19 @@ class MonsterSkill(pad_util.Printable):
         self.data = raw[6:]
 
     def __str__(self):
-        return str(self.__dict__)
+        return str(object_fields(self))
 
     def __repr__(self):
         return 'Skill(%s, %r)' % (self.skill_id, self.name)
 
 
+def iter_skill_data(data_dir=None, json_file: str = None) -> Iterator[MonsterSkill]:
+    """Yield MonsterSkill objects from the PAD json file, decoding one raw skill at a time."""
+    raw_skills = json_stream.iter_json_array(pad_util.raw_json_path(data_dir, json_file, FILE_NAME), 'skill')
+    for i, ms in enumerate(raw_skills):
+        yield MonsterSkill(i, ms)
+
+
 def load_skill_data(data_dir=None, json_file: str = None) -> List[MonsterSkill]:
     """Load MonsterSkill objects from the PAD json file."""
-    data_json = pad_util.load_raw_json(data_dir, json_file, FILE_NAME)
-    return [MonsterSkill(i, ms) for i, ms in enumerate(data_json['skill'])]
+    return list(iter_skill_data(data_dir, json_file))
@@ -1,3 +1,4 @@
+import functools
 from enum import Enum, auto
 from typing import Dict, List, NamedTuple, NamedTupleMeta, TYPE_CHECKING  # noqa
 
@@ -7,10 +8,19 @@ if TYPE_CHECKING:
     NamedTupleMeta = type
 
 
+# Compiled templates kept by process_raw; there are a few thousand distinct skill texts per language.
+TEMPLATE_CACHE_SIZE = 16384
+
+
 class I13NotImplemented(NotImplementedError):
     pass
 
 
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(text: str) -> jinja2.Template:
+    return jinja2.Template(text)
+
+
 def fmt_mult(x):
     return '{:,}'.format(round(float(x), 2)).rstrip('0').rstrip('.')
 
@@ -92,10 +102,17 @@ class BaseTextConverter:
     ATTRS_EXCEPT_BOMBS = list(range(9))
     ALL_ATTRS = list(range(10))
 
+    def render_context(self) -> Dict[str, Dict[str, str]]:
+        """The variables available to skill text templates, built once per converter class."""
+        cls = type(self)
+        if '_render_context' not in cls.__dict__:
+            cls._render_context = {
+                'awoskills': {f"id{awid}": name for awid, name in self.AWAKENING_MAP.items()},
+            }
+        return cls._render_context
+
     def process_raw(self, text: str) -> str:
-        return jinja2.Template(text).render(
-            awoskills={f"id{awid}": name for awid, name in self.AWAKENING_MAP.items()}
-        )
+        return compile_template(text).render(self.render_context())
 
 
 # ENUMS
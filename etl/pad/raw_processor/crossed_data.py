@@ -4,7 +4,7 @@ Data from across multiple servers merged together.
 import logging
 import os
 from copy import copy
-from typing import Callable, List, Optional, Tuple, TypeVar, Union
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar, Union
 
 from pad.common import dungeon_types, pad_util
 from pad.common.pad_util import is_bad_name
@@ -471,36 +471,54 @@ def build_cross_server_enemy_skills(jp_skills: List[EnemySkill],
     return results
 
 
+# The sections of a CrossServerDatabase. Processors list the ones they read in DATA_SECTIONS, so that
+# only those are loaded.
+CARDS = 'cards'
+SKILLS = 'skills'
+DUNGEONS = 'dungeons'
+ENEMY_SKILLS = 'enemy_skills'
+BONUSES = 'bonuses'
+EXTRA = 'extra'  # Exchanges, purchases and egg machines
+ALL_SECTIONS = frozenset([CARDS, SKILLS, DUNGEONS, ENEMY_SKILLS, BONUSES, EXTRA])
+
+# Cards are linked to their skills and enemy skills; bonuses are linked to their dungeons.
+_SECTION_DEPENDENCIES = {
+    CARDS: {SKILLS, ENEMY_SKILLS},
+    BONUSES: {DUNGEONS},
+}
+
+
+def required_sections(sections: Iterable[str]) -> Set[str]:
+    """The sections, plus the ones they're built from."""
+    result = set(sections)
+    for section in list(result):
+        result.update(_SECTION_DEPENDENCIES.get(section, set()))
+    return result
+
+
+def database_load_args(sections: Iterable[str]) -> Dict[str, bool]:
+    """The Database.load_database flags that skip everything not needed for sections."""
+    sections = required_sections(sections)
+    return {
+        'skip_cards': CARDS not in sections,
+        'skip_skills': SKILLS not in sections,
+        'skip_enemy_skills': ENEMY_SKILLS not in sections,
+        'skip_bonus': BONUSES not in sections,
+        'skip_extra': EXTRA not in sections,
+    }
+
+
 class CrossServerDatabase:
-    def __init__(self, jp_database: Database, na_database: Database, kr_database: Database, server=Server.jp):
-        self.all_cards = build_cross_server_cards(jp_database, na_database, kr_database, server)
-        self.ownable_cards = [c for c in self.all_cards
-                              if 0 < c.monster_id < 19999
-                              and not is_bad_name(c.jp_card.card.name)]
-
-        self.leader_skills = build_cross_server_skills(jp_database.leader_skills,
-                                                       na_database.leader_skills,
-                                                       kr_database.leader_skills,
-                                                       server)
-
-        self.active_skills = build_cross_server_skills(jp_database.active_skills,
-                                                       na_database.active_skills,
-                                                       kr_database.active_skills,
-                                                       server)
-
-        for ask in self.active_skills:
-            ask.skill_type_tags = list(skill_text_typing.parse_as_conditions(ask))
-            ask.skill_type_tags.sort(key=lambda x: x.value)
+    """The JP, NA and KR databases merged together.
 
-        self.dungeons = build_cross_server_dungeons(jp_database,
-                                                    na_database,
-                                                    kr_database,
-                                                    server)  # type: List[CrossServerDungeon]
+    The cards, skills, dungeons and enemy skills are merged the first time they're used, so a run only
+    pays for the sections it reads. A section is empty if the databases were loaded without it.
+    """
 
-        self.enemy_skills = build_cross_server_enemy_skills(jp_database.raw_enemy_skills,
-                                                            na_database.raw_enemy_skills,
-                                                            kr_database.raw_enemy_skills,
-                                                            server)
+    def __init__(self, jp_database: Database, na_database: Database, kr_database: Database, server=Server.jp):
+        self.jp_database = jp_database
+        self.na_database = na_database
+        self.kr_database = kr_database
 
         self.jp_bonuses = jp_database.bonuses
         self.na_bonuses = na_database.bonuses
@@ -518,21 +536,126 @@ class CrossServerDatabase:
         self.na_purchase = na_database.purchase
         self.kr_purchase = kr_database.purchase
 
-        self.monster_id_to_card = {c.monster_id: c for c in self.all_cards}
-        self.leader_id_to_leader = {s.skill_id: s for s in self.leader_skills}
-        self.active_id_to_active = {s.skill_id: s for s in self.active_skills}
-        self.dungeon_id_to_dungeon = {d.dungeon_id: d for d in self.dungeons}
-
         self.hq_image_monster_ids = []  # type: List[MonsterId]
         self.animated_monster_ids = []  # type: List[MonsterId]
 
-        for csc in self.ownable_cards:
+        self.server = server
+
+        # Built on first use
+        self._all_cards = None  # type: Optional[List[CrossServerCard]]
+        self._ownable_cards = None  # type: Optional[List[CrossServerCard]]
+        self._monster_id_to_card = None  # type: Optional[Dict[MonsterId, CrossServerCard]]
+        self._leader_skills = None  # type: Optional[List[CrossServerSkill]]
+        self._active_skills = None  # type: Optional[List[CrossServerSkill]]
+        self._leader_id_to_leader = None  # type: Optional[Dict[int, CrossServerSkill]]
+        self._active_id_to_active = None  # type: Optional[Dict[int, CrossServerSkill]]
+        self._dungeons = None  # type: Optional[List[CrossServerDungeon]]
+        self._dungeon_id_to_dungeon = None  # type: Optional[Dict[DungeonId, CrossServerDungeon]]
+        self._enemy_skills = None  # type: Optional[List[CrossServerEnemySkill]]
+
+    @property
+    def all_cards(self) -> List[CrossServerCard]:
+        self._build_cards()
+        return self._all_cards
+
+    @property
+    def ownable_cards(self) -> List[CrossServerCard]:
+        self._build_cards()
+        return self._ownable_cards
+
+    @property
+    def monster_id_to_card(self) -> Dict[MonsterId, CrossServerCard]:
+        self._build_cards()
+        return self._monster_id_to_card
+
+    @property
+    def leader_skills(self) -> List[CrossServerSkill]:
+        self._build_skills()
+        return self._leader_skills
+
+    @property
+    def active_skills(self) -> List[CrossServerSkill]:
+        self._build_skills()
+        return self._active_skills
+
+    @property
+    def leader_id_to_leader(self) -> Dict[int, CrossServerSkill]:
+        self._build_skills()
+        return self._leader_id_to_leader
+
+    @property
+    def active_id_to_active(self) -> Dict[int, CrossServerSkill]:
+        self._build_skills()
+        return self._active_id_to_active
+
+    @property
+    def dungeons(self) -> List[CrossServerDungeon]:
+        self._build_dungeons()
+        return self._dungeons
+
+    @property
+    def dungeon_id_to_dungeon(self) -> Dict[DungeonId, CrossServerDungeon]:
+        self._build_dungeons()
+        return self._dungeon_id_to_dungeon
+
+    @property
+    def enemy_skills(self) -> List[CrossServerEnemySkill]:
+        if self._enemy_skills is None:
+            self._enemy_skills = build_cross_server_enemy_skills(self.jp_database.raw_enemy_skills,
+                                                                 self.na_database.raw_enemy_skills,
+                                                                 self.kr_database.raw_enemy_skills,
+                                                                 self.server)
+        return self._enemy_skills
+
+    def _build_cards(self):
+        if self._all_cards is not None:
+            return
+        all_cards = build_cross_server_cards(self.jp_database, self.na_database, self.kr_database, self.server)
+        ownable_cards = [c for c in all_cards
+                         if 0 < c.monster_id < 19999
+                         and not is_bad_name(c.jp_card.card.name)]
+
+        for csc in ownable_cards:
             if csc.leader_skill:
                 csc.leader_skill = self.leader_id_to_leader[csc.leader_skill.skill_id]
             if csc.active_skill:
                 csc.active_skill = self.active_id_to_active[csc.active_skill.skill_id]
 
-        self.server = server
+        self._all_cards = all_cards
+        self._ownable_cards = ownable_cards
+        self._monster_id_to_card = {c.monster_id: c for c in all_cards}
+        self._mark_extra_images()
+
+    def _build_skills(self):
+        if self._leader_skills is not None:
+            return
+        leader_skills = build_cross_server_skills(self.jp_database.leader_skills,
+                                                  self.na_database.leader_skills,
+                                                  self.kr_database.leader_skills,
+                                                  self.server)
+
+        active_skills = build_cross_server_skills(self.jp_database.active_skills,
+                                                  self.na_database.active_skills,
+                                                  self.kr_database.active_skills,
+                                                  self.server)
+
+        for ask in active_skills:
+            ask.skill_type_tags = list(skill_text_typing.parse_as_conditions(ask))
+            ask.skill_type_tags.sort(key=lambda x: x.value)
+
+        self._leader_skills = leader_skills
+        self._active_skills = active_skills
+        self._leader_id_to_leader = {s.skill_id: s for s in leader_skills}
+        self._active_id_to_active = {s.skill_id: s for s in active_skills}
+
+    def _build_dungeons(self):
+        if self._dungeons is not None:
+            return
+        self._dungeons = build_cross_server_dungeons(self.jp_database,
+                                                     self.na_database,
+                                                     self.kr_database,
+                                                     self.server)
+        self._dungeon_id_to_dungeon = {d.dungeon_id: d for d in self._dungeons}
 
     def card_by_monster_id(self, monster_id: MonsterId) -> CrossServerCard:
         return self.monster_id_to_card.get(monster_id, None)
@@ -549,10 +672,16 @@ class CrossServerDatabase:
             if len(f) == 9 and f[-4:].lower() == '.mp4':
                 self.animated_monster_ids.append(MonsterId(int(f[0:5])))
 
-        for csc in self.ownable_cards:
-            if csc.monster_id in self.hq_image_monster_ids:
+        if self._all_cards is not None:
+            self._mark_extra_images()
+
+    def _mark_extra_images(self):
+        hq_image_monster_ids = set(self.hq_image_monster_ids)
+        animated_monster_ids = set(self.animated_monster_ids)
+        for csc in self._ownable_cards:
+            if csc.monster_id in hq_image_monster_ids:
                 csc.has_hqimage = True
-            if csc.monster_id in self.animated_monster_ids:
+            if csc.monster_id in animated_monster_ids:
                 csc.has_animation = True
 
     def save(self, output_dir: str, file_name: str, obj: object, pretty: bool):
@@ -0,0 +1,175 @@
+"""
+Detects which cards, skills, enemy skills and dungeons changed since the last processed data pull.
+
+Every entity gets a content hash over its raw data on each server. Once a processor has stored its
+data, the hashes it depends on are saved as a snapshot, and the next run only hands it the ids whose
+hashes differ. Without a snapshot, or if the code changed since it was taken, everything is reprocessed.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from pad.common import pad_util
+from pad.raw_processor import crossed_data
+from pad.raw_processor.merged_database import Database, code_hash
+
+logger = logging.getLogger('processor')
+
+SNAPSHOT_VERSION = 1
+
+# Packages whose code determines what gets stored; snapshots taken with different code are ignored.
+_CODE_PACKAGES = ('common', 'raw', 'raw_processor', 'storage', 'storage_processor')
+
+# The data sections that entity hashes are kept for.
+TRACKED_SECTIONS = frozenset([crossed_data.CARDS, crossed_data.SKILLS,
+                              crossed_data.ENEMY_SKILLS, crossed_data.DUNGEONS])
+
+EntityHashes = Dict[int, str]
+
+
+def _content_hash(obj) -> str:
+    return hashlib.sha256(pad_util.json_string_dump(obj).encode()).hexdigest()[:16]
+
+
+def _server_entities(db: Database, section: str) -> Dict[int, object]:
+    if section == crossed_data.CARDS:
+        return {monster_id: c.card for monster_id, c in db.monster_id_to_card.items()}
+    elif section == crossed_data.SKILLS:
+        return {s.skill_id: s for s in db.skills}
+    elif section == crossed_data.ENEMY_SKILLS:
+        return {es.enemy_skill_id: es for es in db.raw_enemy_skills}
+    elif section == crossed_data.DUNGEONS:
+        return {d.dungeon_id: d for d in db.dungeons}
+    raise ValueError('untracked section: {}'.format(section))
+
+
+def _changed_ids(old: EntityHashes, new: EntityHashes) -> Set[int]:
+    return {entity_id for entity_id, entity_hash in new.items() if old.get(entity_id) != entity_hash}
+
+
+class ChangeSet(object):
+    """Ids of the entities that changed since a snapshot.
+
+    monster_ids includes the cards whose skills or enemy skills changed, not just the cards themselves.
+    """
+
+    def __init__(self, monster_ids: Set[int], skill_ids: Set[int], enemy_skill_ids: Set[int], dungeon_ids: Set[int]):
+        self.monster_ids = monster_ids
+        self.skill_ids = skill_ids
+        self.enemy_skill_ids = enemy_skill_ids
+        self.dungeon_ids = dungeon_ids
+
+    def __str__(self):
+        return '{} monsters, {} skills, {} enemy skills, {} dungeons'.format(
+            len(self.monster_ids), len(self.skill_ids), len(self.enemy_skill_ids), len(self.dungeon_ids))
+
+
+class ChangeTracker(object):
+    """Computes entity hashes for the cross-server data and keeps a snapshot of them per processor."""
+
+    def __init__(self, snapshot_dir: str, server_name: str, data: crossed_data.CrossServerDatabase):
+        self.snapshot_dir = snapshot_dir
+        self.server_name = server_name.lower()
+        self.databases = [data.jp_database, data.na_database, data.kr_database]
+        self.code_hash = code_hash(_CODE_PACKAGES)
+        self._hashes = {}  # type: Dict[str, EntityHashes]
+
+    def hashes(self, section: str) -> EntityHashes:
+        """The hash of every entity in section, combining its raw data from each server."""
+        if section not in self._hashes:
+            server_hashes = [{k: _content_hash(v) for k, v in _server_entities(db, section).items()}
+                             for db in self.databases]
+            entity_ids = set().union(*server_hashes)
+            self._hashes[section] = {
+                entity_id: hashlib.sha256('|'.join(h.get(entity_id, '') for h in server_hashes).encode()).hexdigest()
+                for entity_id in entity_ids}
+        return self._hashes[section]
+
+    def _snapshot_file(self, processor_name: str) -> str:
+        return os.path.join(self.snapshot_dir, '{}_{}.json'.format(self.server_name, processor_name))
+
+    def changes(self, processor_name: str, sections: Iterable[str]) -> Optional[ChangeSet]:
+        """What changed in sections since processor_name last saved, or None if everything must be processed."""
+        sections = frozenset(sections) & TRACKED_SECTIONS
+        snapshot_file = self._snapshot_file(processor_name)
+        if not os.path.exists(snapshot_file):
+            logger.info('No entity snapshot for %s, processing everything', processor_name)
+            return None
+        with open(snapshot_file) as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('code_hash') != self.code_hash:
+            logger.info('Entity snapshot for %s is from other code, processing everything', processor_name)
+            return None
+        if not sections.issubset(snapshot['hashes']):
+            logger.info('Entity snapshot for %s is missing sections, processing everything', processor_name)
+            return None
+
+        changed = {}
+        for section in TRACKED_SECTIONS:
+            if section in sections:
+                old = {int(k): v for k, v in snapshot['hashes'][section].items()}
+                changed[section] = _changed_ids(old, self.hashes(section))
+            else:
+                changed[section] = set()
+
+        monster_ids = changed[crossed_data.CARDS] | self._monsters_using(changed[crossed_data.SKILLS],
+                                                                         changed[crossed_data.ENEMY_SKILLS])
+        change_set = ChangeSet(monster_ids, changed[crossed_data.SKILLS],
+                               changed[crossed_data.ENEMY_SKILLS], changed[crossed_data.DUNGEONS])
+        logger.info('Changed since the last %s run: %s', processor_name, change_set)
+        return change_set
+
+    def save(self, processor_name: str, sections: Iterable[str]):
+        """Records the current hashes for sections as processed by processor_name."""
+        sections = frozenset(sections) & TRACKED_SECTIONS
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'code_hash': self.code_hash,
+            'hashes': {section: self.hashes(section) for section in sorted(sections)},
+        }
+        snapshot_file = self._snapshot_file(processor_name)
+        # Concurrent runs for the same server each write their own temp file.
+        fd, tmp_file = tempfile.mkstemp(dir=self.snapshot_dir, prefix=os.path.basename(snapshot_file) + '.')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f, sort_keys=True)
+            os.replace(tmp_file, snapshot_file)
+        except BaseException:
+            os.remove(tmp_file)
+            raise
+
+    def _monsters_using(self, skill_ids: Set[int], enemy_skill_ids: Set[int]) -> Set[int]:
+        """Monster ids of the cards on any server whose skills or enemy skills are among the given ids."""
+        if not skill_ids and not enemy_skill_ids:
+            return set()
+        skill_ids = skill_ids | self._parent_skill_ids(skill_ids)
+        monster_ids = set()
+        for db in self.databases:
+            for monster_id, merged_card in db.monster_id_to_card.items():
+                card = merged_card.card
+                if card.active_skill_id in skill_ids or card.leader_skill_id in skill_ids:
+                    monster_ids.add(monster_id)
+                elif any(ref.enemy_skill_id in enemy_skill_ids for ref in card.enemy_skill_refs):
+                    monster_ids.add(monster_id)
+        return monster_ids
+
+    def _parent_skill_ids(self, skill_ids: Set[int]) -> FrozenSet[int]:
+        """Ids of the multi-part skills built from any of skill_ids, since their own raw data doesn't change."""
+        parents = {}  # type: Dict[int, Set[int]]
+        for db in self.databases:
+            for skill in [*db.leader_skills, *db.active_skills]:
+                for child in getattr(skill, 'child_skills', []):
+                    parents.setdefault(child.skill_id, set()).add(skill.skill_id)
+
+        result = set()
+        pending = list(skill_ids)
+        while pending:
+            for parent_id in parents.get(pending.pop(), ()):
+                if parent_id not in result:
+                    result.add(parent_id)
+                    pending.append(parent_id)
+        return frozenset(result)
@@ -1,6 +1,13 @@
+import functools
+import glob
+import hashlib
 import logging
+import multiprocessing
 import os
-from typing import List, Dict, Optional
+import pickle
+import sys
+import tempfile
+from typing import List, Dict, Optional, Tuple
 
 from pad.common import pad_util
 from pad.common.monster_id_mapping import server_monster_id_fn
@@ -14,9 +21,33 @@ from pad.raw.skills.leader_skill_info import LeaderSkill
 from pad.raw.skills.skill_parser import SkillParser
 from .merged_data import MergedBonus, MergedCard, MergedEnemy
 
+logger = logging.getLogger('processor')
 human_fix_logger = logging.getLogger('human_fix')
 fail_logger = logging.getLogger('processor_failures')
 
+# Bump to invalidate cached databases for changes outside the hashed parser sources.
+CACHE_VERSION = 1
+
+# Packages whose code determines the parsed result; their sources are part of the cache key.
+_PARSER_PACKAGES = ['common', 'raw', 'raw_processor']
+
+
+def _parser_code_hash() -> str:
+    return code_hash(tuple(_PARSER_PACKAGES))
+
+
+@functools.lru_cache(maxsize=None)
+def code_hash(packages: Tuple[str, ...]) -> str:
+    """A hash of the sources of the given packages under pad/."""
+    pad_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code_hash = hashlib.sha256()
+    for package in packages:
+        for file_path in sorted(glob.glob(os.path.join(pad_dir, package, '**', '*.py'), recursive=True)):
+            code_hash.update(os.path.relpath(file_path, pad_dir).encode())
+            with open(file_path, 'rb') as f:
+                code_hash.update(f.read())
+    return code_hash.hexdigest()
+
 
 def _clean_bonuses(server: Server, raw_bonuses, dungeons) -> List[MergedBonus]:
     dungeons_by_id = {d.dungeon_id: d for d in dungeons}
@@ -114,9 +145,94 @@ class Database(object):
         self.monster_id_to_card = {}  # type: Dict[MonsterId, MergedCard]
         self.enemy_id_to_enemy = {}
 
-    def load_database(self, skip_skills=False, skip_bonus=False, skip_extra=False):
+    def load_database(self, skip_skills=False, skip_bonus=False, skip_extra=False, skip_cards=False,
+                      skip_enemy_skills=False, cache_dir: Optional[str] = None):
+        """Loads and parses the raw data, except for the skipped sections.
+
+        Cards are linked to their enemy skills, so skip_enemy_skills only applies along with skip_cards.
+
+        If cache_dir is set, the parsed database is pickled there and reused while the source files, the
+        parser code and the skip flags are unchanged; otherwise, or if the cache can't be read, it's parsed
+        from scratch. Warnings logged while parsing aren't repeated on a cached load.
+        """
+        skip_enemy_skills = skip_enemy_skills and skip_cards
+        flags = (skip_skills, skip_bonus, skip_extra, skip_cards, skip_enemy_skills)
+        if cache_dir is None:
+            self._load_database(*flags)
+            return
+
+        cache_file = os.path.join(cache_dir, '{}_database_{}.pickle'.format(
+            self.server.name, ''.join('{:d}'.format(flag) for flag in flags)))
+        cache_key = self._cache_key(*flags)
+        if self._load_cache(cache_file, cache_key):
+            logger.info('loaded cached %s database', self.server.name)
+            return
+
+        self._load_database(*flags)
+        self._save_cache(cache_file, cache_key)
+
+    def _source_files(self, skip_skills: bool, skip_bonus: bool, skip_extra: bool, skip_cards: bool,
+                      skip_enemy_skills: bool) -> List[str]:
+        file_names = [dungeon.FILE_NAME]
+        if not skip_cards:
+            file_names.append(card.FILE_NAME)
+        if not skip_enemy_skills:
+            file_names.append(enemy_skill.FILE_NAME)
+        if not skip_bonus:
+            file_names.append(bonus.FILE_NAME)
+        if not skip_skills:
+            file_names.append(skill.FILE_NAME)
+        if not skip_extra:
+            file_names.extend([exchange.FILE_NAME, purchase.FILE_NAME, extra_egg_machine.FILE_NAME])
+        return file_names
+
+    def _cache_key(self, *flags: bool) -> str:
+        key_hash = hashlib.sha256()
+        key_hash.update('{} {} {}'.format(CACHE_VERSION, sys.version, _parser_code_hash()).encode())
+        key_hash.update('{} {}'.format(self.server.name, flags).encode())
+        for file_name in self._source_files(*flags):
+            key_hash.update(file_name.encode())
+            file_path = os.path.join(self.base_dir, file_name)
+            if os.path.exists(file_path):
+                with open(file_path, 'rb') as f:
+                    key_hash.update(hashlib.sha256(f.read()).digest())
+        return key_hash.hexdigest()
+
+    def _load_cache(self, cache_file: str, cache_key: str) -> bool:
+        if not os.path.exists(cache_file):
+            return False
+        try:
+            with open(cache_file, 'rb') as f:
+                # The key is pickled separately, so a stale cache is detected without loading the rest.
+                if pickle.load(f) != cache_key:
+                    logger.info('cached %s database is stale', self.server.name)
+                    return False
+                self.__dict__.update(pickle.load(f))
+            return True
+        except Exception as ex:
+            logger.warning('failed to load cached %s database: %s', self.server.name, ex)
+            return False
+
+    def _save_cache(self, cache_file: str, cache_key: str):
+        cache_dir = os.path.dirname(cache_file) or '.'
+        os.makedirs(cache_dir, exist_ok=True)
+        # Other jobs can be writing the same cache file, so each writer gets its own temp file.
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(cache_file) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(cache_key, f, protocol=pickle.HIGHEST_PROTOCOL)
+                state = {k: v for k, v in self.__dict__.items() if k not in ('server', 'base_dir')}
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except Exception as ex:
+            logger.warning('failed to cache %s database: %s', self.server.name, ex)
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def _load_database(self, skip_skills: bool, skip_bonus: bool, skip_extra: bool, skip_cards: bool,
+                       skip_enemy_skills: bool):
         base_dir = self.base_dir
-        raw_cards = card.load_card_data(data_dir=base_dir)
+        raw_cards = [] if skip_cards else card.load_card_data(data_dir=base_dir)
         self.dungeons = dungeon.load_dungeon_data(data_dir=base_dir)
 
         if not skip_bonus:
@@ -131,11 +247,12 @@ class Database(object):
             self.skill_id_to_leader_skill = {s.skill_id: s for s in self.leader_skills}
             self.skill_id_to_active_skill = {s.skill_id: s for s in self.active_skills}
 
-        self.raw_enemy_skills = enemy_skill.load_enemy_skill_data(data_dir=base_dir)
-        es_parser = BehaviorParser()
-        es_parser.parse(self.raw_enemy_skills)
-        self.enemy_skills = es_parser.enemy_behaviors
-        self.es_id_to_enemy_skill = {es.enemy_skill_id: es for es in self.enemy_skills}
+        if not skip_enemy_skills:
+            self.raw_enemy_skills = enemy_skill.load_enemy_skill_data(data_dir=base_dir)
+            es_parser = BehaviorParser()
+            es_parser.parse(self.raw_enemy_skills)
+            self.enemy_skills = es_parser.enemy_behaviors
+            self.es_id_to_enemy_skill = {es.enemy_skill_id: es for es in self.enemy_skills}
 
         if not skip_extra:
             self.exchange = exchange.load_data(data_dir=base_dir, server=self.server)
@@ -191,3 +308,25 @@ class Database(object):
 
     def enemy_by_id(self, enemy_id):
         return self.enemy_id_to_enemy.get(enemy_id, None)
+
+
+def _load_server_database(task) -> Database:
+    server, raw_dir, load_args = task
+    database = Database(server, raw_dir)
+    database.load_database(**load_args)
+    return database
+
+
+def load_all(servers: List[Server], raw_dir: str, workers: int = 3, **load_args) -> List[Database]:
+    """Loads the Database for each server, in the same order, parsing up to workers of them at once.
+
+    Each server is parsed in its own forked process and the result is sent back to this one. load_args
+    are passed on to Database.load_database.
+    """
+    tasks = [(server, raw_dir, load_args) for server in servers]
+    if workers <= 1 or len(tasks) <= 1:
+        return [_load_server_database(task) for task in tasks]
+
+    # Forked so the workers inherit the logging setup, e.g. the human_fix file handler.
+    with multiprocessing.get_context('fork').Pool(min(workers, len(tasks))) as pool:
+        return pool.map(_load_server_database, tasks)
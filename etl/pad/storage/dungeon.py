@@ -1,7 +1,7 @@
 from typing import Optional
 
 from pad.common.monster_id_mapping import server_monster_id_fn
-from pad.db.sql_item import ExistsStrategy
+from pad.db.sql_item import ExistsStrategy, SimpleSqlItem
 from pad.dungeon.wave_converter import ResultFloor
 from pad.raw.dungeon import FixedTeamMonster as FixedCardObject
 from pad.raw_processor.crossed_data import CrossServerDungeon, CrossServerSubDungeon
@@ -181,6 +181,27 @@ class SubDungeonWaveData(ServerDependentSqlItem):
         return 'SDWaveData({}): {}'.format(self.key_value(), self.icon_id)
 
 
+class SubDungeonFingerprint(SimpleSqlItem):
+    """The inputs a sub-dungeon's wave-derived contents were last computed from."""
+    TABLE = 'sub_dungeon_fingerprints'
+    KEY_COL = 'sub_dungeon_id'
+
+    def __init__(self,
+                 sub_dungeon_id: int = None,
+                 max_wave_id: int = None,
+                 wave_count: int = None,
+                 monster_ids: str = None,
+                 card_hash: str = None):
+        self.sub_dungeon_id = sub_dungeon_id
+        self.max_wave_id = max_wave_id
+        self.wave_count = wave_count
+        self.monster_ids = monster_ids  # Comma separated enemy and drop monster ids
+        self.card_hash = card_hash
+
+    def __str__(self):
+        return 'SDFingerprint({}): {}/{}'.format(self.key_value(), self.max_wave_id, self.wave_count)
+
+
 class SubDungeonRewardData(ServerDependentSqlItem):
     """Sub-dungeon data that can only be computed from bonus floor text."""
     KEY_COL = 'sub_dungeon_id'
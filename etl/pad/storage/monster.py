@@ -3,7 +3,6 @@ from typing import List, Optional
 
 from pad.common.shared_types import MonsterId, MonsterNo, Server
 from pad.common.utils import format_int_list
-from pad.db import sql_item
 from pad.db.sql_item import ExistsStrategy, SimpleSqlItem
 from pad.raw_processor.crossed_data import CrossServerCard
 from pad.storage_processor.shared_storage import ServerDependentSqlItem
@@ -335,19 +334,15 @@ class Awakening(ServerDependentSqlItem):
     def exists_strategy(self):
         return ExistsStrategy.BY_VALUE
 
-    def value_exists_sql(self):
-        sql = """
-        SELECT awakening_id FROM {table}
-        WHERE monster_id = {monster_id} and order_idx = {order_idx}
-        """.format(table=self._table(), **sql_item.object_to_sql_params(self))
-        return sql
-
     def _non_auto_insert_cols(self):
         return [self._key()]
 
     def _non_auto_update_cols(self):
         return [self._key()]
 
+    def _lookup_columns(self):
+        return ['monster_id', 'order_idx']
+
     def __str__(self):
         return 'Awakening ({}): {} -> {}, super={}'.format(
             self.key_value(), self.monster_id, self.awoken_skill_id, self.is_super)
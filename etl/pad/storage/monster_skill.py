@@ -1,8 +1,7 @@
 import json
 from typing import List
 
-from pad.db.db_util import DbWrapper
-from pad.db.sql_item import ExistsStrategy
+from pad.db.sql_item import ExistsStrategy, SqlItem
 from pad.raw.skills import skill_text_typing
 from pad.raw.skills.active_behaviors import behavior_to_json
 from pad.raw.skills.active_skill_info import ActiveSkill as ASSkill
@@ -326,14 +325,16 @@ class ActiveSubskillsParts(ServerDependentSqlItem):
                                                                  self.active_part_id, self.order_idx)
 
 
-def upsert_active_skill_data(db: DbWrapper, skill: CrossServerSkill):
-    db.insert_or_update(ActiveSkill.from_css(skill))
+def active_skill_data_items(skill: CrossServerSkill) -> List[SqlItem]:
+    """Items for an active skill and its subskills/parts, in insert order."""
+    items = [ActiveSkill.from_css(skill)]
     for c, subskill in enumerate(skill.cur_skill.subskills):
-        db.insert_or_update(ActiveSubskill.from_as(subskill))
+        items.append(ActiveSubskill.from_as(subskill))
         for c2, part in enumerate(subskill.parts):
-            db.insert_or_update(ActivePart.from_as(part))
-            db.insert_or_update(ActiveSubskillsParts.from_css(subskill, part, c2))
-        db.insert_or_update(ActiveSkillsSubskills.from_css(skill, subskill, c))
+            items.append(ActivePart.from_as(part))
+            items.append(ActiveSubskillsParts.from_css(subskill, part, c2))
+        items.append(ActiveSkillsSubskills.from_css(skill, subskill, c))
+    return items
 
 
 class LeaderSkill(ServerDependentSqlItem):
@@ -1,9 +1,17 @@
+import logging
+import os
+import tempfile
+from typing import List
+
 from pad.common import monster_id_mapping
 from pad.common.monster_id_mapping import server_monster_id_fn
 from pad.common.shared_types import Server
-from pad.db.sql_item import SqlItem
+from pad.db.db_util import DbWrapper
+from pad.db.sql_item import SimpleSqlItem, SqlItem, generate_insert_template
 from pad.raw import wave as wave_data
 
+logger = logging.getLogger('database')
+
 
 class WaveItem(SqlItem):
     DROP_MONSTER_ID_GOLD = 9900
@@ -79,3 +87,124 @@ class WaveItem(SqlItem):
 
     def _insert_columns(self):
         return self.__dict__.keys()
+
+
+class WaveEntry(SimpleSqlItem):
+    """One dungeon entry; the database assigns its entry_id, which its waves in wave_data share."""
+    TABLE = 'wave_entries'
+    KEY_COL = 'entry_id'
+
+    def __init__(self,
+                 entry_id: int = None,
+                 pull_id: int = None,
+                 server: str = None,
+                 dungeon_id: int = None,
+                 floor_id: int = None):
+        self.entry_id = entry_id
+        self.pull_id = pull_id
+        self.server = server
+        self.dungeon_id = dungeon_id
+        self.floor_id = floor_id
+
+    def __str__(self):
+        return 'WaveEntry({}): {} {}/{}'.format(self.key_value(), self.server, self.dungeon_id, self.floor_id)
+
+
+def entry_wave_items(wave_response: wave_data.WaveResponse, leaders: List[int], server: str, pull_id: int,
+                     dungeon_id: int, floor_id: int) -> List[WaveItem]:
+    """Converts the waves from one dungeon entry into WaveItems; WaveWriter fills in the entry_id."""
+    wave_items = []
+    for stage_idx, floor in enumerate(wave_response.floors):
+        for monster_idx, monster in enumerate(floor.monsters):
+            wave_items.append(WaveItem(pull_id=pull_id, server=server,
+                                       dungeon_id=dungeon_id, floor_id=floor_id, stage=stage_idx,
+                                       slot=monster_idx, monster=monster,
+                                       leader_id=leaders[0], friend_id=leaders[1]))
+    return wave_items
+
+
+class WaveWriter(object):
+    """Buffers WaveItems per entry and writes them in bulk.
+
+    Entries are only added whole, and each flush runs in a single transaction, so a failed or
+    interrupted pull never leaves a partial entry in wave_data. Buffered entries are dropped if
+    the writer exits on an exception.
+
+    Each entry gets its entry_id from a row in wave_entries, inserted in the same transaction, so
+    concurrent writers in any number of processes never hand out the same id.
+
+    With use_load_data, flushes go through LOAD DATA LOCAL INFILE instead of a multi-row INSERT;
+    the connection must be opened with local_infile set in the db config.
+    """
+    # Written explicitly so the id is left to auto-increment.
+    COLS = ['pull_id', 'entry_id', 'server', 'dungeon_id', 'floor_id', 'stage', 'slot',
+            'spawn_type', 'monster_id', 'monster_level', 'drop_monster_id', 'drop_monster_level',
+            'plus_amount', 'leader_id', 'friend_id']
+
+    def __init__(self, db: DbWrapper, entries_per_flush: int = 1, use_load_data: bool = False):
+        self.db = db
+        self.entries_per_flush = max(entries_per_flush, 1)
+        self.use_load_data = use_load_data
+        self.entries = []  # type: List[List[WaveItem]]
+        self.written_entries = 0
+        self.written_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        elif self.entries:
+            logger.warning('dropping %d unwritten wave entries', len(self.entries))
+            self.entries.clear()
+
+    def add_entry(self, items: List[WaveItem]):
+        """Buffers all the waves from one dungeon entry, flushing if the buffer is full."""
+        self.entries.append(items)
+        if len(self.entries) >= self.entries_per_flush:
+            self.flush()
+
+    def flush(self):
+        if not self.entries:
+            return
+
+        entries = [entry for entry in self.entries if entry]
+        if self.db.dry_run:
+            logger.warning('not writing %d wave rows due to dry run', sum(map(len, entries)))
+        elif entries:
+            with self.db.transaction():
+                wave_entries = [WaveEntry(pull_id=entry[0].pull_id, server=entry[0].server,
+                                          dungeon_id=entry[0].dungeon_id, floor_id=entry[0].floor_id)
+                                for entry in entries]
+                self.db.insert_new_many(wave_entries)
+                for wave_entry, entry in zip(wave_entries, entries):
+                    for item in entry:
+                        item.entry_id = wave_entry.entry_id
+
+                rows = [tuple(getattr(item, c) for c in WaveWriter.COLS) for entry in entries for item in entry]
+                if self.use_load_data:
+                    self._load_data(rows)
+                else:
+                    sql = generate_insert_template(WaveItem.TABLE, WaveWriter.COLS)
+                    with self.db.connection.cursor() as cursor:
+                        self.db.execute_many(cursor, sql, rows)
+            self.written_entries += len(entries)
+            self.written_rows += len(rows)
+
+        self.entries.clear()
+
+    def _load_data(self, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False) as f:
+            for row in rows:
+                f.write('\t'.join('\\N' if v is None else str(v) for v in row) + '\n')
+            file_path = f.name
+
+        sql = ("LOAD DATA LOCAL INFILE %s INTO TABLE {}"
+               " FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({})").format(
+            WaveItem.TABLE, ', '.join(WaveWriter.COLS))
+        try:
+            with self.db.connection.cursor() as cursor:
+                self.db.execute(cursor, sql, (file_path,))
+        finally:
+            os.remove(file_path)
@@ -1,26 +1,125 @@
+import hashlib
+import itertools
 import logging
-from typing import Optional
+import multiprocessing
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 from pad.common.dungeon_types import RawDungeonType
 from pad.common.icons import SpecialIcons
 from pad.common.shared_types import Server
 from pad.db.db_util import DbWrapper
-from pad.dungeon.wave_converter import WaveConverter, ResultFloor
+from pad.dungeon.vector_wave_converter import VectorWaveConverter
+from pad.dungeon.wave_converter import ResultFloor, group_entries
 from pad.raw.bonus import BonusType
 from pad.raw_processor import crossed_data
 from pad.raw_processor.crossed_data import CrossServerSubDungeon, CrossServerDungeon
-from pad.storage.dungeon import SubDungeonWaveData, DungeonWaveData, SubDungeonRewardData, DungeonRewardData
+from pad.storage.dungeon import SubDungeonWaveData, DungeonWaveData, SubDungeonRewardData, DungeonRewardData, \
+    SubDungeonFingerprint
 from pad.storage.encounter import Encounter, Drop
 from pad.storage.wave import WaveItem
+from pad.storage_processor.wave_summary_processor import WaveSummaryProcessor
 
 logger = logging.getLogger('processor')
 human_fix_logger = logging.getLogger('human_fix')
 
+# Card fields that feed into the converted floor, encounters and drops.
+_FINGERPRINT_CARD_FIELDS = [
+    'enemy_turns', 'enemy_turns_alt',
+    'enemy_hp_min', 'enemy_hp_max', 'enemy_hp_scale',
+    'enemy_atk_min', 'enemy_atk_max', 'enemy_atk_scale',
+    'enemy_def_min', 'enemy_def_max', 'enemy_def_scale',
+    'enemy_max_level', 'enemy_coins_per_level', 'enemy_xp_per_level',
+    'sell_mp',
+]
+
+# Part of every card hash; bump it whenever the wave converter or the contents computed from its
+# result change, so floors stored by the old code get recomputed.
+_CONVERTER_VERSION = 2
+
+
+class FloorContents(object):
+    """Everything computed from a floor's waves, in a form that can be sent back from a worker."""
+
+    def __init__(self,
+                 sub_dungeon_id: int,
+                 wave_data: SubDungeonWaveData,
+                 stage_idxs: List[int],
+                 encounters: List[Tuple[Encounter, List[int]]],
+                 monster_ids: List[int]):
+        self.sub_dungeon_id = sub_dungeon_id
+        self.wave_data = wave_data
+        self.stage_idxs = stage_idxs
+        self.encounters = encounters  # Encounters with their drop monster ids
+        self.monster_ids = monster_ids
+
+
+class StoredEncounters(object):
+    """The encounters and drops already stored for a sub-dungeon, loaded with one query."""
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = []  # type: List[Dict]
+        self.encounter_ids = defaultdict(list)  # type: Dict[Tuple[int, int, int], List[int]]
+        self.drops_by_encounter = defaultdict(set)  # type: Dict[int, Set[int]]
+
+        # There is a row per drop, or a single row for encounters without drops.
+        for row in rows:
+            encounter_id = row['encounter_id']
+            if encounter_id not in self.drops_by_encounter:
+                self.encounter_ids[(row['stage'], row['enemy_id'], row['level'])].append(encounter_id)
+                self.rows.append(row)
+            if row['drop_monster_id'] is not None:
+                self.drops_by_encounter[encounter_id].add(row['drop_monster_id'])
+            else:
+                self.drops_by_encounter[encounter_id] = set()
+
+    @staticmethod
+    def load(db: DbWrapper, dungeon_id: int, sub_dungeon_id: int) -> 'StoredEncounters':
+        sql = '''
+            SELECT encounter_id, stage, enemy_id, level, drops.monster_id AS drop_monster_id
+            FROM encounters
+            LEFT JOIN drops USING (encounter_id)
+            WHERE dungeon_id={}
+            AND sub_dungeon_id={}
+            '''.format(dungeon_id, sub_dungeon_id)
+        return StoredEncounters(db.fetch_data(sql))
+
+    def find(self, stage: int, enemy_id: int, level: int) -> Optional[int]:
+        encounter_ids = self.encounter_ids.get((stage, enemy_id, level), [])
+        if len(encounter_ids) > 1:
+            raise ValueError('got too many results:', len(encounter_ids), stage, enemy_id, level)
+        return encounter_ids[0] if encounter_ids else None
+
+
+# Only set in pool workers, by _init_worker.
+_worker_processor = None  # type: Optional[DungeonContentProcessor]
+
+
+def _init_worker(processor: 'DungeonContentProcessor'):
+    global _worker_processor
+    _worker_processor = processor
+
+
+def _compute_dungeon_contents(task) -> List[FloorContents]:
+    return _worker_processor._compute_dungeon_contents(task)
+
 
 class DungeonContentProcessor(object):
-    def __init__(self, data: crossed_data.CrossServerDatabase):
+    DATA_SECTIONS = frozenset([crossed_data.CARDS, crossed_data.DUNGEONS, crossed_data.BONUSES])
+
+    def __init__(self,
+                 data: crossed_data.CrossServerDatabase,
+                 use_wave_summary: bool = False,
+                 force: bool = False,
+                 workers: int = 1):
         self.data = data
-        self.converter = WaveConverter(data)
+        self.converter = VectorWaveConverter(data)
+        # Compute floors from the wave_summary aggregates instead of raw wave_data.
+        self.use_wave_summary = use_wave_summary
+        # Recompute every dungeon, even if its fingerprints are unchanged.
+        self.force = force
+        # Processes used to convert waves; the database is only written from this one.
+        self.workers = workers
 
     def process(self, db: DbWrapper):
         logger.info('loading dungeon contents')
@@ -31,55 +130,186 @@ class DungeonContentProcessor(object):
         logger.info('done loading contents')
 
     def _process_dungeon_contents(self, db: DbWrapper):
-        for dungeon in self.data.dungeons:
+        floor_stats = self._load_floor_stats(db)
+        fingerprints = {x.sub_dungeon_id: x for x in db.custom_load_multiple_objects(
+            SubDungeonFingerprint, 'SELECT * FROM {}'.format(SubDungeonFingerprint.TABLE))}
+
+        # Dungeon wave data depends on all the floors, so dungeons are recomputed as a whole.
+        changed_dungeons = [d for d in self.data.dungeons
+                            if self.force or self._is_changed(d, floor_stats, fingerprints)]
+        logger.info('dungeons with changed waves or cards: %s of %s', len(changed_dungeons), len(self.data.dungeons))
+        if not changed_dungeons:
+            return
+
+        floor_contents = self._compute_floor_contents(db, changed_dungeons)
+
+        for dungeon in changed_dungeons:
             if dungeon.dungeon_id % 250 == 0:
                 logger.info('scanning dungeon:%s', dungeon.dungeon_id)
             sub_dungeon_items = []
 
             for sub_dungeon in dungeon.sub_dungeons:
-                result_floor = self._compute_result_floor(db, dungeon, sub_dungeon)
-                if result_floor:
-                    item = SubDungeonWaveData.from_waveresult(result_floor, sub_dungeon)
-                    db.insert_or_update(item)
-                    sub_dungeon_items.append(item)
-
-                    self._maybe_insert_encounters(db, dungeon, sub_dungeon, result_floor)
+                contents = floor_contents.get(sub_dungeon.sub_dungeon_id)
+                if contents:
+                    db.insert_or_update(contents.wave_data)
+                    sub_dungeon_items.append(contents.wave_data)
+
+                    self._maybe_insert_encounters(db, dungeon, sub_dungeon, contents)
+
+                # Floors that lost all their waves keep an empty fingerprint so they stop showing as changed.
+                stats = floor_stats.get(sub_dungeon.sub_dungeon_id, (0, 0))
+                if contents or sub_dungeon.sub_dungeon_id in fingerprints:
+                    monster_ids = contents.monster_ids if contents else []
+                    db.insert_or_update(SubDungeonFingerprint(
+                        sub_dungeon_id=sub_dungeon.sub_dungeon_id,
+                        max_wave_id=stats[0],
+                        wave_count=stats[1],
+                        monster_ids=','.join(map(str, monster_ids)),
+                        card_hash=self._card_hash(dungeon, sub_dungeon, monster_ids)))
 
             if sub_dungeon_items:
                 max_sub_dungeon = max(sub_dungeon_items, key=lambda x: x.sub_dungeon_id)
                 item = DungeonWaveData(dungeon_id=dungeon.dungeon_id, icon_id=max_sub_dungeon.icon_id)
                 db.insert_or_update(item)
 
+    def _load_floor_stats(self, db: DbWrapper) -> Dict[int, Tuple[int, int]]:
+        """Returns the (max wave id, wave count) of each floor with waves, keyed by sub_dungeon_id."""
+        if self.use_wave_summary:
+            WaveSummaryProcessor().process(db)
+            rows = WaveSummaryProcessor.load_floor_stats(db)
+        else:
+            sql = ('SELECT dungeon_id, floor_id, MAX(id) AS max_wave_id, COUNT(*) AS wave_count'
+                   ' FROM wave_data GROUP BY dungeon_id, floor_id')
+            rows = db.fetch_data(sql)
+        return {r['dungeon_id'] * 1000 + r['floor_id']: (int(r['max_wave_id']), int(r['wave_count'])) for r in rows}
+
+    def _is_changed(self,
+                    dungeon: CrossServerDungeon,
+                    floor_stats: Dict[int, Tuple[int, int]],
+                    fingerprints: Dict[int, SubDungeonFingerprint]) -> bool:
+        for sub_dungeon in dungeon.sub_dungeons:
+            stats = floor_stats.get(sub_dungeon.sub_dungeon_id, (0, 0))
+            fingerprint = fingerprints.get(sub_dungeon.sub_dungeon_id)
+            if fingerprint is None:
+                if stats != (0, 0):
+                    return True
+                continue
+            if stats != (fingerprint.max_wave_id, fingerprint.wave_count):
+                return True
+            monster_ids = [int(x) for x in fingerprint.monster_ids.split(',') if x]
+            if fingerprint.card_hash != self._card_hash(dungeon, sub_dungeon, monster_ids):
+                return True
+        return False
+
+    @staticmethod
+    def _referenced_monster_ids(result_floor: ResultFloor) -> List[int]:
+        monster_ids = set()
+        for stage in result_floor.stages:
+            for slot in stage.slots:
+                monster_ids.add(slot.monster_id)
+                monster_ids.update(drop.monster_id for drop in slot.drops)
+        return sorted(monster_ids)
+
+    def _card_hash(self,
+                   dungeon: CrossServerDungeon,
+                   sub_dungeon: CrossServerSubDungeon,
+                   monster_ids: List[int]) -> str:
+        """Hashes the converter version, and the dungeon and card data the floor's contents are computed from."""
+        sd = sub_dungeon.cur_sub_dungeon
+        values = [_CONVERTER_VERSION,
+                  dungeon.cur_dungeon.full_dungeon_type.value, sd.hp_mult, sd.atk_mult, sd.def_mult]
+        for monster_id in monster_ids:
+            csc = self.data.card_by_monster_id(monster_id)
+            card = csc.cur_card.card if csc else None
+            values.append([monster_id] + [getattr(card, f, None) for f in _FINGERPRINT_CARD_FIELDS])
+        return hashlib.sha1(repr(values).encode()).hexdigest()
+
+    def _compute_floor_contents(self,
+                                db: DbWrapper,
+                                dungeons: List[CrossServerDungeon]) -> Dict[int, FloorContents]:
+        """Computes the contents of every floor with waves in the dungeons, keyed by sub_dungeon_id.
+
+        The waves (or wave summaries) for all the dungeons are streamed once in floor order and
+        handed out per dungeon, so floors without waves cost nothing. With more than one worker,
+        dungeons are converted in a process pool. Nothing else can be queried until the stream is
+        drained, so the results are collected before any writes.
+        """
+        floor_contents = {}
+        if self.workers > 1:
+            # The cards are merged on first use; do it before forking so the workers don't each redo it.
+            self.data.all_cards
+            # Forked workers share the loaded data instead of having it pickled to them. The pool starts its
+            # workers right away, before the wave stream is opened, so they never inherit an open cursor.
+            pool = multiprocessing.get_context('fork').Pool(self.workers, initializer=_init_worker, initargs=(self,))
+            with pool:
+                for dungeon_contents in pool.imap(_compute_dungeon_contents, self._stream_tasks(db, dungeons)):
+                    floor_contents.update((x.sub_dungeon_id, x) for x in dungeon_contents)
+        else:
+            for task in self._stream_tasks(db, dungeons):
+                floor_contents.update((x.sub_dungeon_id, x) for x in self._compute_dungeon_contents(task))
+
+        return floor_contents
+
+    def _stream_tasks(self, db: DbWrapper, dungeons: List[CrossServerDungeon]) -> Iterator[Tuple[int, List]]:
+        """Streams the floors with waves as one (dungeon_id, [(floor_id, entries), ...]) task per dungeon."""
+        dungeon_ids = [d.dungeon_id for d in dungeons]
+        known_floors = {(d.dungeon_id, sd.sub_dungeon_id % 1000) for d in dungeons for sd in d.sub_dungeons}
+
+        if self.use_wave_summary:
+            logger.info('streaming wave summaries')
+            floors = WaveSummaryProcessor.stream_floors(db, dungeon_ids)
+        else:
+            logger.info('streaming waves')
+            sql = 'SELECT * FROM wave_data WHERE dungeon_id IN ({}) ORDER BY dungeon_id, floor_id, id'.format(
+                ','.join(map(str, dungeon_ids)))
+            wave_items = db.stream_objects(WaveItem, sql)
+            floors = ((floor_key, group_entries(floor_wave_items)) for floor_key, floor_wave_items
+                      in itertools.groupby(wave_items, key=lambda x: (x.dungeon_id, x.floor_id)))
+
+        floors = ((floor_key, list(entries)) for floor_key, entries in floors if floor_key in known_floors)
+        for dungeon_id, dungeon_floors in itertools.groupby(floors, key=lambda x: x[0][0]):
+            yield dungeon_id, [(floor_key[1], entries) for floor_key, entries in dungeon_floors]
+
+    def _compute_dungeon_contents(self, task: Tuple[int, List[Tuple[int, List]]]) -> List[FloorContents]:
+        """Converts a dungeon's floors and computes their encounters; doesn't touch the database."""
+        dungeon_id, floors = task
+        dungeon = self.data.dungeon_by_id(dungeon_id)
+        sub_dungeons = {sd.sub_dungeon_id: sd for sd in dungeon.sub_dungeons}
+
+        results = []
+        for floor_id, entries in floors:
+            sub_dungeon = sub_dungeons[dungeon_id * 1000 + floor_id]
+            result_floor = self._compute_result_floor(dungeon, entries)
+            if result_floor:
+                results.append(FloorContents(
+                    sub_dungeon_id=sub_dungeon.sub_dungeon_id,
+                    wave_data=SubDungeonWaveData.from_waveresult(result_floor, sub_dungeon),
+                    stage_idxs=[stage.stage_idx for stage in result_floor.stages],
+                    encounters=self._compute_encounters(dungeon, sub_dungeon, result_floor),
+                    monster_ids=self._referenced_monster_ids(result_floor)))
+        return results
+
     def _compute_result_floor(self,
-                              db: DbWrapper,
                               dungeon: CrossServerDungeon,
-                              sub_dungeon: CrossServerSubDungeon) -> Optional[ResultFloor]:
-        floor_id = sub_dungeon.sub_dungeon_id % 1000
-        sql = 'SELECT * FROM wave_data WHERE dungeon_id={} and floor_id={}'.format(
-            dungeon.dungeon_id, floor_id)
-        wave_items = db.custom_load_multiple_objects(WaveItem, sql)
-
-        if not wave_items:
-            return None
-
+                              entries: Iterable[Tuple[List[WaveItem], int]]) -> Optional[ResultFloor]:
         normal_or_tech = dungeon.cur_dungeon.full_dungeon_type in [RawDungeonType.NORMAL,
                                                                    RawDungeonType.TECHNICAL]
         try_common_monsters = normal_or_tech and dungeon.cur_dungeon.dungeon_id < 1000
 
-        return self.converter.convert(wave_items, try_common_monsters)
+        # Returns None if there were no waves for the floor.
+        return self.converter.convert_entries(entries, try_common_monsters)
 
-    def _maybe_insert_encounters(self,
-                                 db: DbWrapper,
-                                 dungeon: CrossServerDungeon,
-                                 sub_dungeon: CrossServerSubDungeon,
-                                 result_floor: ResultFloor):
+    def _compute_encounters(self,
+                            dungeon: CrossServerDungeon,
+                            sub_dungeon: CrossServerSubDungeon,
+                            result_floor: ResultFloor) -> List[Tuple[Encounter, List[int]]]:
+        """Returns each slot's encounter, without an encounter_id, and its drop monster ids."""
+        encounters = []
         for stage in result_floor.stages:
-            seen_enemies = set()
             for slot in stage.slots:
                 csc = self.data.card_by_monster_id(slot.monster_id)
                 card = csc.cur_card.card
                 enemy = card.enemy()
-                seen_enemies.add(slot.monster_id)
 
                 turns = card.enemy_turns
                 if dungeon.cur_dungeon.full_dungeon_type == RawDungeonType.TECHNICAL and card.enemy_turns_alt:
@@ -106,55 +336,65 @@ class DungeonContentProcessor(object):
                     atk=atk,
                     defense=defense,
                     exp=exp)
+                encounters.append((encounter, [drop_card.monster_id for drop_card in slot.drops]))
+        return encounters
 
-                sql = '''
-                    SELECT encounter_id 
-                    FROM encounters 
-                    WHERE dungeon_id={} 
-                    AND sub_dungeon_id={}
-                    AND stage={}
-                    AND enemy_id={}
-                    AND level={}
-                '''.format(dungeon.dungeon_id, sub_dungeon.sub_dungeon_id, stage.stage_idx,
-                           slot.monster_id, slot.monster_level)
-                stored_encounter_id = db.get_single_value(sql, int, fail_on_empty=False)
-
-                if stored_encounter_id:
-                    encounter.encounter_id = stored_encounter_id
-
-                db.insert_or_update(encounter)
-
-                drops = Drop.from_slot(slot, encounter)
-                for drop in drops:
-                    db.insert_or_update(drop)
-
+    def _maybe_insert_encounters(self,
+                                 db: DbWrapper,
+                                 dungeon: CrossServerDungeon,
+                                 sub_dungeon: CrossServerSubDungeon,
+                                 contents: FloorContents):
+        stored = StoredEncounters.load(db, dungeon.dungeon_id, sub_dungeon.sub_dungeon_id)
+
+        # Stored encounters are upserted by id. New ones are inserted together, which gives their ids
+        # for the drops; drops missing from the stored ones are known to be new, so they skip the lookups.
+        stored_items = []
+        new_encounters = []
+        for encounter, _ in contents.encounters:
+            stored_encounter_id = stored.find(encounter.stage, encounter.enemy_id, encounter.level)
+            if stored_encounter_id:
+                encounter.encounter_id = stored_encounter_id
+                stored_items.append(encounter)
+            else:
+                new_encounters.append(encounter)
+        if stored_items:
+            db.insert_or_update_many(stored_items)
+        db.insert_new_many(new_encounters)
+
+        new_drops = []
+        for encounter, drop_monster_ids in contents.encounters:
+            if not encounter.encounter_id:
+                continue  # Not inserted on a dry run
+            stored_drops = stored.drops_by_encounter.get(encounter.encounter_id, set())
+            new_drops.extend(Drop(encounter_id=encounter.encounter_id, monster_id=drop_monster_id)
+                             for drop_monster_id in dict.fromkeys(drop_monster_ids)
+                             if drop_monster_id not in stored_drops)
+        db.insert_new_many(new_drops)
+
+        bad_encounters = []
+        for stage_idx in contents.stage_idxs:
+            seen_enemies = {e.enemy_id for e, _ in contents.encounters if e.stage == stage_idx}
             if seen_enemies:
-                sql = '''
-                    SELECT encounter_id, enemy_id
-                    FROM encounters
-                    WHERE dungeon_id={}
-                    AND sub_dungeon_id={}
-                    AND stage={}
-                    AND enemy_id not in ({})
-                    '''.format(dungeon.dungeon_id, sub_dungeon.sub_dungeon_id, stage.stage_idx,
-                               ','.join(map(str, seen_enemies)))
-                self._print_bad_enemies('in-stage', dungeon, sub_dungeon, db, sql)
+                bad_encounters.extend(self._log_bad_enemies(
+                    'in-stage', dungeon, sub_dungeon,
+                    [x for x in stored.rows if x['stage'] == stage_idx and x['enemy_id'] not in seen_enemies]))
 
         # In case there are missing stages (e.g. no more invades/commons)
-        seen_stage_indexes = [stage.stage_idx for stage in result_floor.stages]
-        sql = '''
-            SELECT encounter_id, enemy_id
-            FROM encounters
-            WHERE dungeon_id={}
-            AND sub_dungeon_id={}
-            AND stage not in ({})
-            '''.format(dungeon.dungeon_id, sub_dungeon.sub_dungeon_id, ','.join(map(str, seen_stage_indexes)))
-        self._print_bad_enemies('out-stage', dungeon, sub_dungeon, db, sql)
-
-    def _print_bad_enemies(self, desc: str, dungeon, sub_dungeon, db: DbWrapper, sql: str):
-        bad_stored_encounters = db.fetch_data(sql)
+        bad_encounters.extend(self._log_bad_enemies(
+            'out-stage', dungeon, sub_dungeon,
+            [x for x in stored.rows if x['stage'] not in contents.stage_idxs]))
+
+        if bad_encounters:
+            encounter_list_str = ','.join(str(x['encounter_id']) for x in bad_encounters)
+            deleted_drops = db.update_item('DELETE FROM drops WHERE encounter_id IN ({});'.format(encounter_list_str))
+            deleted_encounters = db.update_item(
+                'DELETE FROM encounters WHERE encounter_id IN ({});'.format(encounter_list_str))
+            human_fix_logger.warning(
+                'Auto deleted {} drops and {} encounters'.format(deleted_drops, deleted_encounters))
+
+    def _log_bad_enemies(self, desc: str, dungeon, sub_dungeon, bad_stored_encounters: List[Dict]) -> List[Dict]:
         if not bad_stored_encounters:
-            return
+            return []
 
         encounter_list_str = ','.join([str(x['encounter_id']) for x in bad_stored_encounters])
         encounter_info_list_str = ','.join(
@@ -169,10 +409,7 @@ class DungeonContentProcessor(object):
                                  encounter_info_list_str,
                                  delete_drops_sql,
                                  delete_encounters_sql)
-
-        deleted_drops = db.update_item(delete_drops_sql)
-        deleted_encounters = db.update_item(delete_encounters_sql)
-        human_fix_logger.warning('Auto deleted {} drops and {} encounters'.format(deleted_drops, deleted_encounters))
+        return bad_stored_encounters
 
     def _process_dungeon_rewards(self, db):
         def is_floor_bonus(x):
@@ -0,0 +1,88 @@
+"""
+Checks that DungeonContentProcessor computes the same floor contents with a worker pool as it does serially.
+
+The waves come from a fixture file of wave_data rows, which --save_fixture writes from the database, so the
+check can be rerun without one. Exits with status 1 if the contents differ.
+"""
+import argparse
+import json
+import sys
+
+from pad.common import pad_util
+from pad.common.shared_types import Server
+from pad.db.db_util import DbWrapper
+from pad.db.sql_item import _process_col_mappings
+from pad.raw_processor import crossed_data, merged_database
+from pad.storage_processor.dungeon_content_processor import DungeonContentProcessor
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compares serial and parallel dungeon contents.", add_help=False)
+
+    input_group = parser.add_argument_group("Input")
+    input_group.add_argument("--input_dir", required=True,
+                             help="Path to a folder where the raw input data is")
+    input_group.add_argument("--fixture", required=True, help="JSON file of wave_data rows for the dungeons")
+    input_group.add_argument("--dungeon_ids", required=True, help="Comma-separated dungeons to compute")
+    input_group.add_argument("--workers", type=int, default=4, help="Number of processes for the parallel run")
+    input_group.add_argument("--db_config", help="JSON database info; with --save_fixture, the waves are read here")
+
+    output_group = parser.add_argument_group("Output")
+    output_group.add_argument("--save_fixture", default=False, action="store_true",
+                              help="Writes the dungeons' waves from the database to --fixture first")
+
+    help_group = parser.add_argument_group("Help")
+    help_group.add_argument("-h", "--help", action="help",
+                            help="Displays this help message and exits.")
+    return parser.parse_args()
+
+
+class FixtureWaves(object):
+    """Stands in for DbWrapper as the wave source, streaming the rows in the order the real query does."""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda r: (r['dungeon_id'], r['floor_id'], r['id']))
+
+    def stream_objects(self, obj_type, sql: str):
+        for row in self.rows:
+            yield obj_type(**_process_col_mappings(obj_type, dict(row)))
+
+
+def save_fixture(args, dungeon_ids):
+    with open(args.db_config) as f:
+        db_config = json.load(f)
+    db = DbWrapper(True)
+    db.connect(db_config)
+    rows = db.fetch_data('SELECT * FROM wave_data WHERE dungeon_id IN ({})'.format(','.join(map(str, dungeon_ids))))
+    with open(args.fixture, 'w') as f:
+        json.dump(rows, f, default=str)
+    print('saved {} waves'.format(len(rows)))
+
+
+def main(args):
+    dungeon_ids = [int(x) for x in args.dungeon_ids.split(',')]
+    if args.save_fixture:
+        save_fixture(args, dungeon_ids)
+    with open(args.fixture) as f:
+        waves = FixtureWaves(json.load(f))
+
+    databases = merged_database.load_all(
+        [Server.jp, Server.na, Server.kr], args.input_dir,
+        **crossed_data.database_load_args(DungeonContentProcessor.DATA_SECTIONS))
+    data = crossed_data.CrossServerDatabase(*databases, Server.jp)
+    dungeons = [data.dungeon_by_id(dungeon_id) for dungeon_id in dungeon_ids]
+
+    results = []
+    for workers in [1, args.workers]:
+        contents = DungeonContentProcessor(data, workers=workers)._compute_floor_contents(waves, dungeons)
+        results.append(pad_util.json_string_dump(sorted(contents.items())))
+        print('workers={}: {} floors'.format(workers, len(contents)))
+
+    if results[0] != results[1]:
+        print('MISMATCH between serial and parallel contents')
+        sys.exit(1)
+    print('serial and parallel contents match')
+
+
+if __name__ == '__main__':
+    main(parse_args())
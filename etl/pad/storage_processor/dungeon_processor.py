@@ -1,4 +1,5 @@
 import logging
+from typing import Optional, Set
 
 from pad.db.db_util import DbWrapper
 from pad.raw_processor import crossed_data
@@ -15,8 +16,12 @@ AND visible = false
 
 
 class DungeonProcessor(object):
-    def __init__(self, data: crossed_data.CrossServerDatabase):
+    DATA_SECTIONS = frozenset([crossed_data.DUNGEONS])
+
+    def __init__(self, data: crossed_data.CrossServerDatabase, dungeon_ids: Optional[Set[int]] = None):
+        """If dungeon_ids is set, only those dungeons are stored."""
         self.data = data
+        self.dungeon_ids = dungeon_ids
 
     def process(self, db: DbWrapper):
         logger.info('loading dungeon data')
@@ -29,13 +34,17 @@ class DungeonProcessor(object):
         logger.info('Updated visibility of %s dungeons', updated_rows)
 
     def _process_dungeons(self, db: DbWrapper):
+        items = []
         for dungeon in self.data.dungeons:
-            db.insert_or_update(Dungeon.from_csd(dungeon))
+            if self.dungeon_ids is not None and dungeon.dungeon_id not in self.dungeon_ids:
+                continue
+            items.append(Dungeon.from_csd(dungeon))
             for subdungeon in dungeon.sub_dungeons:
-                db.insert_or_update(SubDungeon.from_cssd(subdungeon, dungeon.dungeon_id))
+                items.append(SubDungeon.from_cssd(subdungeon, dungeon.dungeon_id))
                 if not subdungeon.cur_sub_dungeon.fixed_monsters:
                     continue
-                db.insert_or_update(FixedTeam.from_cssd(subdungeon))
+                items.append(FixedTeam.from_cssd(subdungeon))
                 for fcid in range(6):
                     fixed = subdungeon.cur_sub_dungeon.fixed_monsters.get(fcid)
-                    db.insert_or_update(FixedTeamMonster.from_fc(fixed, fcid, subdungeon))
+                    items.append(FixedTeamMonster.from_fc(fixed, fcid, subdungeon))
+        db.insert_or_update_many(items)
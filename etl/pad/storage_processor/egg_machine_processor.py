@@ -11,6 +11,8 @@ logger = logging.getLogger('processor')
 
 
 class EggMachineProcessor(object):
+    DATA_SECTIONS = frozenset([crossed_data.EXTRA])
+
     def __init__(self, data: crossed_data.CrossServerDatabase):
         self.egg_machines = {
             Server.jp: data.jp_egg_machines,
@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+from typing import Optional, Set
 
 from dadguide_proto import enemy_skills_pb2
 from dadguide_proto.enemy_skills_pb2 import MonsterBehavior
@@ -17,18 +18,23 @@ human_fix_logger = logging.getLogger('human_fix')
 
 
 class EnemySkillProcessor(object):
-    def __init__(self, db: DbWrapper, data: crossed_data.CrossServerDatabase):
+    DATA_SECTIONS = frozenset([crossed_data.CARDS, crossed_data.ENEMY_SKILLS])
+
+    def __init__(self, db: DbWrapper, data: crossed_data.CrossServerDatabase,
+                 monster_ids: Optional[Set[int]] = None, enemy_skill_ids: Optional[Set[int]] = None):
+        """If monster_ids is set, only the enemy skills in enemy_skill_ids or used by those monsters are stored."""
         self.db = db
         self.data = data
+        self.monster_ids = monster_ids
+        self.enemy_skill_ids = enemy_skill_ids or set()
 
         with open(os.path.join(__location__, 'enemy_skill.json')) as f:
             self.static_enemy_skills = json.load(f)
 
     def load_static(self):
         logger.info('loading %d static skills', len(self.static_enemy_skills))
-        for raw in self.static_enemy_skills:
-            item = EnemySkill.from_json(raw)
-            self.db.insert_or_update(item)
+        items = [EnemySkill.from_json(raw) for raw in self.static_enemy_skills]
+        self.db.insert_or_update_many(items)
 
     def load_enemy_skills(self):
         used_skills = {}
@@ -50,10 +56,17 @@ class EnemySkillProcessor(object):
                 else:
                     used_skills[cseb.enemy_skill_id] = cseb
 
+        if self.monster_ids is not None:
+            # The cseb picked for a skill depends on every card using it, so all cards are scanned above.
+            changed_skills = set(self.enemy_skill_ids)
+            for csc in self.data.all_cards:
+                if csc.monster_id in self.monster_ids:
+                    changed_skills.update(cseb.enemy_skill_id for cseb in csc.enemy_behavior)
+            used_skills = {k: v for k, v in used_skills.items() if k in changed_skills}
+
         logger.info('loading %d enemy skills', len(used_skills))
-        for cseb in used_skills.values():
-            item = EnemySkill.from_cseb(cseb)
-            self.db.insert_or_update(item)
+        items = [EnemySkill.from_cseb(cseb) for cseb in used_skills.values()]
+        self.db.insert_or_update_many(items)
 
     def load_enemy_data(self, base_dir: str):
         card_files = []
@@ -68,6 +81,7 @@ class EnemySkillProcessor(object):
         count_not_approved = 0
         count_needs_reapproval = 0
         count_approved = 0
+        items = []
         for card_file in card_files:
             mbwo = enemy_skill_proto.load_from_file(card_file)
             mb = MonsterBehavior()
@@ -85,7 +99,8 @@ class EnemySkillProcessor(object):
                 else:
                     count_approved += 1
 
-            item = EnemyData.from_mb(mb, mbwo.status)
-            self.db.insert_or_update(item)
+            items.append(EnemyData.from_mb(mb, mbwo.status))
+
+        self.db.insert_or_update_many(items)
 
         logger.info('done, %d approved %d not approved', count_approved, count_not_approved)
@@ -10,6 +10,8 @@ logger = logging.getLogger('processor')
 
 
 class ExchangeProcessor(object):
+    DATA_SECTIONS = frozenset([crossed_data.EXTRA])
+
     def __init__(self, data: crossed_data.CrossServerDatabase):
         self.exchange_data = {
             Server.jp: data.jp_exchange,
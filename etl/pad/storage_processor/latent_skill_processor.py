@@ -2,7 +2,7 @@ import json
 import os
 
 from pad.db.db_util import DbWrapper
-from pad.raw_processor.crossed_data import CrossServerDatabase
+from pad.raw_processor.crossed_data import CARDS, CrossServerDatabase
 from pad.storage.latent_skill import LatentSkill
 
 __location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
@@ -11,6 +11,8 @@ from pad.storage.monster import LatentTamadra
 
 
 class LatentSkillProcessor(object):
+    DATA_SECTIONS = frozenset([CARDS])
+
     def __init__(self, data: CrossServerDatabase):
         self.data = data
 
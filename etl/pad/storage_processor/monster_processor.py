@@ -1,19 +1,29 @@
 import logging
+from typing import Optional, Set
 
 from pad.common import pad_util
 from pad.common.pad_util import is_bad_name
 from pad.db.db_util import DbWrapper
 from pad.raw_processor import crossed_data
 from pad.storage.monster import AltMonster, Awakening, Evolution, Monster, MonsterWithExtraImageInfo, Transformation
-from pad.storage.monster_skill import LeaderSkill, upsert_active_skill_data
+from pad.storage.monster_skill import LeaderSkill, active_skill_data_items
 
 logger = logging.getLogger('processor')
 human_fix_logger = logging.getLogger('human_fix')
 
 
 class MonsterProcessor(object):
-    def __init__(self, data: crossed_data.CrossServerDatabase):
+    DATA_SECTIONS = frozenset([crossed_data.CARDS, crossed_data.SKILLS])
+
+    def __init__(self, data: crossed_data.CrossServerDatabase, monster_ids: Optional[Set[int]] = None):
+        """If monster_ids is set, only those monsters (and their skills) are stored; images are always stored."""
         self.data = data
+        self.monster_ids = monster_ids
+
+    def _cards(self, cards):
+        if self.monster_ids is None:
+            return cards
+        return [csc for csc in cards if csc.monster_id in self.monster_ids]
 
     def process(self, db: DbWrapper):
         logger.info('loading monster data')
@@ -25,26 +35,31 @@ class MonsterProcessor(object):
         logger.info('done loading monster data')
 
     def _process_skills(self, db: DbWrapper):
-        logger.info('loading skills for %s cards', len(self.data.ownable_cards))
-        ls_count = 0
-        as_count = 0
-        for csc in self.data.ownable_cards:
+        cards = self._cards(self.data.ownable_cards)
+        logger.info('loading skills for %s cards', len(cards))
+        leader_skills = []
+        active_skill_items = []
+        for csc in cards:
             if csc.leader_skill:
-                ls_count += 1
-                db.insert_or_update(LeaderSkill.from_css(csc.leader_skill))
+                leader_skills.append(LeaderSkill.from_css(csc.leader_skill))
             if csc.active_skill:
-                as_count += 1
-                upsert_active_skill_data(db, csc.active_skill)
-        logger.info('loaded %s leader skills and %s active skills', ls_count, as_count)
+                active_skill_items.extend(active_skill_data_items(csc.active_skill))
+        db.insert_or_update_many(leader_skills)
+        db.insert_or_update_many(active_skill_items)
+        logger.info('loaded %s leader skills and %s active skill items', len(leader_skills), len(active_skill_items))
 
     def _process_monsters(self, db):
         logger.info('loading monsters')
-        for m in self.data.all_cards:
+        monsters = []
+        alt_monsters = []
+        ownable_ids = {cm.monster_id for cm in self.data.ownable_cards}
+        for m in self._cards(self.data.all_cards):
             if 0 < m.monster_id < 19999 and not is_bad_name(m.jp_card.card.name):
-                db.insert_or_update(Monster.from_csm(m))
-            canonical_id = next((cm.monster_id for cm in self.data.ownable_cards
-                                 if cm.monster_id == m.monster_id % 100000), None)
-            db.insert_or_update(AltMonster.from_csm(m, canonical_id))
+                monsters.append(Monster.from_csm(m))
+            canonical_id = m.monster_id % 100000 if m.monster_id % 100000 in ownable_ids else None
+            alt_monsters.append(AltMonster.from_csm(m, canonical_id))
+        db.insert_or_update_many(monsters)
+        db.insert_or_update_many(alt_monsters)
 
     def _process_monster_images(self, db):
         logger.info('monster images, hq_count=%s, anim_count=%s',
@@ -53,17 +68,30 @@ class MonsterProcessor(object):
         if not self.data.hq_image_monster_ids or not self.data.animated_monster_ids:
             logger.info('skipping image info load')
             return
-        for csm in self.data.ownable_cards:
-            item = MonsterWithExtraImageInfo(monster_id=csm.monster_id,
-                                             has_animation=csm.has_animation,
-                                             has_hqimage=csm.has_hqimage)
-            db.insert_or_update(item)
+        items = [MonsterWithExtraImageInfo(monster_id=csm.monster_id,
+                                           has_animation=csm.has_animation,
+                                           has_hqimage=csm.has_hqimage)
+                 for csm in self.data.ownable_cards]
+        # These only carry the image columns, so they can't be upserted into monsters.
+        db.update_many(items)
 
     def _process_awakenings(self, db):
         logger.info('loading awakenings')
-        for m in self.data.ownable_cards:
+        awakenings = []
+        awakening_counts = {}
+        for m in self._cards(self.data.ownable_cards):
             items = Awakening.from_csm(m)
-            for item in items:
+            awakenings.extend(items)
+            awakening_counts[m.monster_id] = len(items)
+
+        try:
+            db.insert_or_update_many(awakenings)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except Exception:
+            # Retry one at a time so the bad item(s) get reported and the rest still load.
+            logger.warning('batched awakening load failed, retrying individually')
+            for item in awakenings:
                 try:
                     db.insert_or_update(item)
                 except (KeyboardInterrupt, SystemExit):
@@ -72,27 +100,32 @@ class MonsterProcessor(object):
                     human_fix_logger.fatal('Failed to insert item (probably new awakening): %s',
                                            pad_util.json_string_dump(item, pretty=True))
 
-            sql = f'DELETE FROM {Awakening.TABLE} WHERE monster_id = {m.monster_id} AND order_idx >= {len(items)}'
+        for monster_id, count in awakening_counts.items():
+            sql = f'DELETE FROM {Awakening.TABLE} WHERE monster_id = {monster_id} AND order_idx >= {count}'
             deleted_awos = db.update_item(sql)
             if deleted_awos:
-                logger.info(f"Deleted {deleted_awos} unused awakenings from monster {m.monster_id}")
+                logger.info(f"Deleted {deleted_awos} unused awakenings from monster {monster_id}")
 
     def _process_evolutions(self, db):
         logger.info('loading evolutions')
-        for m in self.data.ownable_cards:
+        evolutions = []
+        for m in self._cards(self.data.ownable_cards):
             if not m.cur_card.card.ancestor_id:
                 continue
 
             item = Evolution.from_csm(m)
             if item:
-                db.insert_or_update(item)
+                evolutions.append(item)
+        db.insert_or_update_many(evolutions)
 
         logger.info('loading transforms')
-        for m in self.data.ownable_cards:
+        transformations = []
+        for m in self._cards(self.data.ownable_cards):
             if not (m.cur_card.active_skill and m.cur_card.active_skill.transform_ids):
                 continue
 
             denom = sum(val for val in m.cur_card.active_skill.transform_ids.values())
             for tfid, num in m.cur_card.active_skill.transform_ids.items():
                 if tfid is not None:
-                    db.insert_or_update(Transformation.from_csm(m, tfid, num, denom))
+                    transformations.append(Transformation.from_csm(m, tfid, num, denom))
+        db.insert_or_update_many(transformations)
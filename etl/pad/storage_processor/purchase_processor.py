@@ -12,6 +12,8 @@ logger = logging.getLogger('processor')
 
 
 class PurchaseProcessor(object):
+    DATA_SECTIONS = frozenset([crossed_data.EXTRA])
+
     def __init__(self, data: crossed_data.CrossServerDatabase):
         self.purchase_data = {
             Server.jp: data.jp_purchase,
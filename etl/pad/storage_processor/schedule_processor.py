@@ -91,6 +91,8 @@ IGNORED_BONUS_TYPES = [
 
 
 class ScheduleProcessor(object):
+    DATA_SECTIONS = frozenset([crossed_data.BONUSES])
+
     def __init__(self, data: crossed_data.CrossServerDatabase):
         self.data = data
 
@@ -104,6 +106,7 @@ class ScheduleProcessor(object):
         logger.info('done loading schedule data')
 
     def _process_schedule(self, db: DbWrapper, bonuses: List[MergedBonus]):
+        events = []
         for bonus in bonuses:
             bonus_type = bonus.bonus.bonus_info.bonus_type
 
@@ -125,7 +128,8 @@ class ScheduleProcessor(object):
 
             if bonus.dungeon:
                 logger.debug('Creating event: %s', bonus)
-                event = ScheduleEvent.from_mb(bonus)
-                db.insert_or_update(event)
+                events.append(ScheduleEvent.from_mb(bonus))
             else:
                 human_fix_logger.error('Dungeon with no dungeon attached: %s', bonus)
+
+        db.insert_or_update_many(events)
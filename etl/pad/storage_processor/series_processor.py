@@ -12,6 +12,8 @@ logger = logging.getLogger('processor')
 
 
 class SeriesProcessor(object):
+    DATA_SECTIONS = frozenset()
+
     def __init__(self, data: crossed_data.CrossServerDatabase):
         with open(os.path.join(__location__, 'series.json')) as f:
             self.series = json.load(f)
@@ -0,0 +1,148 @@
+import hashlib
+import itertools
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from pad.db.db_util import DbWrapper
+from pad.storage.wave import WaveItem
+
+logger = logging.getLogger('processor')
+
+SUMMARY_TABLE = 'wave_summary'
+ENTRY_TABLE = 'wave_entries'
+
+# Keeps the IN lists of entry ids to a reasonable statement size.
+_ENTRY_CHUNK_SIZE = 10000
+
+# The wave fields the WaveConverter uses; each summarized entry is stored as a list of these.
+_WAVE_COLS = ['stage', 'slot', 'spawn_type', 'monster_id', 'monster_level',
+              'drop_monster_id', 'drop_monster_level', 'plus_amount']
+
+_UPSERT_SQL = '''
+INSERT INTO {} (dungeon_id, floor_id, entry_hash, waves, entry_count, first_wave_id, last_wave_id)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+  entry_count = entry_count + VALUES(entry_count),
+  first_wave_id = LEAST(first_wave_id, VALUES(first_wave_id)),
+  last_wave_id = GREATEST(last_wave_id, VALUES(last_wave_id))
+'''.format(SUMMARY_TABLE)
+
+def _entry_waves(row) -> List[WaveItem]:
+    return [WaveItem(dungeon_id=row['dungeon_id'], floor_id=row['floor_id'], **dict(zip(_WAVE_COLS, values)))
+            for values in json.loads(row['waves'])]
+
+
+class WaveSummaryProcessor(object):
+    """Maintains wave_summary, an incrementally updated aggregate of wave_data.
+
+    Each row is a distinct dungeon entry (the full list of waves seen in one run of a floor) with
+    the number of times it was pulled. This keeps everything the WaveConverter computes per entry,
+    while collapsing the repeated entries that make up most of wave_data.
+
+    Each run only reads the waves of the entries in wave_entries that aren't marked summarized yet,
+    and marks them in the same transaction. An entry's row is committed together with its waves, so
+    unlike a wave id watermark, this can't skip entries whose transaction committed late.
+    """
+
+    def __init__(self, dungeon_chunk_size: int = 100):
+        # Limits how many summarized entries are held in memory at once.
+        self.dungeon_chunk_size = dungeon_chunk_size
+
+    def process(self, db: DbWrapper):
+        with db.transaction():
+            sql = 'SELECT entry_id, dungeon_id FROM {} WHERE NOT summarized'.format(ENTRY_TABLE)
+            entry_ids_by_dungeon = defaultdict(list)  # type: Dict[int, List[int]]
+            for row in db.fetch_data(sql):
+                entry_ids_by_dungeon[row['dungeon_id']].append(row['entry_id'])
+            if not entry_ids_by_dungeon:
+                logger.info('wave summary up to date')
+                return
+
+            dungeon_ids = sorted(entry_ids_by_dungeon)
+            logger.info('summarizing %s entries for %s dungeons',
+                        sum(map(len, entry_ids_by_dungeon.values())), len(dungeon_ids))
+
+            for idx in range(0, len(dungeon_ids), self.dungeon_chunk_size):
+                chunk = dungeon_ids[idx:idx + self.dungeon_chunk_size]
+                entry_ids = [entry_id for dungeon_id in chunk for entry_id in entry_ids_by_dungeon[dungeon_id]]
+                # Summaries of the same entry add up, so a floor's entries can be split across chunks.
+                for entry_idx in range(0, len(entry_ids), _ENTRY_CHUNK_SIZE):
+                    entry_chunk = ','.join(map(str, entry_ids[entry_idx:entry_idx + _ENTRY_CHUNK_SIZE]))
+                    self._summarize(db, 'dungeon_id IN ({}) AND entry_id IN ({})'.format(
+                        ','.join(map(str, chunk)), entry_chunk))
+                    db.update_item('UPDATE {} SET summarized = 1 WHERE entry_id IN ({})'.format(
+                        ENTRY_TABLE, entry_chunk))
+
+    def rebuild_floor(self, db: DbWrapper, dungeon_id: int, floor_id: int):
+        """Resummarizes a floor after its waves were deleted; does nothing if the summary isn't in use."""
+        if not self.is_enabled(db):
+            return
+
+        with db.transaction():
+            sql = 'DELETE FROM {} WHERE dungeon_id={} AND floor_id={}'.format(SUMMARY_TABLE, dungeon_id, floor_id)
+            db.update_item(sql)
+            # Entries that aren't marked yet are left to the next process() run.
+            floor_clause = 'dungeon_id={} AND floor_id={}'.format(dungeon_id, floor_id)
+            self._summarize(db, '{0} AND entry_id IN (SELECT entry_id FROM {1} WHERE summarized AND {0})'.format(
+                floor_clause, ENTRY_TABLE))
+
+    @staticmethod
+    def is_enabled(db: DbWrapper) -> bool:
+        sql = ("SELECT COUNT(*) FROM information_schema.tables"
+               " WHERE table_schema = DATABASE() AND table_name = '{}'").format(SUMMARY_TABLE)
+        return db.get_single_value(sql, int) > 0
+
+    @staticmethod
+    def load_floor_stats(db: DbWrapper) -> List[Dict]:
+        """Returns dungeon_id, floor_id, max_wave_id and wave_count (summarized entries) per floor."""
+        sql = ('SELECT dungeon_id, floor_id, MAX(last_wave_id) AS max_wave_id, SUM(entry_count) AS wave_count'
+               ' FROM {} GROUP BY dungeon_id, floor_id').format(SUMMARY_TABLE)
+        return db.fetch_data(sql)
+
+    @staticmethod
+    def stream_floors(db: DbWrapper,
+                      dungeon_ids: List[int]) -> Iterator[Tuple[Tuple[int, int], Iterable[Tuple[List[WaveItem], int]]]]:
+        """Yields ((dungeon_id, floor_id), entries) per summarized floor, for WaveConverter.convert_entries.
+
+        Entries are in the order they were first pulled, which matches the order of the raw waves.
+        """
+        sql = ('SELECT dungeon_id, floor_id, waves, entry_count FROM {} WHERE dungeon_id IN ({})'
+               ' ORDER BY dungeon_id, floor_id, first_wave_id').format(SUMMARY_TABLE, ','.join(map(str, dungeon_ids)))
+        rows = db.stream(sql)
+        for floor_key, floor_rows in itertools.groupby(rows, key=lambda x: (x['dungeon_id'], x['floor_id'])):
+            yield floor_key, ((_entry_waves(row), row['entry_count']) for row in floor_rows)
+
+    def _summarize(self, db: DbWrapper, where_clause: str):
+        sql = 'SELECT id, dungeon_id, floor_id, entry_id, {} FROM wave_data WHERE {}'.format(
+            ', '.join(_WAVE_COLS), where_clause)
+        sql += ' ORDER BY dungeon_id, floor_id, entry_id, id'
+
+        # The stream has to be drained before anything can be written, so collect the entries first.
+        summaries = {}
+        rows = db.stream(sql)
+        for (dungeon_id, floor_id, _), entry_rows in itertools.groupby(
+                rows, key=lambda x: (x['dungeon_id'], x['floor_id'], x['entry_id'])):
+            entry_rows = list(entry_rows)
+            waves = json.dumps([[row[c] for c in _WAVE_COLS] for row in entry_rows], separators=(',', ':'))
+            entry_hash = hashlib.sha1(waves.encode()).hexdigest()
+            first_wave_id = entry_rows[0]['id']
+            last_wave_id = entry_rows[-1]['id']
+
+            summary_key = (dungeon_id, floor_id, entry_hash)
+            if summary_key in summaries:
+                summary = summaries[summary_key]
+                summary[4] += 1
+                summary[5] = min(summary[5], first_wave_id)
+                summary[6] = max(summary[6], last_wave_id)
+            else:
+                summaries[summary_key] = [dungeon_id, floor_id, entry_hash, waves, 1, first_wave_id, last_wave_id]
+
+        if not summaries:
+            return
+        if db.dry_run:
+            logger.warning('not writing %s wave summaries due to dry run', len(summaries))
+            return
+        with db.connection.cursor() as cursor:
+            db.execute_many(cursor, _UPSERT_SQL, [tuple(x) for x in summaries.values()])
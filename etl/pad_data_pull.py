@@ -5,9 +5,10 @@ Requires padkeygen which is not checked in.
 """
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from pad.api import pad_api
-from pad.common import pad_util
+from pad.common.pull_manifest import PullManifest
 from pad.common.shared_types import Server
 from pad.raw import bonus, extra_egg_machine
 
@@ -18,6 +19,9 @@ inputGroup.add_argument("--server", required=True, help="One of [NA, JP, KR]")
 inputGroup.add_argument("--user_uuid", required=True, help="Account UUID")
 inputGroup.add_argument("--user_intid", required=True, help="Account code")
 inputGroup.add_argument("--only_bonus", action='store_true', help="Only populate bonus data")
+inputGroup.add_argument("--api_url", help="Overrides the API URL, e.g. for the local stand-in server")
+inputGroup.add_argument("--max_concurrent_requests", type=int, default=7,
+                        help="Number of endpoints to download at once; 1 downloads them one at a time")
 
 outputGroup = parser.add_argument_group("Output")
 outputGroup.add_argument("--output_dir", required=True,
@@ -41,37 +45,49 @@ elif args.server == 'KR':
 else:
     raise Exception('unexpected server:' + args.server)
 
-api_client = pad_api.PadApiClient(endpoint, args.user_uuid, args.user_intid)
+api_client = pad_api.PadApiClient(endpoint, args.user_uuid, args.user_intid, api_url=args.api_url)
 
 output_dir = args.output_dir
 os.makedirs(output_dir, exist_ok=True)
 
 api_client.login()
 
+# Files are only rewritten when their contents change; changed_files.txt lists the ones that did.
+manifest = PullManifest(output_dir)
+manifest.set_version('server_version', api_client.server_v)
+
 
 def pull_and_write_endpoint(api_client, action):
     action_json = api_client.action(action)
 
     file_name = action.value.name + '.json'
-    output_file = os.path.join(output_dir, file_name)
-    print('writing', file_name)
-    with open(output_file, 'w') as outfile:
-        pad_util.json_file_dump(action_json, outfile)
-
-
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.DOWNLOAD_LIMITED_BONUS_DATA)
+    if manifest.write_json(file_name, action_json):
+        print('writing', file_name)
+    else:
+        print('unchanged', file_name)
+
+
+endpoint_actions = [pad_api.EndpointAction.DOWNLOAD_LIMITED_BONUS_DATA]
+if not args.only_bonus:
+    endpoint_actions.extend([
+        pad_api.EndpointAction.DOWNLOAD_CARD_DATA,
+        pad_api.EndpointAction.DOWNLOAD_DUNGEON_DATA,
+        pad_api.EndpointAction.DOWNLOAD_SKILL_DATA,
+        pad_api.EndpointAction.DOWNLOAD_ENEMY_SKILL_DATA,
+        pad_api.EndpointAction.DOWNLOAD_MONSTER_EXCHANGE,
+        pad_api.EndpointAction.SHOP_ITEM,
+    ])
+
+# The endpoints are independent, so they're downloaded concurrently over the client's shared session.
+with ThreadPoolExecutor(max_workers=max(args.max_concurrent_requests, 1)) as executor:
+    for _ in executor.map(lambda action: pull_and_write_endpoint(api_client, action), endpoint_actions):
+        pass
 
 if args.only_bonus:
     print('skipping other downloads')
+    manifest.save()
     exit()
 
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.DOWNLOAD_CARD_DATA)
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.DOWNLOAD_DUNGEON_DATA)
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.DOWNLOAD_SKILL_DATA)
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.DOWNLOAD_ENEMY_SKILL_DATA)
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.DOWNLOAD_MONSTER_EXCHANGE)
-pull_and_write_endpoint(api_client, pad_api.EndpointAction.SHOP_ITEM)
-
 api_client.load_player_data()
 player_data = api_client.player_data
 bonus_data = bonus.load_bonus_data(data_dir=output_dir,
@@ -93,6 +109,6 @@ for em in egg_machines:
     page = api_client.get_egg_machine_page(gtype, grow)
     extra_egg_machine.scrape_machine_contents(page, em)
 
-output_file = os.path.join(output_dir, extra_egg_machine.FILE_NAME)
-with open(output_file, 'w') as outfile:
-    pad_util.json_file_dump(egg_machines, outfile, pretty=True)
+manifest.write_json(extra_egg_machine.FILE_NAME, egg_machines, pretty=True)
+manifest.save()
+print('changed files:', ', '.join(manifest.changed_files) or 'none')
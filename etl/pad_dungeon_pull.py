@@ -8,7 +8,7 @@ from tqdm import tqdm
 from pad.api import pad_api
 
 from pad.db.db_util import DbWrapper
-from pad.storage.wave import WaveItem
+from pad.storage.wave import WaveWriter, entry_wave_items
 
 
 def parse_args():
@@ -18,6 +18,7 @@ def parse_args():
     input_group.add_argument("--server", required=True, help="One of [NA, JP]")
     input_group.add_argument("--user_uuid", required=True, help="Account UUID")
     input_group.add_argument("--user_intid", required=True, help="Account code")
+    input_group.add_argument("--api_url", help="Overrides the API URL, e.g. for the local stand-in server")
 
     input_group.add_argument("--dungeon_id", required=True, help="Dungeon ID")
     input_group.add_argument("--floor_id", required=True, help="Floor ID")
@@ -28,6 +29,10 @@ def parse_args():
     output_group.add_argument("--logsql", default=False,
                               action="store_true", help="Logs sql commands")
     output_group.add_argument("--stream_safe", action="store_true", help="Don't use fancy progress bars")
+    output_group.add_argument("--entries_per_flush", type=int, default=1,
+                              help="Number of dungeon entries to buffer before writing waves")
+    output_group.add_argument("--load_data_infile", action="store_true",
+                              help="Write waves with LOAD DATA LOCAL INFILE; needs local_infile in the db config")
 
     help_group = parser.add_argument_group("Help")
     help_group.add_argument("-h", "--help", action="help",
@@ -50,7 +55,7 @@ def pull_data(args, api_client=None, db_wrapper=None):
         else:
             raise Exception('unexpected server:' + args.server)
 
-        api_client = pad_api.PadApiClient(endpoint, args.user_uuid, args.user_intid)
+        api_client = pad_api.PadApiClient(endpoint, args.user_uuid, args.user_intid, api_url=args.api_url)
         api_client.login()
         print('load_player_data')
         api_client.load_player_data()
@@ -71,7 +76,6 @@ def pull_data(args, api_client=None, db_wrapper=None):
 
     stamina = db_wrapper.get_single_value(f"SELECT stamina FROM sub_dungeons"
                                           f" WHERE sub_dungeon_id = {int(dungeon_id) * 1000 + int(floor_id)};")
-    entry_id = int(db_wrapper.get_single_value("SELECT MAX(entry_id) FROM wave_data;"))
 
     if args.stream_safe:
         iterator = range(loop_count)
@@ -79,21 +83,17 @@ def pull_data(args, api_client=None, db_wrapper=None):
         iterator = tqdm(range(loop_count), unit='runs')
 
     print('entering', server, 'dungeon', dungeon_id, 'floor', floor_id, loop_count, 'times')
-    for _ in iterator:
-        entry_id += 1
-        entry_json = api_client.enter_dungeon(dungeon_id, floor_id, self_card=friend_card, stamina=stamina)
-        wave_response = pad_api.extract_wave_response_from_entry(entry_json)
-        leaders = entry_json['entry_leads']
-
-        for stage_idx, floor in enumerate(wave_response.floors):
-            for monster_idx, monster in enumerate(floor.monsters):
-                wave_item = WaveItem(pull_id=pull_id, entry_id=entry_id, server=server, dungeon_id=dungeon_id,
-                                     floor_id=floor_id, stage=stage_idx, slot=monster_idx, monster=monster,
-                                     leader_id=leaders[0], friend_id=leaders[1])
-                db_wrapper.insert_item(wave_item.insert_sql())
-
-        if server != 'NA':
-            time.sleep(.5)
+    with WaveWriter(db_wrapper, args.entries_per_flush, args.load_data_infile) as wave_writer:
+        for _ in iterator:
+            entry_json = api_client.enter_dungeon(dungeon_id, floor_id, self_card=friend_card, stamina=stamina)
+            wave_response = pad_api.extract_wave_response_from_entry(entry_json)
+            leaders = entry_json['entry_leads']
+
+            wave_items = entry_wave_items(wave_response, leaders, server, pull_id, dungeon_id, floor_id)
+            wave_writer.add_entry(wave_items)
+
+            if server != 'NA':
+                time.sleep(.5)
 
 
 if __name__ == '__main__':
@@ -31,6 +31,9 @@ def parse_args():
     inputGroup.add_argument("--interactive", required=False,
                             help="Lets you specify a card id on the command line")
     inputGroup.add_argument("--server", default="JP", help="Server to build for")
+    inputGroup.add_argument("--load_workers", type=int, default=2,
+                            help="Number of processes used to load the JP/NA data")
+    inputGroup.add_argument("--db_cache_dir", help="Folder to cache the parsed raw data in between runs")
 
     outputGroup = parser.add_argument_group("Output")
     outputGroup.add_argument("--output_dir", required=True,
@@ -214,11 +217,8 @@ def run(args):
     behavior_plain_dir = os.path.join(args.output_dir, 'behavior_plain')
     os.makedirs(behavior_plain_dir, exist_ok=True)
 
-    jp_db = merged_database.Database(Server.jp, args.input_dir)
-    na_db = merged_database.Database(Server.na, args.input_dir)
-
-    jp_db.load_database(skip_bonus=True, skip_extra=True)
-    na_db.load_database(skip_bonus=True, skip_extra=True)
+    jp_db, na_db = merged_database.load_all([Server.jp, Server.na], args.input_dir, workers=args.load_workers,
+                                            skip_bonus=True, skip_extra=True, cache_dir=args.db_cache_dir)
 
     print('merging data')
     if args.server.lower() == "jp":
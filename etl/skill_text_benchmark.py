@@ -0,0 +1,89 @@
+"""
+Times active skill text generation for every skill in a raw data dump, comparing rendering the skill text
+templates from scratch each time against the memoized templates in BaseTextConverter.process_raw.
+"""
+import argparse
+import os
+import time
+
+import jinja2
+
+from pad.common.shared_types import Server
+from pad.raw import skill
+from pad.raw.skills import skill_common
+from pad.raw.skills.en.active_skill_text import EnASTextConverter
+from pad.raw.skills.ja.active_skill_text import JaASTextConverter
+from pad.raw.skills.ko.active_skill_text import KoASTextConverter
+from pad.raw.skills.skill_parser import SkillParser
+
+CONVERTERS = [JaASTextConverter(), EnASTextConverter(), KoASTextConverter()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmarks skill text generation.", add_help=False)
+
+    input_group = parser.add_argument_group("Input")
+    input_group.add_argument("--input_dir", required=True,
+                             help="Path to a folder where the raw input data is")
+    input_group.add_argument("--server", default="jp", help="Server whose skills are used")
+    input_group.add_argument("--rounds", type=int, default=3, help="Number of passes over the skills")
+
+    help_group = parser.add_argument_group("Help")
+    help_group.add_argument("-h", "--help", action="help",
+                            help="Displays this help message and exits.")
+    return parser.parse_args()
+
+
+def render_uncached(converter, text: str) -> str:
+    """What process_raw did before templates were memoized."""
+    return jinja2.Template(text).render(
+        awoskills={f"id{awid}": name for awid, name in converter.AWAKENING_MAP.items()}
+    )
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(args):
+    server = Server[args.server.lower()]
+    parser = SkillParser()
+    parser.parse(skill.load_skill_data(data_dir=os.path.join(args.input_dir, server.name)))
+    active_skills = parser.active_skills
+    count = len(active_skills) * len(CONVERTERS)
+    print('{} active skills, {} converters, {} rounds'.format(len(active_skills), len(CONVERTERS), args.rounds))
+
+    templated = []
+
+    def make_templates():
+        templated.clear()
+        templated.extend((c, s.templated_text(c)) for c in CONVERTERS for s in active_skills)
+
+    def render_before():
+        for c, text in templated:
+            render_uncached(c, text)
+
+    def render_after():
+        for c, text in templated:
+            c.process_raw(text)
+
+    template_time = timed(make_templates)
+    skill_common.compile_template.cache_clear()
+    results = {
+        'before': [timed(render_before) for _ in range(args.rounds)],
+        'after, first pass': [timed(render_after)],
+        'after, cached': [timed(render_after) for _ in range(args.rounds)],
+    }
+
+    print('templating: {:.1f} us/skill'.format(template_time / count * 1e6))
+    for name, times in results.items():
+        render_time = min(times)
+        print('{}: rendering {:.1f} us/skill, full text {:.1f} us/skill'.format(
+            name, render_time / count * 1e6, (template_time + render_time) / count * 1e6))
+    print('template cache: {}'.format(skill_common.compile_template.cache_info()))
+
+
+if __name__ == '__main__':
+    main(parse_args())
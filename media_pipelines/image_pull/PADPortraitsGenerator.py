@@ -19,6 +19,7 @@ inputGroup.add_argument("--input_dir", help="Path to a folder where CARD files a
 inputGroup.add_argument("--data_dir", required=True, help="Path to raw pad data files")
 inputGroup.add_argument("--server", help="Either na or jp")
 inputGroup.add_argument("--card_templates_file", help="Path to card templates png")
+inputGroup.add_argument("--db_cache_dir", help="Folder to cache the parsed raw data in between runs")
 
 outputGroup = parser.add_argument_group("Output")
 outputGroup.add_argument("--output_dir", help="Path to a folder where output should be saved")
@@ -63,7 +64,7 @@ attr_map = {
 
 server = Server.from_str(args.server)
 pad_db = merged_database.Database(server, args.data_dir)
-pad_db.load_database(skip_skills=True, skip_extra=True)
+pad_db.load_database(skip_skills=True, skip_extra=True, cache_dir=args.db_cache_dir)
 
 for merged_card in pad_db.cards:
     card = merged_card.card
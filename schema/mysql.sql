@@ -1068,6 +1068,23 @@ CREATE TABLE `skill_condition` (
   KEY `t_condition` (`condition_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8;
 
+--
+-- Table structure for table `sub_dungeon_fingerprints`
+--
+
+DROP TABLE IF EXISTS `sub_dungeon_fingerprints`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `sub_dungeon_fingerprints` (
+  `sub_dungeon_id` int(11) NOT NULL,
+  `max_wave_id` int(11) NOT NULL,
+  `wave_count` int(11) NOT NULL,
+  `monster_ids` text NOT NULL,
+  `card_hash` char(40) NOT NULL,
+  PRIMARY KEY (`sub_dungeon_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
 --
 -- Table structure for table `sub_dungeons`
 --
@@ -1177,9 +1194,48 @@ CREATE TABLE `wave_data` (
   `leader_id` int(11) DEFAULT NULL,
   `friend_id` int(11) DEFAULT NULL,
   PRIMARY KEY (`id`),
-  KEY `dungeon_id` (`dungeon_id`)
+  KEY `dungeon_id` (`dungeon_id`),
+  KEY `dungeon_floor_entry` (`dungeon_id`,`floor_id`,`entry_id`,`pull_time`)
 ) ENGINE=InnoDB AUTO_INCREMENT=2895950 DEFAULT CHARSET=latin1;
 /*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `wave_entries`
+--
+
+DROP TABLE IF EXISTS `wave_entries`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `wave_entries` (
+  `entry_id` int(11) NOT NULL AUTO_INCREMENT,
+  `pull_id` int(11) NOT NULL,
+  `server` varchar(2) NOT NULL,
+  `dungeon_id` int(11) NOT NULL,
+  `floor_id` int(11) NOT NULL,
+  `summarized` tinyint(1) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`entry_id`),
+  KEY `summarized` (`summarized`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `wave_summary`
+--
+
+DROP TABLE IF EXISTS `wave_summary`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8 */;
+CREATE TABLE `wave_summary` (
+  `dungeon_id` int(11) NOT NULL,
+  `floor_id` int(11) NOT NULL,
+  `entry_hash` char(40) NOT NULL,
+  `waves` mediumtext NOT NULL,
+  `entry_count` int(11) NOT NULL,
+  `first_wave_id` int(11) NOT NULL,
+  `last_wave_id` int(11) NOT NULL,
+  PRIMARY KEY (`dungeon_id`,`floor_id`,`entry_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=latin1;
+/*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
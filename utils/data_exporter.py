@@ -9,6 +9,7 @@ import padtools
 
 from pad.common import pad_util
 from pad.common.shared_types import Server
+from pad.raw import card_table
 from pad.raw.skills import skill_text_typing
 from pad.raw.skills.emoji_en.enemy_skill_text import EnEmojiESTextConverter
 from pad.raw.skills.en.active_skill_text import EnASTextConverter
@@ -39,6 +40,11 @@ def parse_args():
     input_group.add_argument("--image_data_only", default=False, action="store_true",
                              help="Should we only dump image availability")
     input_group.add_argument("--server", default="JP", help="Server to build for")
+    input_group.add_argument("--load_workers", type=int, default=3,
+                             help="Number of processes used to load the JP/NA/KR data")
+    input_group.add_argument("--db_cache_dir", help="Folder to cache the parsed raw data in between runs")
+    output_group.add_argument("--stat_table_file",
+                              help="CSV file to write the HP/ATK/RCV of each monster at levels 1-120 to")
 
     help_group = parser.add_argument_group("Help")
     help_group.add_argument("-h", "--help", action="help",
@@ -75,17 +81,10 @@ def dump_data(args):
     if args.image_data_only:
         exit(0)
 
-    print('Processing JP')
-    jp_db = merged_database.Database(Server.jp, input_dir)
-    jp_db.load_database(skip_extra=True)
-
-    print('Processing NA')
-    na_db = merged_database.Database(Server.na, input_dir)
-    na_db.load_database(skip_extra=True)
-
-    print('Processing KR')
-    kr_db = merged_database.Database(Server.kr, input_dir)
-    kr_db.load_database(skip_extra=True)
+    print('Processing JP, NA and KR')
+    jp_db, na_db, kr_db = merged_database.load_all([Server.jp, Server.na, Server.kr], input_dir,
+                                                   workers=args.load_workers, skip_extra=True,
+                                                   cache_dir=args.db_cache_dir)
 
     print('Merging and saving')
     if args.server.lower() == "jp":
@@ -100,6 +99,9 @@ def dump_data(args):
     cross_db = CrossServerDatabase(jp_db, na_db, kr_db, server)
     save_cross_database(output_dir, cross_db)
 
+    if args.stat_table_file:
+        save_stat_table(args.stat_table_file, cross_db)
+
 
 def save_cross_database(output_dir: str, db: CrossServerDatabase):
     raw_card_dir = os.path.join(output_dir, 'cards')
@@ -131,6 +133,12 @@ def save_cross_database(output_dir: str, db: CrossServerDatabase):
             dump_dungeon(f, csd)
 
 
+def save_stat_table(file_path: str, db: CrossServerDatabase):
+    cards = db.ownable_cards
+    table = card_table.CardTable([c.cur_card.card for c in cards], [c.monster_id for c in cards])
+    card_table.save_stat_table(file_path, table)
+
+
 # Write top level info for the monster
 def dump_monster(f, c):
     f.write('#{} {}\n'.format(c.monster_id, c.na_card.card.name))
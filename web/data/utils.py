@@ -72,7 +72,8 @@ def load_from_db_connection(connection, table, tstamp):
     # and the higher value ones will get inserted on the next run.
     sql += ' ORDER BY tstamp ASC'
 
-    with connection.cursor() as cursor:
+    # Unbuffered, so rows are converted as they arrive instead of being held twice.
+    with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
         cursor.execute(sql)
         data = dump_table(cursor)
 